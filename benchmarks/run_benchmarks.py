@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+
+"""
+Benchmarks of the scan, the sync and the bookmark files, run against a
+simulated rig (see test/fake_rigctld.py) so that the results can be
+compared between changes without real radios.
+
+Author: Simone Marzona <marzona@knoway.info>
+
+License: MIT License
+
+Copyright (c) 2015 Simone Marzona
+"""
+
+# import modules
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import textwrap
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# the simulated rig is kept with the tests, out of the package
+sys.path.insert(0, os.path.join(ROOT, "test"))
+
+from rig_remote.bookmark_file import BookmarkFile
+from rig_remote.bookmark_set import BookmarkSet
+from rig_remote.connection_pool import ConnectionPool
+from rig_remote.constants import CBB_MODES
+from rig_remote.disk_io import IO, BookmarkDatabase
+from fake_rigctld import FakeRigctld
+from rig_remote.rigctl import RigCtl
+from rig_remote.scanning import Scanning, ScanningTask
+from rig_remote.stmessenger import STMessenger
+from rig_remote.syncing import Syncing, SyncTask
+
+BENCHMARKS = ("frequency_scan",
+              "bookmark_scan",
+              "sync",
+              "bookmark_files")
+
+# first frequency of the simulated band, in hertz
+BAND_START = 144000000
+
+
+class NullLog(object):
+    """Activity log that drops the records, the benchmarks measure the
+    rig and not the disk.
+
+    """
+
+    def __init__(self):
+        self.records = 0
+
+    def write(self, record_type, record, signal):
+        self.records += 1
+
+    def close(self):
+        pass
+
+
+# helper functions
+def input_arguments():
+    """Argument parser.
+
+    """
+
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent(textwrap.fill(
+            "Runs the scan, the sync and the bookmark file benchmarks "
+            "against a simulated rigctld server and reports channels per "
+            "second, commands per second and memory.")))
+
+    parser.add_argument("benchmarks",
+                        nargs="*",
+                        help="Benchmarks to run, among {}, defaults to all "
+                             "of them.".format(", ".join(BENCHMARKS)))
+    parser.add_argument("--channels",
+                        type=int,
+                        default=50,
+                        dest="channels",
+                        help="Channels of the scanned band.")
+    parser.add_argument("--interval",
+                        type=int,
+                        default=25,
+                        dest="interval",
+                        help="Channel spacing, in kHz.")
+    parser.add_argument("--signals",
+                        type=int,
+                        default=5,
+                        dest="signals",
+                        help="Active channels in the band.")
+    parser.add_argument("--noise",
+                        type=float,
+                        default=1.0,
+                        dest="noise",
+                        help="Standard deviation of the level, in dB.")
+    parser.add_argument("--tune-latency",
+                        type=float,
+                        default=0.0,
+                        dest="tune_latency",
+                        help="Seconds the simulated rig takes to tune.")
+    parser.add_argument("--rtt",
+                        type=float,
+                        default=0.0,
+                        dest="rtt",
+                        help="Network round trip time, in seconds.")
+    parser.add_argument("--duration",
+                        type=float,
+                        default=5.0,
+                        dest="duration",
+                        help="Seconds the sync benchmark runs.")
+    parser.add_argument("--bookmarks",
+                        type=int,
+                        default=100000,
+                        dest="bookmarks",
+                        help="Bookmarks written and read by the bookmark "
+                             "file benchmark.")
+    parser.add_argument("--seed",
+                        type=int,
+                        default=1,
+                        dest="seed",
+                        help="Seed of the simulated band.")
+    parser.add_argument("--json",
+                        type=str,
+                        dest="json_file",
+                        help="File the results are written to as JSON.")
+    parser.add_argument("--verbose",
+                        "-v",
+                        dest="verbose",
+                        action="store_true",
+                        help="Increase log verbosity.")
+
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmarks: {}".format(", ".join(unknown)))
+    return args
+
+def peak_memory():
+    """Peak resident memory of the process, in kilobytes, None where
+    it can't be read.
+    """
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macOS bytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def band(args):
+    """Builds the simulated band.
+
+    :returns: the server, not started, and the frequencies of the channels
+    :return type: tuple of FakeRigctld, list of int
+    """
+
+    interval = args.interval * 1000
+    channels = [BAND_START + i * interval for i in range(args.channels)]
+    rng = random.Random(args.seed)
+    active = rng.sample(channels, min(args.signals, len(channels)))
+    server = FakeRigctld(dict((freq, rng.uniform(-40.0, -10.0))
+                              for freq in active),
+                         noise=args.noise,
+                         tune_latency=args.tune_latency,
+                         rtt=args.rtt,
+                         seed=args.seed)
+    return server, channels
+
+def scan_params(args, channels):
+    return {"range_min": channels[0],
+            "range_max": channels[-1] + 1,
+            "interval": args.interval,
+            "delay": 0,
+            "passes": 1,
+            "sgn_level": -50,
+            "log": True}
+
+def run_scan(args, mode):
+    server, channels = band(args)
+    target = server.start()
+    pool = ConnectionPool()
+    bookmarks = [(freq, "FM", "channel {}".format(i), "O")
+                 for i, freq in enumerate(channels)]
+    task = ScanningTask(STMessenger(),
+                        mode,
+                        bookmarks if mode == "bookmarks" else [],
+                        [],
+                        scan_params(args, channels),
+                        RigCtl(target, pool),
+                        None)
+    scanning = Scanning()
+    log = NullLog()
+    start = time.time()
+    scanning.scan(task, log)
+    elapsed = time.time() - start
+    pool.close_all()
+    server.stop()
+    stats = scanning.stats.as_dict()
+    scan_pass = stats["passes"][0]
+    return {"elapsed": elapsed,
+            "channels": scan_pass["channels"],
+            "channels_per_sec": scan_pass["channels_per_sec"],
+            "commands_per_sec": server.commands / elapsed,
+            "signals_found": log.records,
+            "phases": scan_pass["phases"],
+            "commands": dict((command, histogram["mean"])
+                             for command, histogram
+                             in stats["commands"].items())}
+
+def frequency_scan(args):
+    """Scanning._frequency over the whole band."""
+
+    return run_scan(args, "frequency")
+
+def bookmark_scan(args):
+    """Scanning._bookmarks over a bookmark on every channel."""
+
+    return run_scan(args, "bookmarks")
+
+def sync(args):
+    """Syncing.sync while the source rig is retuned every channel."""
+
+    source, channels = band(args)
+    destination, _ = band(args)
+    source.start()
+    destination.start()
+    pool = ConnectionPool()
+    task = SyncTask(STMessenger(),
+                    RigCtl(source.target, pool),
+                    RigCtl(destination.target, pool))
+    syncing = Syncing()
+    syncer = threading.Thread(target=syncing.sync, args=(task,))
+    start = time.time()
+    syncer.start()
+    # the operator turns the dial: the source changes every poll
+    tuner = RigCtl(source.target, ConnectionPool())
+    index = 0
+    while time.time() - start < args.duration:
+        tuner.set_frequency(channels[index % len(channels)])
+        index += 1
+        time.sleep(.2)
+    syncing.terminate()
+    syncer.join()
+    elapsed = time.time() - start
+    tuner.pool.close_all()
+    pool.close_all()
+    source.stop()
+    destination.stop()
+    stats = syncing.stats.as_dict()
+    destination_stats = stats["destinations"].get(0, {})
+    return {"elapsed": elapsed,
+            "ticks": stats["ticks"],
+            "ticks_per_sec": stats["ticks"] / elapsed,
+            "commands_per_sec": (source.commands +
+                                 destination.commands) / elapsed,
+            "source_read": stats["source_read"]["mean"],
+            "destination_write": destination_stats.get("write",
+                                                       {}).get("mean"),
+            "propagation": destination_stats.get("propagation",
+                                                 {}).get("mean"),
+            "lag_ticks": destination_stats.get("lag_ticks", {}).get("max")}
+
+def bookmark_files(args):
+    """Writes and reads the bookmarks in every format."""
+
+    rng = random.Random(args.seed)
+    rows = [(BAND_START + rng.randrange(0, 10 ** 9),
+             rng.choice(CBB_MODES),
+             "bookmark {}".format(i),
+             rng.choice("LO"))
+            for i in range(args.bookmarks)]
+    directory = tempfile.mkdtemp()
+    timings = {}
+
+    def timed(name, function):
+        start = time.time()
+        result = function()
+        timings[name] = time.time() - start
+        return result
+
+    try:
+        bookmark_set = timed("set_build", lambda: BookmarkSet(rows))
+
+        csv_file = os.path.join(directory, "bookmarks.csv")
+        io = IO()
+        io.row_list = [[str(row[0])] + list(row[1:]) for row in bookmark_set]
+        timed("csv_save", lambda: io.csv_save(csv_file, ","))
+        timed("csv_load", lambda: BookmarkSet((int(row[0]),) + tuple(row[1:])
+                                              for row in
+                                              IO().csv_iter(csv_file, ",")))
+
+        binary_file = os.path.join(directory, "bookmarks.rrb")
+        timed("binary_save", lambda: BookmarkFile.save(binary_file,
+                                                       bookmark_set))
+        bookmark_file = timed("binary_open", lambda: BookmarkFile(binary_file))
+        timed("binary_lookup", lambda: [bookmark_file.nearest(row[0])
+                                        for row in rows[:1000]])
+        bookmark_file.close()
+
+        database = BookmarkDatabase(os.path.join(directory, "bookmarks.db"))
+        timed("sqlite_save", lambda: database.save(bookmark_set))
+        timed("sqlite_load", database.load)
+        database.close()
+    finally:
+        shutil.rmtree(directory)
+    timings["bookmarks"] = args.bookmarks
+    return timings
+
+def report(name, result):
+    """Writes the result of a benchmark on the standard output, the
+    details are left to the JSON file.
+    """
+
+    values = ", ".join("{}={}".format(key,
+                                      "{:.4f}".format(value)
+                                      if isinstance(value, float) else value)
+                       for key, value in sorted(result.items())
+                       if not isinstance(value, dict))
+    print("{}: {}".format(name, values))
+
+# entry point
+if __name__ == "__main__":
+    args = input_arguments()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        stream=sys.stderr,
+                        format="%(asctime)s %(message)s")
+
+    results = {}
+    for name in args.benchmarks or BENCHMARKS:
+        before = peak_memory()
+        result = globals()[name](args)
+        after = peak_memory()
+        result["peak_rss_growth_kb"] = (after - before
+                                        if after is not None else None)
+        results[name] = result
+        report(name, result)
+
+    if args.json_file:
+        with open(args.json_file, "w") as json_file:
+            json.dump(results, json_file, indent=2, sort_keys=True)
@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+
+"""
+Scans with a rig using rigctl protocol, without the UI.
+The signals found are written as JSON lines.
+
+Please refer to:
+http://gqrx.dk/
+http://gqrx.dk/doc/remote-control
+http://sourceforge.net/apps/mediawiki/hamlib/index.php?title=Documentation
+
+Author: Simone Marzona <marzona@knoway.info>
+
+License: MIT License
+
+Copyright (c) 2015 Simone Marzona
+"""
+
+# import modules
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import textwrap
+import threading
+import time
+from rig_remote.bookmark_file import BookmarkFile
+from rig_remote.bookmark_set import BookmarkSet
+from rig_remote.constants import (
+                                  DEFAULT_CONFIG,
+                                  BINARY_BOOKMARK_EXTENSION,
+                                  BM,
+                                  CBB_MODES,
+                                  )
+from rig_remote.disk_io import IO, JsonLogFile, SqliteLogFile, is_sqlite
+from rig_remote.exceptions import InvalidPathError, FormatError
+from rig_remote.rigctl import RigCtl
+from rig_remote.scanning import Scanning, ScanningTask
+from rig_remote.scan_farm import ScanFarm
+from rig_remote.stmessenger import STMessenger
+from rig_remote.utility import (
+                                khertz_to_hertz,
+                                frequency_pp_parse,
+                                is_valid_hostname,
+                                is_valid_port,
+                                process_path,
+                               )
+from rig_remote.connection_pool import rig_pool
+
+# logging configuration
+logger = logging.getLogger(__name__)
+
+# helper functions
+def input_arguments():
+    """Argument parser.
+
+    """
+
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=textwrap.dedent(textwrap.fill(
+            "Scans frequencies or bookmarks with a rig using the rigctl "
+            "protocol, without the UI. Every signal found is written as "
+            "a JSON line.")),
+        epilog="""Please refer to:
+        https://github.com/Marzona/rig-remote/wiki
+        http://gqrx.dk/,
+        http://gqrx.dk/doc/remote-control,
+        http://sourceforge.net/apps/mediawiki/hamlib/index.php?title=Documentation
+
+        License: MIT License""")
+
+    parser.add_argument("--rig",
+                        "-r",
+                        type=str,
+                        action="append",
+                        dest="rigs",
+                        help="Rig to scan with, as hostname:port, defaults "
+                             "to {}:{}. Repeat it to scan with several rigs, "
+                             "one process for every rig.".format(
+                                 DEFAULT_CONFIG["hostname1"],
+                                 DEFAULT_CONFIG["port1"]))
+    parser.add_argument("--interleaved",
+                        dest="interleaved",
+                        action="store_true",
+                        help="With several rigs, every rig scans the whole "
+                             "range taking one channel every rig, instead "
+                             "of its own sub-band.")
+
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--range",
+                        type=int,
+                        nargs=2,
+                        metavar=("MIN", "MAX"),
+                        dest="range",
+                        help="Frequency range to scan, in kHz.")
+    source.add_argument("--bookmarks",
+                        "-b",
+                        type=str,
+                        dest="bookmark_file",
+                        help="Bookmark file to scan.")
+
+    parser.add_argument("--known",
+                        "-k",
+                        type=str,
+                        dest="known_file",
+                        help="Bookmark file of the known channels, the "
+                             "signals found on them are reported with the "
+                             "bookmark description.")
+    parser.add_argument("--skip-known",
+                        dest="skip_known",
+                        action="store_true",
+                        help="Don't scan the channels in the --known "
+                             "bookmark file.")
+    parser.add_argument("--spectrum",
+                        type=str,
+                        dest="spectrum_file",
+                        help="Scan the range in an FFT dump file "
+                             "(rtl_power csv format) instead of tuning "
+                             "every channel.")
+    parser.add_argument("--interval",
+                        "-i",
+                        type=int,
+                        default=int(DEFAULT_CONFIG["interval"]),
+                        dest="interval",
+                        help="Frequency scan step, in kHz.")
+    parser.add_argument("--delay",
+                        "-d",
+                        type=float,
+                        default=float(DEFAULT_CONFIG["delay"]),
+                        dest="delay",
+                        help="Seconds to stay on a signal.")
+    parser.add_argument("--passes",
+                        type=int,
+                        default=1,
+                        dest="passes",
+                        help="Number of passes, 0 scans until stopped.")
+    parser.add_argument("--sgn-level",
+                        "-s",
+                        type=int,
+                        default=int(DEFAULT_CONFIG["sgn_level"]),
+                        dest="sgn_level",
+                        help="Minimum signal level, in dBFS.")
+    parser.add_argument("--rig-mode",
+                        "-m",
+                        type=str,
+                        dest="rig_mode",
+                        help="Mode set on the rig for a frequency scan.")
+    parser.add_argument("--wait",
+                        "-w",
+                        dest="wait",
+                        action="store_true",
+                        help="Stay on a bookmark while the signal is on.")
+    parser.add_argument("--record",
+                        dest="record",
+                        action="store_true",
+                        help="Record the signals found.")
+    parser.add_argument("--output",
+                        "-o",
+                        type=str,
+                        default="-",
+                        dest="output",
+                        help="File the signals are appended to, "
+                             "defaults to the standard output. A file "
+                             "ending with .db, .sqlite or .sqlite3 is an "
+                             "SQLite database.")
+    parser.add_argument("--stats",
+                        type=str,
+                        dest="stats_file",
+                        help="File the scan statistics are written to as "
+                             "JSON when the scan ends: channels per second "
+                             "and time spent in every phase of every pass, "
+                             "latency of every rigctl command.")
+    parser.add_argument("--verbose",
+                        "-v",
+                        dest="verbose",
+                        action="store_true",
+                        help="Increase log verbosity.")
+
+    return parser.parse_args()
+
+def log_configuration(verbose):
+    """Logger configuration: time/date formatting, the log goes to
+    the standard error, the standard output carries the results.
+
+    """
+
+    os.environ["TZ"] = "UTC"
+
+    # Windows doesn't support tzset. Ignore for now.
+    try:
+        time.tzset()
+    except AttributeError:
+        pass
+
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING,
+                        stream=sys.stderr,
+                        format="%(asctime)s %(message)s",
+                        datefmt="%m/%d/%Y %I:%M:%S %p %Z")
+
+    return logging.getLogger(__name__)
+
+def rig_target(rig):
+    """Builds the rig target from hostname:port.
+
+    :param rig: rig address
+    :type rig: string
+    :raises: ValueError if the address is not valid
+    :returns: the rig target, as built by build_rig_uri
+    :return type: dictionary
+    """
+
+    hostname, _, port = rig.rpartition(":")
+    if not hostname or not port.isdigit():
+        raise ValueError("The rig must be given as hostname:port")
+    is_valid_hostname(hostname)
+    is_valid_port(port)
+    return {"hostname": hostname,
+            "port": port,
+            "rig_number": 1}
+
+def load_bookmarks(bookmark_file):
+    """Reads the bookmarks to scan, validated as the UI does: a missing
+    description is empty, a missing lockout is "O", the lines with an
+    invalid frequency or mode are skipped.
+
+    :param bookmark_file: bookmark file, in rig-remote csv format
+    :type bookmark_file: string
+    :raises: InvalidPathError if the file doesn't exist
+    :returns: the bookmarks, frequency in hertz
+    :return type: list of lists
+    """
+
+    io = IO()
+    bookmarks = []
+    invalid = []
+    for count, line in enumerate(io.csv_iter(process_path(bookmark_file),
+                                             ","), 1):
+        if len(line) < BM.desc:
+            invalid.append(count)
+            continue
+        line = line + ["", "O"][len(line) - BM.desc:]
+        freq = frequency_pp_parse(line[BM.freq])
+        if not freq or line[BM.mode] not in CBB_MODES:
+            invalid.append(count)
+            continue
+        line[BM.freq] = int(freq)
+        bookmarks.append(line)
+    if invalid:
+        logger.warning("Invalid bookmarks skipped in {}, "
+                       "lines: {}".format(bookmark_file, invalid))
+    return bookmarks
+
+def load_known(known_file):
+    """Reads the bookmarks of the known channels. A binary bookmark
+    file is mapped, not read.
+
+    :param known_file: bookmark file, in rig-remote csv or binary format
+    :type known_file: string
+    :raises: InvalidPathError if the file doesn't exist
+    :raises: FormatError if a binary file is not valid
+    :returns: the bookmarks
+    :return type: BookmarkSet or BookmarkFile
+    """
+
+    if known_file.endswith(BINARY_BOOKMARK_EXTENSION):
+        return BookmarkFile(process_path(known_file))
+    return BookmarkSet(load_bookmarks(known_file))
+
+def build_task(args, scanq, target):
+    """Builds the scanning task described by the arguments."""
+
+    params = {}
+    if args.range:
+        params["range_min"] = khertz_to_hertz(args.range[0])
+        params["range_max"] = khertz_to_hertz(args.range[1])
+        bookmarks = load_known(args.known_file) if args.known_file else []
+        mode = "spectrum" if args.spectrum_file else "frequency"
+    else:
+        params["range_min"] = 0
+        params["range_max"] = 0
+        bookmarks = load_bookmarks(args.bookmark_file)
+        mode = "bookmarks"
+    if args.spectrum_file:
+        params["spectrum_file"] = process_path(args.spectrum_file)
+    params["interval"] = args.interval
+    params["delay"] = args.delay
+    params["passes"] = args.passes
+    params["sgn_level"] = args.sgn_level
+    params["rig_mode"] = args.rig_mode
+    params["wait"] = args.wait
+    params["record"] = args.record
+    params["skip_known"] = args.skip_known
+    params["log"] = True
+    params["auto_bookmark"] = False
+    return ScanningTask(scanq,
+                        mode,
+                        bookmarks,
+                        [],
+                        params,
+                        RigCtl(target),
+                        args.output)
+
+# entry point
+if __name__ == "__main__":
+    args = input_arguments()
+    logger = log_configuration(args.verbose)
+
+    try:
+        rigs = args.rigs or ["{}:{}".format(DEFAULT_CONFIG["hostname1"],
+                                            DEFAULT_CONFIG["port1"])]
+        targets = [rig_target(rig) for rig in rigs]
+        task = build_task(args, STMessenger(), targets[0])
+    except (ValueError, InvalidPathError, FormatError, socket.error) as e:
+        logger.error("Invalid scan configuration: {}".format(e))
+        sys.exit(2)
+
+    log = SqliteLogFile() if is_sqlite(task.log_filename) else JsonLogFile()
+    log.open(task.log_filename)
+    if log.log_file is None:
+        sys.exit(1)
+
+    if len(targets) > 1:
+        if task.mode not in ("bookmarks", "frequency"):
+            logger.error("Several rigs can scan only bookmarks or a range.")
+            sys.exit(2)
+        scanner = ScanFarm()
+        scan_args = (task.mode,
+                     task.params,
+                     targets,
+                     log,
+                     task.bookmarks,
+                     args.interleaved)
+    else:
+        scanner = Scanning()
+        scan_args = (task, log)
+
+    def stop(signum, frame):
+        logger.info("Stopping the scan.")
+        scanner.terminate()
+
+    failed = []
+
+    def run_scan():
+        try:
+            scanner.scan(*scan_args)
+        except Exception:
+            logger.exception("The scan failed.")
+            failed.append(True)
+
+    signal.signal(signal.SIGTERM, stop)
+    scan_thread = threading.Thread(target=run_scan)
+    scan_thread.start()
+    while scan_thread.is_alive():
+        try:
+            scan_thread.join(1)
+        except KeyboardInterrupt:
+            stop(signal.SIGINT, None)
+    log.close()
+    rig_pool.close_all()
+    if args.stats_file:
+        if isinstance(scanner, Scanning):
+            try:
+                scanner.stats.dump(process_path(args.stats_file))
+            except IOError:
+                logger.exception("Error while writing the scan statistics.")
+        else:
+            logger.warning("Scan statistics are kept only when scanning "
+                           "with one rig.")
+    if failed or (isinstance(scanner, ScanFarm) and scanner.errors):
+        sys.exit(1)
@@ -32,6 +32,7 @@ from rig_remote.constants import DEFAULT_CONFIG_FILENAME
 from rig_remote.constants import DEFAULT_LOG_FILENAME
 from rig_remote.constants import DEFAULT_PREFIX
 from rig_remote.utility import process_path
+from rig_remote.connection_pool import rig_pool
 
 # helper functions
 def input_arguments():
@@ -160,3 +161,4 @@ if __name__ == "__main__":
     app.mainloop()
     if app.scan_thread != None :
         app.scanning.terminate()
+    rig_pool.close_all()
@@ -0,0 +1,409 @@
+#!/usr/bin/env python
+
+"""
+Remote application that interacts with rigs using rigctl protocol.
+
+Please refer to:
+http://gqrx.dk/
+http://gqrx.dk/doc/remote-control
+http://sourceforge.net/apps/mediawiki/hamlib/index.php?title=Documentation
+
+Author: Rafael Marmelo
+Author: Simone Marzona
+
+License: MIT License
+
+Copyright (c) 2014 Rafael Marmelo
+Copyright (c) 2015 Simone Marzona
+"""
+
+import errno
+import logging
+import select
+import socket
+import time
+from collections import deque
+from rig_remote.rigctl import RigCtl
+from rig_remote.exceptions import RigCtlError
+from rig_remote.constants import (
+                                  RIG_TIMEOUT,
+                                  RIG_COMMAND_TIMEOUT,
+                                  COMMAND_TIMEOUTS,
+                                  )
+
+# logging configuration
+logger = logging.getLogger(__name__)
+
+
+# classes definition
+class RigFuture(object):
+    """Reply to a command sent with AsyncRigCtl, it is filled in
+    by the RigLoop when the rig answers.
+    """
+
+    def __init__(self, transform=None):
+        """
+        :param transform: applied to the reply before storing it, it
+        may raise ValueError to reject the reply
+        :type transform: function
+        """
+
+        self._transform = transform
+        self._done = False
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        """Returns the reply.
+
+        :raises: the exception the command failed with, RuntimeError
+        if the reply didn't arrive yet
+        """
+
+        if not self._done:
+            raise RuntimeError("Reply not received yet.")
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self):
+        return self._exception
+
+    def add_done_callback(self, callback):
+        """callback is called with the future once the reply arrived."""
+
+        if self._done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def set_result(self, reply):
+        if self._transform is not None:
+            try:
+                reply = self._transform(reply)
+            except ValueError as e:
+                self.set_exception(e)
+                return
+        self._result = reply
+        self._finish()
+
+    def set_exception(self, exception):
+        self._exception = exception
+        self._finish()
+
+    def _finish(self):
+        self._done = True
+        for callback in self._callbacks:
+            callback(self)
+        self._callbacks = []
+
+
+class RigLoop(object):
+    """Single threaded loop driving the connections of any number of
+    AsyncRigCtl instances with select().
+    """
+
+    def __init__(self):
+        self._connections = set()
+
+    def register(self, connection):
+        self._connections.add(connection)
+
+    def unregister(self, connection):
+        self._connections.discard(connection)
+
+    def poll(self, timeout=0):
+        """Runs one iteration of the loop: sends what is queued, reads
+        what arrived and fails the commands that timed out.
+
+        :param timeout: max seconds to wait for the sockets
+        :type timeout: float
+        """
+
+        connections = list(self._connections)
+        if not connections:
+            time.sleep(timeout)
+            return
+        deadlines = [c.deadline() for c in connections
+                     if c.deadline() is not None]
+        if deadlines:
+            timeout = max(0, min([timeout] + [d - time.time() for d in deadlines]))
+        readers = [c for c in connections if c.connected]
+        writers = [c for c in connections if c.wants_write()]
+        try:
+            readable, writable, _ = select.select(readers, writers, [], timeout)
+        except (select.error, socket.error, ValueError):
+            logger.exception("Error while waiting on the rig connections.")
+            readable, writable = [], []
+        for connection in writable:
+            connection.handle_write()
+        for connection in readable:
+            connection.handle_read()
+        now = time.time()
+        for connection in connections:
+            connection.check_timeout(now)
+
+    def run_until_complete(self, futures):
+        """Runs the loop until futures are done.
+
+        :param futures: what we are waiting for
+        :type futures: RigFuture or list of RigFuture
+        :raises: the exception of the first failed future
+        :returns: the reply, or the list of replies in the same order
+        """
+
+        if isinstance(futures, RigFuture):
+            return self.run_until_complete([futures])[0]
+        while not all(future.done() for future in futures):
+            self.poll(RIG_COMMAND_TIMEOUT)
+        return [future.result() for future in futures]
+
+
+class AsyncConnection(object):
+    """Non blocking connection to a rig, commands are pipelined
+    and the replies are matched to them in order. The replies are split
+    with the rules of the blocking RigCtl, see RigCtl._reply_complete.
+    """
+
+    def __init__(self, target, loop, rig):
+        """
+        :param target: rig uri data
+        :type target: dict created from build_rig_uri
+        :param loop: loop driving the connection
+        :type loop: RigLoop object
+        :param rig: client that parses the replies
+        :type rig: AsyncRigCtl object
+        """
+
+        self.target = target
+        self.key = (target["hostname"], str(target["port"]))
+        self.loop = loop
+        self.rig = rig
+        self.connected = False
+        self.closed = False
+        self._inbuf = b""
+        self._outbuf = b""
+        self._pending = deque()
+        self._connect_deadline = time.time() + RIG_TIMEOUT
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setblocking(0)
+        err = self.sock.connect_ex((target["hostname"], int(target["port"])))
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            self.sock.close()
+            logger.error("Connection refused on "
+                         "{}:{}".format(target["hostname"], target["port"]))
+            raise socket.error(err, "Connection refused")
+        loop.register(self)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def send(self, request, future):
+        """Queues request, future will receive the reply.
+
+        :param request: rigctl command
+        :type request: string
+        :param future: where the reply is delivered
+        :type future: RigFuture object
+        """
+
+        command = request.split()[0]
+        timeout = COMMAND_TIMEOUTS.get(command, RIG_COMMAND_TIMEOUT)
+        self._outbuf += ('%s\n' % request).encode('ascii')
+        self._pending.append([future,
+                              request,
+                              timeout,
+                              [],
+                              time.time() + timeout])
+
+    def deadline(self):
+        if not self.connected:
+            return self._connect_deadline
+        if self._pending:
+            return self._pending[0][4]
+        return None
+
+    def _complete(self):
+        """Delivers the reply of the first pending command."""
+
+        future, request, _, lines, _ = self._pending.popleft()
+        try:
+            reply = self.rig._parse_reply(self.key, request, lines)
+        except RigCtlError as e:
+            future.set_exception(e)
+            return
+        future.set_result(reply)
+
+    def wants_write(self):
+        return not self.connected or bool(self._outbuf)
+
+    def handle_write(self):
+        if not self.connected:
+            err = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                self.fail(socket.error(err, "Connection refused on "
+                                            "{}:{}".format(self.target["hostname"],
+                                                           self.target["port"])))
+                return
+            self.connected = True
+        try:
+            sent = self.sock.send(self._outbuf)
+        except socket.error as e:
+            if e.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                self.fail(e)
+            return
+        self._outbuf = self._outbuf[sent:]
+
+    def handle_read(self):
+        try:
+            data = self.sock.recv(4096)
+        except socket.error as e:
+            if e.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                self.fail(e)
+            return
+        if not data:
+            self.fail(EOFError("Connection closed by the rig."))
+            return
+        self._inbuf += data
+        while b"\n" in self._inbuf:
+            line, self._inbuf = self._inbuf.split(b"\n", 1)
+            if not self._pending:
+                logger.warning("Unexpected data from the rig: {}".format(line))
+                continue
+            pending = self._pending[0]
+            pending[3].append(line.decode('ascii').strip())
+            if self.rig._reply_complete(self.key, pending[1], pending[3]):
+                self._complete()
+
+    def check_timeout(self, now):
+        deadline = self.deadline()
+        if deadline is not None and now > deadline:
+            if (self.connected and self._pending and self._pending[0][3] and
+                not self._pending[0][1].startswith("+") and not self._inbuf):
+                # a short reply, as the one of older gqrx versions to 'm'
+                command = self._pending[0][1].split()[0]
+                self.rig._learn_reply_lines(self.key, command,
+                                            len(self._pending[0][3]))
+                self._complete()
+                # the commands queued behind it waited for it
+                for pending in self._pending:
+                    pending[4] = max(pending[4], now + pending[2])
+                return
+            # a late reply would be matched to the wrong command,
+            # so the connection can't be used anymore
+            request = self._pending[0][1] if self._pending else "connect"
+            logger.error("Time out waiting for {} on "
+                         "{}:{}".format(request,
+                                        self.target["hostname"],
+                                        self.target["port"]))
+            self.fail(socket.timeout("Time out waiting for {}".format(request)))
+
+    def fail(self, exception):
+        """Closes the connection failing all the pending commands."""
+
+        self.closed = True
+        self.loop.unregister(self)
+        try:
+            self.sock.close()
+        except socket.error:
+            pass
+        while self._pending:
+            self._pending.popleft()[0].set_exception(exception)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.loop.unregister(self)
+            self.sock.close()
+
+
+class AsyncRigCtl(RigCtl):
+    """rigctl client that doesn't block: every command returns
+    a RigFuture and the replies are collected by a RigLoop, so that one
+    thread can drive many rigs at once.
+    The setters are the ones of RigCtl, with the same validation.
+    """
+
+    def __init__(self, target, loop):
+        """
+        :param target: rig uri data
+        :type target: dict created from build_rig_uri
+        :param loop: loop driving the connections
+        :type loop: RigLoop object
+        """
+
+        RigCtl.__init__(self, target, pool=None)
+        self.loop = loop
+        self._connections = {}
+
+    def _connection(self, target):
+        key = (target["hostname"], str(target["port"]))
+        connection = self._connections.get(key)
+        if connection is None or connection.closed:
+            connection = AsyncConnection(target, self.loop, self)
+            self._connections[key] = connection
+        return connection
+
+    def _request(self, request, target=None, transform=None):
+        """Queues request on the connection to target.
+
+        :param request: rigctl command
+        :type request: string
+        :param transform: applied to the reply
+        :type transform: function
+        :returns: RigFuture for the reply
+        """
+
+        future = RigFuture(transform)
+        try:
+            connection = self._connection(target or self.target)
+        except socket.error as e:
+            future.set_exception(e)
+            return future
+        connection.send(request, future)
+        return future
+
+    def batch(self, requests, target=None):
+        return [self._request(request, target) for request in requests]
+
+    def close(self):
+        for connection in self._connections.values():
+            connection.close()
+        self._connections = {}
+
+    def get_frequency(self, target=None):
+        return self._request('f', target)
+
+    def get_mode(self, target=None):
+        return self._request('m', target, lambda reply: reply.split("\n")[0])
+
+    def get_level(self):
+        return self._request('l')
+
+    def get_vfo(self):
+        return self._request('v')
+
+    def get_rit(self):
+        return self._request('j')
+
+    def get_xit(self):
+        return self._request('z')
+
+    def get_split_freq(self):
+        return self._request('i', transform=int)
+
+    def get_split_mode(self):
+        return self._request('x')
+
+    def get_func(self):
+        return self._request('u')
+
+    def get_parm(self):
+        return self._request('p')
+
+    def get_antenna(self):
+        return self._request('y', transform=int)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+
+"""
+Remote application that interacts with rigs using rigctl protocol.
+
+Please refer to:
+http://gqrx.dk/
+http://gqrx.dk/doc/remote-control
+http://sourceforge.net/apps/mediawiki/hamlib/index.php?title=Documentation
+
+Author: Rafael Marmelo
+Author: Simone Marzona
+
+License: MIT License
+
+Copyright (c) 2014 Rafael Marmelo
+Copyright (c) 2015 Simone Marzona
+"""
+
+# import modules
+import logging
+import mmap
+import struct
+import threading
+from bisect import bisect_left
+from rig_remote.bookmark_set import SortedBookmarks
+from rig_remote.disk_io import atomic_open
+from rig_remote.constants import (
+                                  BM,
+                                  BINARY_BOOKMARK_MAGIC,
+                                  BINARY_BOOKMARK_VERSION,
+                                 )
+from rig_remote.exceptions import InvalidPathError, FormatError
+
+# logging configuration
+logger = logging.getLogger(__name__)
+
+# magic, version, number of modes, reserved, number of bookmarks,
+# offset of the string table
+HEADER = struct.Struct("<8sHHIQQ")
+# mode name, the mode code is its position in the mode table
+MODE_NAME = struct.Struct("<16s")
+# frequency in hertz, mode code, lockout, description length and
+# offset in the string table
+RECORD = struct.Struct("<qBBHI")
+FREQ = struct.Struct("<q")
+# position of the mode code and of the lockout in a record
+MODE_OFFSET = 8
+LOCKOUT_OFFSET = 9
+
+
+# class definition
+class _Frequencies(object):
+    """Frequencies of a BookmarkFile, read from the map when accessed,
+    so that a bisect touches only the pages it needs.
+
+    """
+
+    def __init__(self, bookmark_file):
+        self.bookmark_file = bookmark_file
+
+    def __len__(self):
+        return self.bookmark_file.count
+
+    def __getitem__(self, index):
+        return self.bookmark_file._freq(index)
+
+
+class BookmarkFile(SortedBookmarks):
+    """Read only bookmarks in the binary format, memory mapped:
+
+    header, mode table, records sorted by frequency, string table
+
+    The records have a fixed size, so a bookmark is read only when it is
+    needed and opening the file reads the header and the mode table only.
+    Opened for writing, the lockouts can be changed in place.
+
+    """
+
+    def __init__(self, filename, writable=False):
+        """
+        :param filename: binary bookmark file
+        :type filename: string
+        :param writable: open the file for set_lockout
+        :type writable: boolean
+        :raises InvalidPathError: if the file can't be read
+        :raises FormatError: if the file is not a binary bookmark file
+        """
+
+        self.filename = filename
+        self.writable = writable
+        self.lock = threading.Lock()
+        try:
+            self._file = open(filename, "r+b" if writable else "rb")
+        except (IOError, OSError):
+            logger.exception("Error while reading {}".format(filename))
+            raise InvalidPathError
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_WRITE if writable
+                                  else mmap.ACCESS_READ)
+        except (ValueError, mmap.error):
+            self._file.close()
+            logger.error("{} is not a bookmark file.".format(filename))
+            raise FormatError
+        try:
+            self._read_header()
+        except FormatError:
+            self.close()
+            raise
+        self.freqs = _Frequencies(self)
+
+    def _read_header(self):
+        if len(self._map) < HEADER.size:
+            logger.error("{} is not a bookmark file.".format(self.filename))
+            raise FormatError
+        magic, version, mode_count, _, self.count, self._strings = \
+                HEADER.unpack_from(self._map, 0)
+        if magic != BINARY_BOOKMARK_MAGIC or \
+           version != BINARY_BOOKMARK_VERSION:
+            logger.error("{} is not a bookmark file, or its version "
+                         "is not supported.".format(self.filename))
+            raise FormatError
+        self._records = HEADER.size + mode_count * MODE_NAME.size
+        if self._records + self.count * RECORD.size > self._strings or \
+           self._strings > len(self._map):
+            logger.error("{} is truncated.".format(self.filename))
+            raise FormatError
+        self.mode_names = [MODE_NAME.unpack_from(self._map,
+                                                 HEADER.size +
+                                                 code * MODE_NAME.size)[0].rstrip(b"\0")
+                           for code in range(mode_count)]
+
+    def _offset(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("bookmark index out of range")
+        return self._records + index * RECORD.size
+
+    def _freq(self, index):
+        return FREQ.unpack_from(self._map, self._offset(index))[0]
+
+    def _row(self, index):
+        freq, mode, lockout, length, offset = \
+                RECORD.unpack_from(self._map, self._offset(index))
+        start = self._strings + offset
+        return (freq,
+                self.mode_names[mode],
+                self._map[start:start + length],
+                "L" if lockout else "O")
+
+    def set_lockout(self, freq, mode, locked):
+        """Changes the lockout of a bookmark in the file.
+
+        :param freq: frequency in hertz
+        :type freq: int
+        :param mode: bookmark mode
+        :type mode: string
+        :param locked: True to lock the bookmark out
+        :type locked: boolean
+        :returns: False if the bookmark is not in the file
+        """
+
+        if mode not in self.mode_names:
+            return False
+        code = self.mode_names.index(mode)
+        with self.lock:
+            index = bisect_left(self.freqs, freq)
+            while index < self.count and self._freq(index) == freq:
+                offset = self._offset(index)
+                if ord(self._map[offset + MODE_OFFSET:offset + MODE_OFFSET + 1]) == code:
+                    self._map[offset + LOCKOUT_OFFSET:offset + LOCKOUT_OFFSET + 1] = \
+                            b"\x01" if locked else b"\x00"
+                    return True
+                index += 1
+        return False
+
+    def close(self):
+        if self.writable:
+            self._map.flush()
+        self._map.close()
+        self._file.close()
+
+    @staticmethod
+    def save(filename, rows):
+        """Writes bookmarks in the binary format. The file is replaced
+        only once it is completely written.
+
+        :param filename: file to write
+        :type filename: string
+        :param rows: the bookmarks, frequency in hertz
+        :type rows: iterable of rows
+        :raises FormatError: if there are more than 256 modes, or a mode
+        name or a description can't be stored
+        :raises: IOError, OSError if the file can't be written
+        """
+
+        rows = sorted(rows, key=lambda row: int(row[BM.freq]))
+        modes = []
+        codes = {}
+        records = []
+        strings = []
+        offset = 0
+        for row in rows:
+            mode = row[BM.mode]
+            if mode not in codes:
+                try:
+                    name = mode if isinstance(mode, bytes) else mode.encode("ascii")
+                except UnicodeError:
+                    name = None
+                if len(modes) > 255 or name is None or len(name) > MODE_NAME.size:
+                    logger.error("Can't save the mode {}".format(mode))
+                    raise FormatError
+                codes[mode] = len(modes)
+                modes.append(name)
+            desc = row[BM.desc]
+            if not isinstance(desc, bytes):
+                desc = desc.encode("utf-8")
+            if len(desc) > 0xffff:
+                logger.error("Description of the bookmark on {} "
+                             "is too long.".format(row[BM.freq]))
+                raise FormatError
+            records.append(RECORD.pack(int(row[BM.freq]),
+                                       codes[mode],
+                                       1 if row[BM.lockout] == "L" else 0,
+                                       len(desc),
+                                       offset))
+            strings.append(desc)
+            offset += len(desc)
+        records_offset = HEADER.size + len(modes) * MODE_NAME.size
+        with atomic_open(filename, "wb") as data_file:
+            data_file.write(HEADER.pack(BINARY_BOOKMARK_MAGIC,
+                                        BINARY_BOOKMARK_VERSION,
+                                        len(modes),
+                                        0,
+                                        len(records),
+                                        records_offset +
+                                        len(records) * RECORD.size))
+            for name in modes:
+                data_file.write(MODE_NAME.pack(name))
+            data_file.write(b"".join(records))
+            data_file.write(b"".join(strings))
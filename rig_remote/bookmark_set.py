@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+
+"""
+Remote application that interacts with rigs using rigctl protocol.
+
+Please refer to:
+http://gqrx.dk/
+http://gqrx.dk/doc/remote-control
+http://sourceforge.net/apps/mediawiki/hamlib/index.php?title=Documentation
+
+Author: Rafael Marmelo
+Author: Simone Marzona
+
+License: MIT License
+
+Copyright (c) 2014 Rafael Marmelo
+Copyright (c) 2015 Simone Marzona
+"""
+
+# import modules
+import logging
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from rig_remote.constants import CBB_MODES
+
+# logging configuration
+logger = logging.getLogger(__name__)
+
+# typecode of the frequency array: a signed 64 bit integer where long
+# is 64 bit, a double (exact for every frequency in hertz) elsewhere
+FREQ_TYPECODE = "l" if array("l").itemsize == 8 else "d"
+
+
+# class definition
+class SortedBookmarks(object):
+    """Lookups shared by the bookmark collections sorted by frequency.
+    A subclass provides freqs, a sequence of the frequencies in hertz,
+    _row(index), that reads a bookmark, and lock.
+
+    """
+
+    def __len__(self):
+        return len(self.freqs)
+
+    def __iter__(self):
+        """Iterates the bookmarks, reading every row when it is reached
+        so that lockouts set meanwhile are seen.
+        """
+
+        index = 0
+        while True:
+            with self.lock:
+                if index >= len(self.freqs):
+                    return
+                row = self._row(index)
+            yield row
+            index += 1
+
+    def __getitem__(self, index):
+        with self.lock:
+            return self._row(index)
+
+    def in_range(self, low, high):
+        """Finds the bookmarks between two frequencies, ends included.
+
+        :param low: lower frequency, in hertz
+        :type low: int
+        :param high: upper frequency, in hertz
+        :type high: int
+        :returns: the bookmarks, sorted by frequency
+        :return type: list of rows
+        """
+
+        with self.lock:
+            start = bisect_left(self.freqs, low)
+            stop = bisect_right(self.freqs, high)
+            return [self._row(index) for index in range(start, stop)]
+
+    def within(self, freq, tolerance):
+        """Finds the bookmarks at most tolerance away from freq.
+
+        :param freq: frequency in hertz
+        :type freq: int
+        :param tolerance: distance in hertz
+        :type tolerance: int
+        :returns: the bookmarks, sorted by frequency
+        :return type: list of rows
+        """
+
+        return self.in_range(freq - tolerance, freq + tolerance)
+
+    def nearest(self, freq):
+        """Finds the bookmark closest to freq.
+
+        :param freq: frequency in hertz
+        :type freq: int
+        :returns: the bookmark, None if there are no bookmarks
+        :return type: row
+        """
+
+        with self.lock:
+            count = len(self.freqs)
+            if not count:
+                return None
+            index = bisect_left(self.freqs, freq)
+            if index == count or \
+               (index > 0 and freq - self.freqs[index - 1] <= self.freqs[index] - freq):
+                index -= 1
+            return self._row(index)
+
+
+class BookmarkSet(SortedBookmarks):
+    """Bookmarks kept in parallel arrays sorted by frequency: frequency
+    in hertz, mode code, lockout flag and description. A bookmark is
+    identified by its frequency and mode.
+    The rows are handed out as tuples indexed with BM, the frequency as
+    int and the lockout as "L" or "O".
+    The set is shared by the UI and the scanning thread, every access
+    holds a lock.
+
+    """
+
+    def __init__(self, rows=()):
+        """
+        :param rows: initial bookmarks
+        :type rows: iterable of rows, see extend
+        """
+
+        self.freqs = array(FREQ_TYPECODE)
+        self.modes = bytearray()
+        self.lockouts = bytearray()
+        self.descs = []
+        self.mode_names = list(CBB_MODES)
+        self._mode_codes = dict((name, code) for code, name in
+                                enumerate(self.mode_names))
+        self.lock = threading.RLock()
+        # changes since the last save, see changes()
+        self._added = set()
+        self._lockouts = set()
+        self._rewrite = False
+        self.extend(rows)
+        self.mark_saved()
+
+    def _key(self, index):
+        return (int(self.freqs[index]), self.mode_names[self.modes[index]])
+
+    def _row(self, index):
+        return (int(self.freqs[index]),
+                self.mode_names[self.modes[index]],
+                self.descs[index],
+                "L" if self.lockouts[index] else "O")
+
+    def _mode_code(self, mode):
+        code = self._mode_codes.get(mode)
+        if code is None:
+            if len(self.mode_names) > 255:
+                logger.error("Too many bookmark modes, can't add {}".format(mode))
+                raise ValueError
+            code = len(self.mode_names)
+            self.mode_names.append(mode)
+            self._mode_codes[mode] = code
+        return code
+
+    def index(self, freq, mode):
+        """Finds a bookmark.
+
+        :param freq: frequency in hertz
+        :type freq: int
+        :param mode: bookmark mode
+        :type mode: string
+        :returns: the position of the bookmark, None if missing
+        """
+
+        with self.lock:
+            code = self._mode_codes.get(mode)
+            if code is None:
+                return None
+            index = bisect_left(self.freqs, freq)
+            while index < len(self.freqs) and self.freqs[index] == freq:
+                if self.modes[index] == code:
+                    return index
+                index += 1
+        return None
+
+    def add(self, freq, mode, desc="", lockout="O"):
+        """Adds a bookmark, keeping the frequency order.
+
+        :param freq: frequency in hertz
+        :type freq: int
+        :param mode: bookmark mode
+        :type mode: string
+        :param desc: description
+        :type desc: string
+        :param lockout: "L" if the bookmark is locked out
+        :type lockout: string
+        :returns: the position of the new bookmark, None if a bookmark
+        with the same frequency and mode exists
+        """
+
+        freq = int(freq)
+        with self.lock:
+            if self.index(freq, mode) is not None:
+                logger.info("Bookmark {} {} already present.".format(freq, mode))
+                return None
+            index = bisect_right(self.freqs, freq)
+            self.freqs.insert(index, freq)
+            self.modes.insert(index, self._mode_code(mode))
+            self.lockouts.insert(index, 1 if lockout == "L" else 0)
+            self.descs.insert(index, desc)
+            self._added.add((freq, mode))
+        return index
+
+    def extend(self, rows):
+        """Adds many bookmarks, sorting once.
+
+        :param rows: the bookmarks, frequency in hertz first, then mode,
+        description and lockout, the last two may be missing
+        :type rows: iterable of tuples or lists
+        :returns: number of bookmarks added, duplicates are skipped
+        """
+
+        with self.lock:
+            merged = list(zip(self.freqs, self.modes, self.descs, self.lockouts))
+            before = len(merged)
+            for row in rows:
+                desc = row[2] if len(row) > 2 else ""
+                lockout = 1 if len(row) > 3 and row[3] == "L" else 0
+                merged.append((int(row[0]), self._mode_code(row[1]), desc,
+                               lockout, True))
+            if len(merged) == before:
+                return 0
+            merged.sort(key=lambda bookmark: bookmark[0])
+            seen = set()
+            unique = []
+            for bookmark in merged:
+                if (bookmark[0], bookmark[1]) not in seen:
+                    seen.add((bookmark[0], bookmark[1]))
+                    unique.append(bookmark)
+                    if len(bookmark) > 4:
+                        self._added.add((bookmark[0],
+                                         self.mode_names[bookmark[1]]))
+            self.freqs = array(FREQ_TYPECODE, [b[0] for b in unique])
+            self.modes = bytearray(b[1] for b in unique)
+            self.descs = [b[2] for b in unique]
+            self.lockouts = bytearray(b[3] for b in unique)
+        return len(unique) - before
+
+    def remove(self, index):
+        with self.lock:
+            key = self._key(index)
+            if key in self._added:
+                self._added.discard(key)
+            else:
+                self._rewrite = True
+            self._lockouts.discard(key)
+            del self.freqs[index]
+            del self.modes[index]
+            del self.descs[index]
+            del self.lockouts[index]
+
+    def is_locked(self, index):
+        with self.lock:
+            return bool(self.lockouts[index])
+
+    def set_lockout(self, index, locked):
+        with self.lock:
+            self.lockouts[index] = 1 if locked else 0
+            key = self._key(index)
+            if key not in self._added:
+                self._lockouts.add(key)
+
+    def clear(self):
+        with self.lock:
+            self._added = set()
+            self._lockouts = set()
+            self._rewrite = True
+            self.freqs = array(FREQ_TYPECODE)
+            self.modes = bytearray()
+            self.lockouts = bytearray()
+            self.descs = []
+
+    @property
+    def dirty(self):
+        """True if the bookmarks changed since the last save."""
+
+        return bool(self._rewrite or self._added or self._lockouts)
+
+    def changes(self):
+        """Tells how the bookmarks changed since the last save, so that
+        a save can update the file instead of writing it again.
+
+        :returns: the bookmarks added, the bookmarks whose lockout
+        changed and whether bookmarks were removed, so that the file
+        must be written again
+        :return type: tuple of list of rows, list of rows, boolean
+        """
+
+        with self.lock:
+            added = [self._row(self.index(*key)) for key in sorted(self._added)]
+            lockouts = [self._row(self.index(*key))
+                        for key in sorted(self._lockouts)]
+            return added, lockouts, self._rewrite
+
+    def mark_saved(self):
+        """Forgets the changes, the bookmarks were saved or loaded."""
+
+        with self.lock:
+            self._added = set()
+            self._lockouts = set()
+            self._rewrite = False
@@ -1,11 +1,18 @@
 #!/usr/bin/env python
 
 # import modules
-from rig_remote.disk_io import IO
+from rig_remote.disk_io import IO, BookmarkDatabase, is_sqlite
+from rig_remote.bookmark_set import BookmarkSet
+from rig_remote.bookmark_file import BookmarkFile
 from rig_remote.constants import (
                                   LEN_BM,
                                   BM,
                                   CBB_MODES,
+                                  BOOKMARK_LOAD_CHUNK,
+                                  BOOKMARK_LOAD_DELAY,
+                                  BINARY_BOOKMARK_EXTENSION,
+                                  BINARY_BOOKMARK_MAGIC,
+                                  SQLITE_MAGIC,
                                   GQRX_FIRST_BOOKMARK,
                                   GQRX_BOOKMARK_FIRST_LINE,
                                   REVERSE_MODE_MAP,
@@ -20,7 +27,7 @@ from rig_remote.utility import (
                                 frequency_pp,
                                )
 import logging
-import Tkinter as tk
+import sqlite3
 import Tkconstants
 import tkMessageBox
 import tkFileDialog
@@ -31,16 +38,144 @@ logger = logging.getLogger(__name__)
 
 # classes definition
 class Bookmarks(object):
-    """Implements the bookmarks management.
+    """Implements the bookmarks management. The bookmarks are kept in
+    a BookmarkSet, the tree shows them.
     """
 
     def __init__(self, tree, io = IO()):
         self.bookmarks = io
         self.tree = tree
+        self.bookmark_set = BookmarkSet()
+        # tree item <-> (frequency, mode) of the bookmark it shows
+        self._keys = {}
+        self._items = {}
+        self._tags_configured = False
+        # rows still to be shown in the tree, and the refresh showing them
+        self._pending = None
+        self._refresh_id = 0
+        # file the bookmarks were last saved to or loaded from
+        self._saved_file = None
+
+    def __iter__(self):
+        """Iterates the bookmarks, a scan sees the changes done
+        while it runs.
+        """
+
+        return iter(self.bookmark_set)
+
+    def __len__(self):
+        return len(self.bookmark_set)
+
+    def _show(self, index, row):
+        """Inserts the bookmark row in the tree at index."""
+
+        self._configure_tags()
+        item = self.tree.insert('', index, values=[frequency_pp(str(row[BM.freq])),
+                                                   row[BM.mode],
+                                                   row[BM.desc],
+                                                   row[BM.lockout]],
+                                tags=self._tag(row[BM.lockout]))
+        self._keys[item] = (row[BM.freq], row[BM.mode])
+        self._items[(row[BM.freq], row[BM.mode])] = item
+        return item
+
+    def _refresh_tree(self):
+        """Shows all the bookmarks in the tree again. The first
+        BOOKMARK_LOAD_CHUNK bookmarks are shown at once, the others
+        from the event loop, a chunk at a time, so that the window stays
+        responsive while a large bookmark file is loaded.
+        """
+
+        if self._keys:
+            self.tree.delete(*self._keys.keys())
+        self._keys = {}
+        self._items = {}
+        self._pending = iter(list(self.bookmark_set))
+        self._refresh_id += 1
+        self._show_chunk(self._refresh_id)
+
+    def _show_chunk(self, refresh_id):
+        """Shows the next chunk of the pending bookmarks and schedules
+        the following one. A newer refresh cancels this one.
+
+        :param refresh_id: refresh this chunk belongs to
+        :type refresh_id: int
+        """
+
+        if refresh_id != self._refresh_id or self._pending is None:
+            return
+        for _ in range(BOOKMARK_LOAD_CHUNK):
+            row = next(self._pending, None)
+            if row is None:
+                self._pending = None
+                return
+            self._show('end', row)
+        self.tree.after(BOOKMARK_LOAD_DELAY, self._show_chunk, refresh_id)
+
+    def _finish_refresh(self):
+        """Shows at once the bookmarks still pending, so that the tree
+        positions match the set again.
+        """
+
+        if self._pending is not None:
+            for row in self._pending:
+                self._show('end', row)
+            self._pending = None
+
+    def add(self, freq, mode, desc, lockout = "O"):
+        """Adds a bookmark and shows it in the tree.
+
+        :param freq: frequency in hertz
+        :type freq: int
+        :param mode: bookmark mode
+        :type mode: string
+        :param desc: description
+        :type desc: string
+        :param lockout: "L" if the bookmark is locked out
+        :type lockout: string
+        :returns: the new tree item, None if the bookmark already exists
+        """
+
+        self._finish_refresh()
+        index = self.bookmark_set.add(freq, mode, desc, lockout)
+        if index is None:
+            return None
+        return self._show(index, self.bookmark_set[index])
+
+    def delete(self, item):
+        """Deletes the bookmark shown by item.
+
+        :param item: item in the bookmark tree
+        :type item: tree element
+        """
+
+        key = self._keys.pop(item)
+        del self._items[key]
+        self.bookmark_set.remove(self.bookmark_set.index(*key))
+        self.tree.delete(item)
+
+    def toggle_lockout(self, item):
+        """Locks out the bookmark shown by item, or unlocks it.
+
+        :param item: item in the bookmark tree
+        :type item: tree element
+        :returns: the new lockout value, "L" or "O"
+        """
+
+        index = self.bookmark_set.index(*self._keys[item])
+        locked = not self.bookmark_set.is_locked(index)
+        self.bookmark_set.set_lockout(index, locked)
+        values = list(self.tree.item(item, "values"))
+        values[BM.lockout] = "L" if locked else "O"
+        self.tree.item(item, values = values)
+        self.bookmark_bg_tag(item, values[BM.lockout])
+        return values[BM.lockout]
 
     def save(self, bookmark_file, delimiter = ',', silent = False):
         """Bookmarks handling. Saves the bookmarks as
-        a csv file.
+        a csv file, in the binary format if the file name ends
+        with BINARY_BOOKMARK_EXTENSION or in a database if it ends with
+        one of SQLITE_EXTENSIONS.
 
         :param bookmark_file: filename to load, with full path
         :type bookmark_file: string
@@ -53,12 +188,104 @@ class Bookmarks(object):
         :returns : none
         """
 
+        added, lockouts, rewrite = self.bookmark_set.changes()
+        update = (bookmark_file == self._saved_file and
+                  os.path.exists(bookmark_file) and
+                  not rewrite)
+        if update and not added and not lockouts:
+            logger.info("No bookmark changed since the last save.")
+            return
+        self._make_path(bookmark_file)
+        if bookmark_file.endswith(BINARY_BOOKMARK_EXTENSION):
+            saved = self._save_binary(bookmark_file,
+                                      lockouts if update and not added else None)
+        elif is_sqlite(bookmark_file):
+            saved = self._save_database(bookmark_file,
+                                        added + lockouts if update else None)
+        else:
+            saved = self._save_csv(bookmark_file,
+                                   delimiter,
+                                   added if update and not lockouts else None)
+        if saved:
+            self.bookmark_set.mark_saved()
+            self._saved_file = bookmark_file
+
+    def _save_binary(self, bookmark_file, lockouts = None):
+        """Saves the bookmarks in the binary format.
+
+        :param lockouts: if given, the bookmarks whose lockout changed,
+        that are patched in the file instead of writing it again
+        :type lockouts: list of rows
+        :returns: True if the bookmarks were saved
+        """
+
+        try:
+            if lockouts is None:
+                BookmarkFile.save(bookmark_file, self.bookmark_set)
+                return True
+            binary = BookmarkFile(bookmark_file, writable = True)
+            try:
+                patched = all(binary.set_lockout(row[BM.freq],
+                                                 row[BM.mode],
+                                                 row[BM.lockout] == "L")
+                              for row in lockouts)
+            finally:
+                binary.close()
+            if not patched:
+                logger.info("{} changed meanwhile, writing it "
+                            "again.".format(bookmark_file))
+                BookmarkFile.save(bookmark_file, self.bookmark_set)
+            return True
+        except (IOError, OSError, InvalidPathError, FormatError, ValueError):
+            logger.error("Error while trying to write the file: "
+                         "{}".format(bookmark_file))
+            return False
+
+    def _save_database(self, bookmark_file, rows = None):
+        """Saves the bookmarks in a database.
+
+        :param rows: if given, the bookmarks added or changed, that are
+        updated instead of replacing all the bookmarks
+        :type rows: list of rows
+        :returns: True if the bookmarks were saved
+        """
+
+        try:
+            database = BookmarkDatabase(bookmark_file)
+            try:
+                if rows is None:
+                    database.save(self.bookmark_set)
+                else:
+                    database.update(rows)
+            finally:
+                database.close()
+        except sqlite3.Error:
+            logger.exception("Error while trying to write the bookmark "
+                             "database: {}".format(bookmark_file))
+            return False
+        return True
+
+    def _save_csv(self, bookmark_file, delimiter, rows = None):
+        """Saves the bookmarks as a csv file.
+
+        :param rows: if given, the bookmarks added, that are appended
+        instead of writing the file again
+        :type rows: list of rows
+        :returns: True if the bookmarks were saved
+        """
+
         self.bookmarks.row_list = []
-        for item in self.tree.get_children():
-            values = self.tree.item(item).get('values')
-            values[BM.freq] = str(frequency_pp_parse(values[BM.freq]))
+        for row in (self.bookmark_set if rows is None else rows):
+            values = list(row)
+            values[BM.freq] = str(values[BM.freq])
             self.bookmarks.row_list.append(values)
-        # Not where we want to do this, and will be fixed with BookmarkSet
+        if rows is None:
+            return self.bookmarks.csv_save(bookmark_file, delimiter)
+        return self.bookmarks.csv_append(bookmark_file, delimiter)
+
+    def _make_path(self, bookmark_file):
+        """Creates the directory of bookmark_file."""
+
         try:
             os.makedirs(os.path.dirname(bookmark_file))
         except IOError:
@@ -67,12 +294,13 @@ class Bookmarks(object):
                         "path as {}".format(bookmark_file))
         except OSError:
             logger.info("The bookmark file already exists.")
-        self.bookmarks.csv_save(bookmark_file, delimiter)
 
 
     def load(self, bookmark_file, delimiter, silent = False):
         """Bookmarks handling. Loads the bookmarks as
-        a csv file.
+        a csv file, in the binary format if the file name ends
+        with BINARY_BOOKMARK_EXTENSION or in a database if it ends with
+        one of SQLITE_EXTENSIONS.
 
         :param bookmark_file: filename to load, with full path
         :type bookmark_file: string
@@ -88,25 +316,98 @@ class Bookmarks(object):
         if bookmark_file == "noname":
             return
 
+        # a save can update the file only if it has all the bookmarks,
+        # after a failed load the next save writes the whole file
+        whole = not self.bookmark_set.dirty and len(self.bookmark_set) == 0
+        if bookmark_file.endswith(BINARY_BOOKMARK_EXTENSION):
+            loaded = self._load_binary(bookmark_file, silent)
+        elif is_sqlite(bookmark_file):
+            loaded = self._load_database(bookmark_file, silent)
+        else:
+            try:
+                rows = self.bookmarks.csv_iter(bookmark_file, delimiter)
+            except InvalidPathError:
+                logger.info("No bookmarks file found, skipping.")
+                return
+            loaded = self._insert_bookmarks(rows, silent)
+        if whole and loaded:
+            self.bookmark_set.mark_saved()
+            self._saved_file = bookmark_file
+        elif self._saved_file == bookmark_file:
+            self._saved_file = None
+
+    def _load_binary(self, bookmark_file, silent = False):
+        """Loads a bookmark file in the binary format, its bookmarks
+        need no validation.
+
+        :param bookmark_file: filename to load, with full path
+        :type bookmark_file: string
+        :param silent: suppress messagebox
+        :type silent: boolean
+        :returns: True if the file was read
+        """
+
         try:
-            self.bookmarks.csv_load(bookmark_file, delimiter)
+            binary = BookmarkFile(bookmark_file)
         except InvalidPathError:
             logger.info("No bookmarks file found, skipping.")
-            return
-        self._insert_bookmarks(self.bookmarks.row_list)
-
-
-    def _insert_bookmarks(self, bookmarks, silent = False):
-        """Method for inserting bookmark data already loaded.
-
-        :param bookmarks: bookmarks to import in the UI
-        :type bookmarks: dict
+            return False
+        except FormatError:
+            if not silent:
+                tkMessageBox.showerror("Error", "Invalid bookmark file.")
+            return False
+        try:
+            added = self.bookmark_set.extend(binary)
+        finally:
+            binary.close()
+        logger.info("{} bookmarks added.".format(added))
+        if added:
+            self._refresh_tree()
+        return True
+
+    def _load_database(self, bookmark_file, silent = False):
+        """Loads the bookmarks kept in a database.
+
+        :param bookmark_file: database to load, with full path
+        :type bookmark_file: string
+        :param silent: suppress messagebox
+        :type silent: boolean
+        :returns: True if the database was read
         """
 
-        count = 0
-        for line in bookmarks:
+        if not os.path.exists(bookmark_file):
+            logger.info("No bookmarks file found, skipping.")
+            return False
+        try:
+            database = BookmarkDatabase(bookmark_file)
+            try:
+                added = self.bookmark_set.extend(database.load())
+            finally:
+                database.close()
+        except sqlite3.Error:
+            logger.exception("Error while reading the bookmark "
+                             "database: {}".format(bookmark_file))
+            if not silent:
+                tkMessageBox.showerror("Error", "Invalid bookmark database.")
+            return False
+        logger.info("{} bookmarks added.".format(added))
+        if added:
+            self._refresh_tree()
+        return True
+
+    def _parse_bookmarks(self, bookmarks, invalid):
+        """Validates the bookmark lines and converts the frequency to
+        hertz, one line at a time.
+
+        :param bookmarks: bookmark lines
+        :type bookmarks: iterable of lists
+        :param invalid: numbers of the invalid lines, filled in
+        :type invalid: list
+        :returns: the valid bookmarks
+        :return type: generator of lists
+        """
 
-            logger.info(line)
+        for count, line in enumerate(bookmarks, 1):
             error = False
             if len(line) < LEN_BM:
                 line.append("O")
@@ -121,13 +422,44 @@ class Bookmarks(object):
             if line[BM.mode] not in CBB_MODES :
                 error = True
             if error == True :
-                if not silent:
-                    tkMessageBox.showerror("Error", "Invalid value in "\
-                                           "Bookmark #%i. "\
-                                           "Skipping..." %count)
+                invalid.append(count)
             else:
-                item = self.tree.insert('', tk.END, values=line)
-                self.bookmark_bg_tag(item, line[BM.lockout])
+                line[BM.freq] = int(frequency_pp_parse(line[BM.freq]))
+                yield line
+
+    def _insert_bookmarks(self, bookmarks, silent = False):
+        """Method for inserting bookmark data already loaded.
+
+        :param bookmarks: bookmarks to import in the UI, read lazily
+        :type bookmarks: iterable of lists
+        :returns: True if every bookmark was valid
+        """
+
+        invalid = []
+        added = self.bookmark_set.extend(self._parse_bookmarks(bookmarks,
+                                                               invalid))
+        logger.info("{} bookmarks added.".format(added))
+        if invalid:
+            logger.warning("Invalid bookmarks skipped, "
+                           "lines: {}".format(invalid))
+            if not silent:
+                tkMessageBox.showerror("Error", "Invalid value in "\
+                                       "{} bookmarks, first one is "\
+                                       "#{}. Skipping...".format(len(invalid),
+                                                                 invalid[0]))
+        if added:
+            self._refresh_tree()
+        return not invalid
+
+    def _configure_tags(self):
+        if not self._tags_configured:
+            self.tree.tag_configure('locked', background='red')
+            self.tree.tag_configure('unlocked', background='white')
+            self._tags_configured = True
+
+    @staticmethod
+    def _tag(value):
+        return "locked" if value == "L" else "unlocked"
 
     def bookmark_bg_tag(self, item, value) :
         """Set item background color based on lock status.
@@ -139,12 +471,8 @@ class Bookmarks(object):
         :raises: none
         """
 
-        if value == "L":
-            self.tree.tag_configure('locked', background='red')
-            self.tree.item(item, tags="locked")
-        else:
-            self.tree.tag_configure('unlocked', background='white')
-            self.tree.item(item, tags="unlocked")
+        self._configure_tags()
+        self.tree.item(item, tags=self._tag(value))
 
     def import_bookmarks(self, silent=True):
         if value == "L" :
@@ -179,13 +507,22 @@ class Bookmarks(object):
             self._import_rig_remote(filename)
             return
 
+        if fileformat == "binary":
+            self._load_binary(filename, silent = False)
+            return
+
+        if fileformat == "sqlite":
+            self._load_database(filename, silent = False)
+            return
+
         if not silent:
             logger.error("Unsupported format, supported formats are rig-remote"
                          "rig-remote and gqrx,")
             tkMessageBox.showerror("Error", "Unsupported file format.")
 
     def _detect_format(self, filename):
-        """Method for detecting the bookmark type. Only two types are supported.
+        """Method for detecting the bookmark type: rig-remote csv, gqrx,
+        binary or SQLite.
 
         :param filename: file path to read
         :type filename: string
@@ -195,8 +532,12 @@ class Bookmarks(object):
             logger.error("No filename passed.")
             raise InvalidPathError
 
-        with open(filename, "r") as fn:
+        with open(filename, "rb") as fn:
             line = fn.readline()
+        if line.startswith(BINARY_BOOKMARK_MAGIC):
+            return "binary"
+        if line.startswith(SQLITE_MAGIC):
+            return "sqlite"
         if GQRX_BOOKMARK_FIRST_LINE == line:
             return "gqrx"
         if len(line.split(",")) == 4:
@@ -260,7 +601,7 @@ class Bookmarks(object):
         """
 
         filename = self._export_panel()
-        self.bookmarks.row_list = GQRX_BOOKMARK_HEADER
+        self.bookmarks.row_list = list(GQRX_BOOKMARK_HEADER)
         self._save_gqrx(filename)
 
     def _save_gqrx(self, filename):
@@ -272,10 +613,10 @@ class Bookmarks(object):
         :type filename: string
         """
 
-        for item in self.tree.get_children():
+        for row in self.bookmark_set:
             gqrx_bookmark =[]
-            values = self.tree.item(item).get('values')
-            values[BM.freq] = str(frequency_pp_parse(values[BM.freq]))
+            values = list(row)
+            values[BM.freq] = str(values[BM.freq])
             gqrx_bookmark.append(values[0])
             gqrx_bookmark.append(values[2])
             gqrx_bookmark.append(values[1])
@@ -290,7 +631,6 @@ class Bookmarks(object):
                         "path as {}".format(filename))
         except OSError:
             logger.info("The bookmark filef already exists.")
-        self.bookmarks.row_list.reverse()
         self.bookmarks.csv_save(filename, ";")
 
     def _export_panel(self):
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+
+"""
+Remote application that interacts with rigs using rigctl protocol.
+
+Please refer to:
+http://gqrx.dk/
+http://gqrx.dk/doc/remote-control
+http://sourceforge.net/apps/mediawiki/hamlib/index.php?title=Documentation
+
+Author: Rafael Marmelo
+Author: Simone Marzona
+
+License: MIT License
+
+Copyright (c) 2014 Rafael Marmelo
+Copyright (c) 2015 Simone Marzona
+"""
+
+import logging
+import select
+import socket
+import telnetlib
+import threading
+import time
+from rig_remote.constants import (
+                                  RIG_TIMEOUT,
+                                  CONNECTION_IDLE_TIMEOUT,
+                                  CONNECTION_POOL_MAX_IDLE,
+                                  )
+
+# logging configuration
+logger = logging.getLogger(__name__)
+
+
+# classes definition
+class PooledConnection(object):
+    """Telnet connection handed out by the ConnectionPool."""
+
+    def __init__(self, key, con):
+        """
+        :param key: pool key of the target the connection belongs to
+        :type key: tuple of hostname and port
+        :param con: the open connection
+        :type con: telnetlib.Telnet object
+        """
+
+        self.key = key
+        self.con = con
+        self.reused = False
+        self.last_used = time.time()
+
+    def write(self, data):
+        self.con.write(data)
+
+    def readline(self, timeout):
+        """Reads a line of the reply, the data that follows it stays
+        buffered for the next read.
+
+        :param timeout: seconds to wait for the line
+        :type timeout: float
+        :raises: EOFError if the connection is closed, socket.timeout
+        if only part of the line arrived
+        :returns: the line stripped, None if nothing arrived in time
+        """
+
+        line = self.con.read_until('\n'.encode('ascii'), timeout)
+        if not line:
+            return None
+        if not line.endswith('\n'.encode('ascii')):
+            logger.error("Incomplete line from {}:{}: {!r}".format(self.key[0],
+                                                                  self.key[1],
+                                                                  line))
+            raise socket.timeout
+        return line.decode('ascii').strip()
+
+    def close(self):
+        """Closes the connection, telling the rig we are leaving.
+        Errors are ignored, the connection may be dead already.
+        """
+
+        try:
+            self.con.write('c\n'.encode('ascii'))
+        except (socket.error, EOFError, AttributeError):
+            pass
+        try:
+            self.con.close()
+        except (socket.error, AttributeError):
+            pass
+
+
+class ConnectionPool(object):
+    """Keeps the rigctl connections open between commands, so that
+    every command doesn't pay the connection setup.
+    Connections are kept per target (hostname, port), idle connections
+    are closed after CONNECTION_IDLE_TIMEOUT seconds and connections
+    are checked before being handed out again.
+    """
+
+    def __init__(self,
+                 idle_timeout=CONNECTION_IDLE_TIMEOUT,
+                 max_idle=CONNECTION_POOL_MAX_IDLE):
+        """
+        :param idle_timeout: seconds an idle connection is kept open
+        :type idle_timeout: int
+        :param max_idle: max number of idle connections for every target
+        :type max_idle: int
+        """
+
+        self.idle_timeout = idle_timeout
+        self.max_idle = max_idle
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(target):
+        return (target["hostname"], str(target["port"]))
+
+    def _is_healthy(self, pooled):
+        """A connection is healthy if the socket is still open and
+        nothing is waiting to be read on it: a readable idle socket is
+        either closed by the rig or carries a reply we didn't consume.
+
+        :param pooled: connection to check
+        :type pooled: PooledConnection object
+        :returns: True if the connection can be reused
+        """
+
+        if time.time() - pooled.last_used > self.idle_timeout:
+            logger.info("Expiring idle connection to {}:{}".format(*pooled.key))
+            return False
+        try:
+            if pooled.con.read_very_lazy():
+                logger.warning("Dropping unread data from "
+                               "{}:{}".format(*pooled.key))
+                return False
+            sock = pooled.con.get_socket()
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (socket.error, select.error, EOFError, TypeError, ValueError):
+            return False
+        return not readable
+
+    def _connect(self, target):
+        """Opens a new connection to target.
+
+        :param target: rig uri data
+        :type target: dict created from build_rig_uri
+        :raises: socket.timeout, socket.error
+        :returns: new PooledConnection
+        """
+
+        try:
+            con = telnetlib.Telnet(target["hostname"],
+                                   target["port"],
+                                   RIG_TIMEOUT)
+        except socket.timeout:
+            logger.error("Time out while connecting to "
+                         "{}:{}".format(target["hostname"], target["port"]))
+            raise
+        except socket.error:
+            logger.exception("Connection refused on "
+                             "{}:{}".format(target["hostname"], target["port"]))
+            raise
+        return PooledConnection(self._key(target), con)
+
+    def acquire(self, target):
+        """Hands out a healthy idle connection to target, or opens
+        a new one if none is available.
+
+        :param target: rig uri data
+        :type target: dict created from build_rig_uri
+        :raises: socket.timeout, socket.error
+        :returns: PooledConnection object
+        """
+
+        key = self._key(target)
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                pooled = idle.pop() if idle else None
+            if pooled is None:
+                return self._connect(target)
+            if self._is_healthy(pooled):
+                pooled.reused = True
+                return pooled
+            pooled.close()
+
+    def release(self, pooled):
+        """Gives a connection back to the pool once the reply has been
+        read completely.
+
+        :param pooled: connection to give back
+        :type pooled: PooledConnection object
+        """
+
+        pooled.last_used = time.time()
+        with self._lock:
+            idle = self._idle.setdefault(pooled.key, [])
+            if len(idle) < self.max_idle:
+                idle.append(pooled)
+                return
+        pooled.close()
+
+    def discard(self, pooled):
+        """Closes a connection that failed, it won't be reused.
+
+        :param pooled: connection to drop
+        :type pooled: PooledConnection object
+        """
+
+        logger.info("Dropping connection to {}:{}".format(*pooled.key))
+        pooled.close()
+
+    def close_all(self):
+        """Closes every idle connection."""
+
+        with self._lock:
+            idle = self._idle
+            self._idle = {}
+        for connections in idle.values():
+            for pooled in connections:
+                pooled.close()
+
+
+# pool shared by all the RigCtl instances
+rig_pool = ConnectionPool()
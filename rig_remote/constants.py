@@ -23,6 +23,22 @@ import os
 
 # constant definition
 RIG_TIMEOUT = 10
+# idle connections older than this (seconds) are closed instead of reused
+CONNECTION_IDLE_TIMEOUT = 30
+# max number of idle connections kept open for every rig target
+CONNECTION_POOL_MAX_IDLE = 2
+# lines in the reply to a rigctl command, the commands not listed
+# here reply with one line (the value, or RPRT for the set commands)
+RESPONSE_LINES = {"m": 2,
+                  "x": 2,
+                  }
+# seconds we wait for the reply to a rigctl command, the commands not
+# listed in COMMAND_TIMEOUTS use RIG_COMMAND_TIMEOUT
+RIG_COMMAND_TIMEOUT = 2
+COMMAND_TIMEOUTS = {"AOS": 5,
+                    "LOS": 5,
+                    "*": 10,
+                    }
 RESET_CMD_DICT = {"NONE": 0,
                   "SOFTWARE_RESET": 1,
                   "VFO_RESET": 2,
@@ -245,14 +261,43 @@ CBB_MODES = ('',
              )
 
 # scanning constants
-# once tuned a freq, check this number of times for a signal
+# once tuned a freq, check at most this number of times for a signal
 SIGNAL_CHECKS = 2
+# the signal check stops sampling as soon as it can tell, with this
+# confidence, if the level is SIGNAL_MARGIN above or below the threshold.
+# Every sample is taken as the level plus a noise of SIGNAL_NOISE_SIGMA.
+# Levels are in tenths of dB.
+SIGNAL_CHECK_CONFIDENCE = .95
+SIGNAL_MARGIN = 30
+SIGNAL_NOISE_SIGMA = 30
 # time to wait between checks on the same frequency
 NO_SIGNAL_DELAY = .1
-# once we send the cmd for tuning a freq, wait this time
+# once we send the cmd for tuning a freq, wait at most this time
+# for the rig to settle
 TIME_WAIT_FOR_TUNE = .25
+# while waiting, the frequency and the level are polled every
+# TUNE_SETTLE_POLL seconds. The rig is settled when it reports the new
+# frequency and the level moved less than TUNE_SETTLE_TOLERANCE dB
+# since the previous poll: three times the level noise, so that the
+# noise alone doesn't keep the scan waiting.
+TUNE_SETTLE_POLL = .02
+TUNE_SETTLE_TOLERANCE = 3 * SIGNAL_NOISE_SIGMA / 10.0
+# weight of the last settle time in the average kept for every rig
+TUNE_SETTLE_LEARNING_RATE = .2
+# fraction of the average settle time we sleep before the first poll
+TUNE_SETTLE_HEADSTART = .5
+# phases of a scan pass timed by ScanStats: tuning, waiting for the rig
+# to settle, sampling the level, processing the updates from the UI,
+# staying on a signal, writing the activity log and starting/stopping
+# the recording
+SCAN_PHASES = ("tune", "settle", "sample", "queue", "dwell", "log", "record")
+# upper bounds, in seconds, of the buckets of the rigctl command latency
+# histogram kept by ScanStats
+SCAN_LATENCY_BUCKETS = (.001, .002, .005, .01, .02, .05, .1, .2, .5, 1.0)
 # minimum interval in hertz
 MIN_INTERVAL = 1000
+# how often the scan farm checks that its workers are alive, in seconds
+MULTI_RIG_POLL_INTERVAL = .2
 # fictional mode set for active frequencies
 UNKNOWN_MODE = "unknown"
 # monitoring mode delay
@@ -288,9 +333,38 @@ SUPPORTED_SCANNING_ACTIONS = ("start",
 SUPPORTED_SYNC_ACTIONS = SUPPORTED_SCANNING_ACTIONS
 
 SYNC_INTERVAL = 0.2
+# while the source rig doesn't change the sync polls it less often,
+# the interval grows by SYNC_BACKOFF every idle poll up to SYNC_MAX_INTERVAL
+SYNC_BACKOFF = 1.5
+SYNC_MAX_INTERVAL = 2.0
+# seconds between two log lines with the sync timings
+SYNC_STATS_INTERVAL = 60
+
+# parameters of a scan task built without the UI: range_min and range_max
+# in hertz, interval in khertz, delay in seconds, sgn_level in dBFS.
+# The flags default to False and rig_mode, the mode set on the rig for a
+# frequency scan, defaults to leaving the rig mode alone.
+HEADLESS_SCAN_PARAMS = ("range_min",
+                        "range_max",
+                        "interval",
+                        "delay",
+                        "passes",
+                        "sgn_level",
+                        )
+HEADLESS_SCAN_FLAGS = ("log",
+                       "wait",
+                       "record",
+                       "auto_bookmark",
+                       "skip_known",
+                       )
+
+# Distance in hertz under which a new bookmark added from the scan
+# results duplicates a bookmark already present.
+BOOKMARK_DUPLICATE_TOLERANCE = 1000
 
 SUPPORTED_SCANNING_MODES = ("bookmarks",
-                            "frequency")
+                            "frequency",
+                            "spectrum")
 DEFAULT_CONFIG = {"hostname1" : "127.0.0.1",
                   "port1" : "7356",
                   "hostname2" : "127.0.0.1",
@@ -320,6 +394,10 @@ class BM(object):
     freq, mode, desc, lockout = range(LEN_BM)
 
 UI_EVENT_TIMER_DELAY = 1000
+# bookmarks shown in the tree in one go when a bookmark file is loaded,
+# the rest follow from the event loop every BOOKMARK_LOAD_DELAY ms
+BOOKMARK_LOAD_CHUNK = 500
+BOOKMARK_LOAD_DELAY = 1
 QUEUE_MAX_SIZE = 10
 
 DEFAULT_PREFIX = os.path.expanduser("~/.rig-remote")
@@ -337,6 +415,34 @@ Project wiki: https://github.com/Marzona/rig-remote/wiki
 GoogleGroups: https://groups.google.com/forum/#!forum/rig-remote
 """
 
+# binary bookmark file, see bookmark_file.BookmarkFile: bookmark files
+# with this extension are read and written in the binary format
+BINARY_BOOKMARK_EXTENSION = ".rrb"
+BINARY_BOOKMARK_MAGIC = b"RRBOOKMK"
+BINARY_BOOKMARK_VERSION = 1
+
+# activity log written in the background, see disk_io.BufferedLogFile:
+# lines kept in memory at most, the oldest are dropped when it is full
+LOG_BUFFER_SIZE = 10000
+# lines that wake up the writer, and seconds between two writes
+LOG_FLUSH_SIZE = 64
+LOG_FLUSH_INTERVAL = 1.0
+# fsync policy: "never", "flush" after every write, or "close"
+LOG_FSYNC = "never"
+LOG_FSYNC_POLICIES = ("never", "flush", "close")
+# rotation: size in bytes (0 never rotates), "daily" rotation and number
+# of rotated files kept
+LOG_MAX_SIZE = 0
+LOG_ROTATE_DAILY = False
+LOG_BACKUP_COUNT = 5
+
+# bookmark and log files with these extensions are SQLite databases
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+# first bytes of a database file
+SQLITE_MAGIC = b"SQLite format 3\0"
+# seconds a database write waits for another writer
+SQLITE_TIMEOUT = 10
+
 GQRX_BOOKMARK_FIRST_LINE = "# Tag name          ;  color\n"
 GQRX_FIRST_BOOKMARK = 5
 
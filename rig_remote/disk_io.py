@@ -26,15 +26,202 @@ TAS - Tim Sweeney - mainetim@gmail.com
 """
 
 import csv
+import errno
+import json
 import logging
 import os.path
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
 from rig_remote.exceptions import InvalidPathError
-from rig_remote.constants import BM
+from rig_remote.constants import (
+                                  BM,
+                                  SQLITE_EXTENSIONS,
+                                  SQLITE_TIMEOUT,
+                                  LOG_BUFFER_SIZE,
+                                  LOG_FLUSH_SIZE,
+                                  LOG_FLUSH_INTERVAL,
+                                  LOG_FSYNC,
+                                  LOG_FSYNC_POLICIES,
+                                  LOG_MAX_SIZE,
+                                  LOG_ROTATE_DAILY,
+                                  LOG_BACKUP_COUNT,
+                                 )
 import datetime
 
 # logging configuration
 logger = logging.getLogger(__name__)
 
+# tables of a rig-remote database, the bookmarks and the activity log
+# can share one file
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bookmarks (
+    freq INTEGER NOT NULL,
+    mode TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    lockout TEXT NOT NULL DEFAULT 'O',
+    PRIMARY KEY (freq, mode)
+);
+CREATE TABLE IF NOT EXISTS activity (
+    id INTEGER PRIMARY KEY,
+    time TEXT NOT NULL,
+    type TEXT NOT NULL,
+    freq INTEGER NOT NULL,
+    mode TEXT,
+    description TEXT,
+    bookmark TEXT,
+    level INTEGER
+);
+CREATE INDEX IF NOT EXISTS activity_time ON activity (time);
+CREATE INDEX IF NOT EXISTS activity_freq ON activity (freq);
+"""
+
+
+# helper functions
+def is_sqlite(filename):
+    """Tells if filename is a rig-remote database, from its extension.
+
+    :param filename: bookmark or log file name
+    :type filename: string
+    """
+
+    return os.path.splitext(filename or "")[1].lower() in SQLITE_EXTENSIONS
+
+
+def sqlite_connect(filename):
+    """Opens a rig-remote database, creating the tables if needed. The
+    database is in WAL mode, so that the scanner can write while the UI
+    or other tools read.
+
+    :param filename: database file
+    :type filename: string
+    :raises: sqlite3.Error if the database can't be opened
+    :returns: the connection, that can be shared by threads holding a lock
+    :return type: sqlite3.Connection
+    """
+
+    connection = sqlite3.connect(filename,
+                                 timeout=SQLITE_TIMEOUT,
+                                 check_same_thread=False)
+    connection.text_factory = str
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SQLITE_SCHEMA)
+    return connection
+
+
+def _create_temp(filename):
+    """Creates a new temporary file next to filename. Unlike mkstemp,
+    the umask applies to its permissions as to any file open() creates.
+
+    :param filename: file the temporary file will replace
+    :type filename: string
+    :raises: OSError if the file can't be created
+    :returns: file descriptor and name of the temporary file
+    :return type: tuple
+    """
+
+    directory, name = os.path.split(filename)
+    flags = (os.O_WRONLY | os.O_CREAT | os.O_EXCL |
+             getattr(os, "O_BINARY", 0))
+    while True:
+        temp_name = os.path.join(directory,
+                                 ".{}.{}".format(name, uuid.uuid4().hex[:8]))
+        try:
+            return os.open(temp_name, flags, 0o666), temp_name
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+
+@contextmanager
+def atomic_open(filename, mode="w"):
+    """Opens a temporary file next to filename, that replaces filename
+    only once it is completely written, so that an interrupted save
+    never leaves a truncated file. A symbolic link is followed, the file
+    it points to is replaced. A new file gets the permissions open()
+    would give it.
+
+    :param filename: file to write
+    :type filename: string
+    :param mode: "w" or "wb"
+    :type mode: string
+    :raises: IOError, OSError if the file can't be written
+    """
+
+    filename = os.path.realpath(filename)
+    handle, temp_name = _create_temp(filename)
+    try:
+        with os.fdopen(handle, mode) as data_file:
+            yield data_file
+            data_file.flush()
+            os.fsync(data_file.fileno())
+        if os.path.exists(filename):
+            shutil.copymode(filename, temp_name)
+            if os.name == "nt":
+                # rename doesn't replace an existing file on Windows
+                os.remove(filename)
+        os.rename(temp_name, filename)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+
+
+def activity_entry(record_type, record, signal):
+    """Converts a log record in a dict, as it is stored by the JSON and
+    the database logs.
+
+    :param record_type: type of the record to write, 'B' or 'F'
+    :type record_type: string
+    :param record: bookmark ('B') or new bookmark dict ('F')
+    :type record: tuple or dict
+    :param signal: signal level
+    :type signal: int
+    :raises: TypeError if the record type isn't supported
+    :returns: the activity, time in UTC
+    :return type: dict
+    """
+
+    if record_type == 'B':
+        entry = {"type": "bookmark",
+                 "freq": int(str(record[BM.freq]).replace(',', '')),
+                 "mode": record[BM.mode],
+                 "description": record[BM.desc]}
+    elif record_type == 'F':
+        entry = {"type": "frequency",
+                 "freq": int(record['freq']),
+                 "mode": record['mode']}
+        if "bookmark" in record:
+            entry["bookmark"] = record["bookmark"]
+    else:
+        logger.error("Record type not supported, must be 'B' or 'F'"
+                     "got {}".format(record_type))
+        raise TypeError
+    entry["time"] = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+    entry["level"] = signal
+    return entry
+
+
+def open_log_file(filename):
+    """Opens the activity log, a database if filename has a database
+    extension, a text file written in the background otherwise.
+
+    :param filename: log file name
+    :type filename: string
+    :returns: the open log
+    :return type: BufferedLogFile or SqliteLogFile object
+    """
+
+    log = SqliteLogFile() if is_sqlite(filename) else BufferedLogFile()
+    log.open(filename)
+    return log
+
 
 # class definition
 class IO(object):
@@ -57,24 +244,27 @@ class IO(object):
             logger.info("Invalid path provided:{}".format(csv_file))
             raise InvalidPathError
 
-    def csv_load(self, csv_file, delimiter):
-        """Read the frequency bookmarks file and populate the tree.
+    def csv_iter(self, csv_file, delimiter):
+        """Reads a csv file one row at a time, so that a large file is
+        never held in memory.
 
-        :param csv_file: path of the file to be written
+        :param csv_file: path of the file to be read
         :type csv_file: string
         :param delimiter: delimiter char
         :type delimiter: string
-        :raises: csv.Error if the data to be written as csv isn't valid
-        :returns: none
+        :raises InvalidPathError: if the path is invalid, when called
+        :returns: the rows of the file
+        :return type: generator of lists
         """
 
         self._path_check(csv_file)
+        return self._csv_rows(csv_file, delimiter)
+
+    def _csv_rows(self, csv_file, delimiter):
         try:
             with open(csv_file, 'r') as data_file:
-                self.row_list = []
-                reader = csv.reader(data_file, delimiter=delimiter)
-                for line in reader:
-                    self.row_list.append(line)
+                for line in csv.reader(data_file, delimiter=delimiter):
+                    yield line
 
         except csv.Error:
             logger.exception("The file  provided({})"
@@ -85,22 +275,66 @@ class IO(object):
             logger.exception("Error while trying to read the file: "
                              "{}".format(csv_file))
 
+    def csv_load(self, csv_file, delimiter):
+        """Read the frequency bookmarks file and populate the tree.
+
+        :param csv_file: path of the file to be written
+        :type csv_file: string
+        :param delimiter: delimiter char
+        :type delimiter: string
+        :raises: csv.Error if the data to be written as csv isn't valid
+        :returns: none
+        """
+
+        self.row_list = list(self.csv_iter(csv_file, delimiter))
+
     def csv_save(self, csv_file, delimiter):
-        """Save current frequencies to disk.
+        """Save current frequencies to disk, in the order of row_list.
+        The file is replaced only once it is completely written.
 
         :param delimiter: delimiter char used in the csv
         :type delimiter: string
-        :raises: IOError, OSError
+        :raises: csv.Error if the data to be written as csv isn't valid
+        :returns: True if the file was written
         """
 
         try:
-            with open(csv_file, 'w') as data_file:
+            with atomic_open(csv_file, 'w') as data_file:
                 writer = csv.writer(data_file, delimiter=delimiter)
-                while self.row_list:
-                    writer.writerow(self.row_list.pop())
+                writer.writerows(self.row_list)
+            return True
         except (IOError, OSError):
             logger.error("Error while trying to write the file: "
                          "{}".format(csv_file))
+            return False
+
+    def csv_append(self, csv_file, delimiter):
+        """Appends the rows of row_list to csv_file. If the file doesn't
+        end with a newline, as it happens with hand edited files, one is
+        added before the rows.
+
+        :param delimiter: delimiter char used in the csv
+        :type delimiter: string
+        :raises: csv.Error if the data to be written as csv isn't valid
+        :returns: True if the file was written
+        """
+
+        try:
+            with open(csv_file, 'a+') as data_file:
+                writer = csv.writer(data_file, delimiter=delimiter)
+                data_file.seek(0, os.SEEK_END)
+                if data_file.tell():
+                    data_file.seek(-1, os.SEEK_END)
+                    last = data_file.read(1)
+                    data_file.seek(0, os.SEEK_END)
+                    if last not in ("\n", "\r"):
+                        data_file.write(writer.dialect.lineterminator)
+                writer.writerows(self.row_list)
+            return True
+        except (IOError, OSError):
+            logger.error("Error while trying to write the file: "
+                         "{}".format(csv_file))
+            return False
 
 
 class LogFile(object):
@@ -115,6 +349,10 @@ class LogFile(object):
 
         self.log_filename = None
         self.log_file = None
+        # the same log can be shared by several scanning threads
+        self.lock = threading.Lock()
+        self._stamp_time = None
+        self._stamp = None
 
     def open(self, name=None):
         """Opens a log file.
@@ -124,6 +362,14 @@ class LogFile(object):
         """
         if name is not None:
             self.log_filename = name
+        self._make_path()
+        try:
+            self.log_file = open(self.log_filename, 'a')
+        except (IOError, OSError):
+            logger.error("Error while trying to open log file: "
+                         "{}".format(self.log_filename))
+
+    def _make_path(self):
         try:
             os.makedirs(os.path.dirname(self.log_filename))
         except IOError:
@@ -131,11 +377,6 @@ class LogFile(object):
                         "path as {}".format(self.log_filename))
         except OSError:
             logger.info("The log directory already exists.")
-        try:
-            self.log_file = open(self.log_filename, 'a')
-        except (IOError, OSError):
-            logger.error("Error while trying to open log file: "
-                         "{}".format(self.log_filename))
 
     def write(self, record_type, record, signal):
         """Writes a message to the log file.
@@ -149,25 +390,47 @@ class LogFile(object):
         :raises IOError or OSError for any issue that happens while writing.
         """
 
-        if record_type not in ["B", "F"]:
-            logger.error("Record type not supported, must be 'B' or 'F'"
-                         "got {}".format(record_type))
-            raise TypeError
-
-        if record_type == 'B':
-            lstr = 'B ' + str(datetime.datetime.today().strftime("%a %Y-%b-%d %H:%M:%S")) + ' ' + \
-                record[BM.freq].replace(',', '') + ' ' + record[BM.mode] + ' ' + str(signal) + "\n"
-        else:
-            lstr = 'F ' + str(datetime.datetime.today().strftime("%a %Y-%b-%d %H:%M:%S")) + ' ' + \
-                str(record['freq']) + ' ' + record['mode'] + ' ' + str(signal) + "\n"
+        lstr = self._format(record_type, record, signal)
         try:
-            self.log_file.write(lstr)
+            with self.lock:
+                self.log_file.write(lstr)
         except AttributeError:
             logger.exception("No log file provided, but log feature selected.")
             raise
         except (IOError, OSError):
             logger.exception("Error while trying to write log file: "
                              "{}".format(self.log_filename))
+
+    def _timestamp(self):
+        """Local time of the record, formatted once every second."""
+
+        now = int(time.time())
+        if now != self._stamp_time:
+            self._stamp_time = now
+            self._stamp = time.strftime("%a %Y-%b-%d %H:%M:%S",
+                                        time.localtime(now))
+        return self._stamp
+
+    def _format(self, record_type, record, signal):
+        """Formats a log line.
+
+        :raises: TypeError if the record type isn't supported or
+        IndexError if the record is not valid
+        :returns: the line
+        :return type: string
+        """
+
+        if record_type not in ["B", "F"]:
+            logger.error("Record type not supported, must be 'B' or 'F'"
+                         "got {}".format(record_type))
+            raise TypeError
+
+        try:
+            if record_type == 'B':
+                return 'B ' + self._timestamp() + ' ' + \
+                    str(record[BM.freq]).replace(',', '') + ' ' + record[BM.mode] + ' ' + str(signal) + "\n"
+            return 'F ' + self._timestamp() + ' ' + \
+                str(record['freq']) + ' ' + record['mode'] + ' ' + str(signal) + "\n"
         except (TypeError, IndexError):
             logger.exception("At least one of the parameter isn't of the "
                              "expected type:"
@@ -190,3 +453,400 @@ class LogFile(object):
             except (IOError, OSError):
                 logger.error("Error while trying to close log file: "
                              "{}".format(self.log_filename))
+
+
+class BufferedLogFile(LogFile):
+    """Writes the activity log from a background thread, so that a
+    burst of signals never stalls the scan. The lines wait in a bounded
+    buffer, the oldest are dropped if it fills up, and are written when
+    flush_size of them are waiting or every flush_interval seconds.
+    The log can be rotated when it grows over max_size bytes, or every
+    day.
+
+    """
+
+    def __init__(self,
+                 buffer_size=LOG_BUFFER_SIZE,
+                 flush_size=LOG_FLUSH_SIZE,
+                 flush_interval=LOG_FLUSH_INTERVAL,
+                 fsync=LOG_FSYNC,
+                 max_size=LOG_MAX_SIZE,
+                 rotate_daily=LOG_ROTATE_DAILY,
+                 backup_count=LOG_BACKUP_COUNT):
+        """
+        :param buffer_size: lines kept in memory at most
+        :type buffer_size: int
+        :param flush_size: lines that trigger a write
+        :type flush_size: int
+        :param flush_interval: seconds between two writes
+        :type flush_interval: float
+        :param fsync: when the log is synced to disk, one of
+        LOG_FSYNC_POLICIES
+        :type fsync: string
+        :param max_size: size in bytes that rotates the log, 0 never
+        :type max_size: int
+        :param rotate_daily: rotate the log when the day changes
+        :type rotate_daily: boolean
+        :param backup_count: rotated logs kept when rotating by size
+        :type backup_count: int
+        :raises: ValueError if the fsync policy is not supported
+        """
+
+        LogFile.__init__(self)
+        if fsync not in LOG_FSYNC_POLICIES:
+            logger.error("Unsupported fsync policy {}, must be one "
+                         "of {}".format(fsync, LOG_FSYNC_POLICIES))
+            raise ValueError
+        self.buffer = deque(maxlen=buffer_size)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_size = max_size
+        self.rotate_daily = rotate_daily
+        self.backup_count = backup_count
+        self.dropped = 0
+        self.ready = threading.Condition(self.lock)
+        self.running = False
+        self.writer = None
+        self._day = None
+
+    def open(self, name=None):
+        """Opens the log file and starts the writer thread.
+
+        :param name: log file name, defaults to None
+        :type name: string
+        """
+
+        LogFile.open(self, name)
+        if self.log_file is None:
+            return
+        # the log is reopened by every scan: a log written another day
+        # is rotated on the first write
+        modified = os.fstat(self.log_file.fileno()).st_mtime
+        self._day = time.strftime("%Y-%m-%d", time.localtime(modified))
+        self.running = True
+        self.writer = threading.Thread(target=self._run, name="log writer")
+        self.writer.daemon = True
+        self.writer.start()
+
+    def write(self, record_type, record, signal):
+        """Queues a message for the log file.
+
+        :param record_type: type of the record to write
+        :type record_type: string
+        :param record: data to write
+        :type record: tuple
+        :param signal: signal level
+        :type signal: list
+        :raises: AttributeError if the log file isn't open
+        """
+
+        lstr = self._format(record_type, record, signal)
+        with self.ready:
+            if not self.running:
+                logger.error("No log file provided, but log feature selected.")
+                raise AttributeError
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append(lstr)
+            if len(self.buffer) >= self.flush_size:
+                self.ready.notify()
+
+    def _run(self):
+        running = True
+        while running:
+            with self.ready:
+                if self.running and len(self.buffer) < self.flush_size:
+                    self.ready.wait(self.flush_interval)
+                lines = list(self.buffer)
+                self.buffer.clear()
+                dropped, self.dropped = self.dropped, 0
+                running = self.running
+            if dropped:
+                logger.warning("Log buffer full, {} lines "
+                               "dropped.".format(dropped))
+            if lines:
+                self._write_lines(lines)
+
+    def _write_lines(self, lines):
+        try:
+            self._rotate()
+            self.log_file.write("".join(lines))
+            self.log_file.flush()
+            if self.fsync == "flush":
+                os.fsync(self.log_file.fileno())
+        except (IOError, OSError):
+            logger.exception("Error while trying to write log file: "
+                             "{}".format(self.log_filename))
+
+    def _rotate(self):
+        """Moves the log aside and opens a new one, if it is too big or
+        it was started another day.
+        """
+
+        day = time.strftime("%Y-%m-%d")
+        if self.rotate_daily and day != self._day:
+            rotated = "{}.{}".format(self.log_filename, self._day)
+        elif (self.max_size and
+              os.fstat(self.log_file.fileno()).st_size >= self.max_size):
+            for number in range(self.backup_count - 1, 0, -1):
+                older = "{}.{}".format(self.log_filename, number)
+                if os.path.exists(older):
+                    os.rename(older, "{}.{}".format(self.log_filename,
+                                                    number + 1))
+            rotated = "{}.1".format(self.log_filename)
+        else:
+            return
+        self._day = day
+        self.log_file.close()
+        if os.path.exists(rotated):
+            os.remove(rotated)
+        os.rename(self.log_filename, rotated)
+        logger.info("Log rotated to {}".format(rotated))
+        self.log_file = open(self.log_filename, 'a')
+
+    def close(self):
+        """Writes the lines still buffered and closes the log file."""
+
+        with self.ready:
+            self.running = False
+            self.ready.notify()
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+        if self.log_file is not None and self.fsync != "never":
+            try:
+                os.fsync(self.log_file.fileno())
+            except (IOError, OSError):
+                logger.error("Error while trying to sync log file: "
+                             "{}".format(self.log_filename))
+        LogFile.close(self)
+
+
+class JsonLogFile(LogFile):
+    """Logs the scanning activity as JSON lines, one object for every
+    signal found, flushed as soon as it is written so that the output
+    can be followed while the scan runs.
+
+    """
+
+    def open(self, name=None):
+        """Opens a log file, "-" is the standard output.
+
+        :param name: log file name, defaults to None
+        :type name: string
+        """
+
+        if name is not None:
+            self.log_filename = name
+        if self.log_filename == "-":
+            self.log_file = sys.stdout
+        else:
+            LogFile.open(self)
+
+    def write(self, record_type, record, signal):
+        """Writes a message to the log file.
+
+        :param record_type: type of the record to write, 'B' or 'F'
+        :type record_type: string
+        :param record: bookmark ('B') or new bookmark dict ('F')
+        :type record: tuple or dict
+        :param signal: signal level
+        :type signal: int
+        :raises: TypeError if the record type isn't supported
+        :raises: AttributeError if the log file isn't open
+        """
+
+        entry = activity_entry(record_type, record, signal)
+        try:
+            with self.lock:
+                self.log_file.write(json.dumps(entry, sort_keys=True) + "\n")
+                self.log_file.flush()
+        except AttributeError:
+            logger.exception("No log file provided, but log feature selected.")
+            raise
+        except (IOError, OSError):
+            logger.exception("Error while trying to write log file: "
+                             "{}".format(self.log_filename))
+
+    def close(self):
+        """Closes the log file, the standard output is left open."""
+
+        if self.log_file is not sys.stdout:
+            LogFile.close(self)
+
+
+class SqliteLogFile(LogFile):
+    """Logs the scanning activity in the activity table of a database,
+    indexed by time and frequency, so that it can be queried while the
+    scan writes.
+
+    """
+
+    def open(self, name=None):
+        """Opens the database.
+
+        :param name: database file name, defaults to None
+        :type name: string
+        """
+
+        if name is not None:
+            self.log_filename = name
+        self._make_path()
+        try:
+            self.log_file = sqlite_connect(self.log_filename)
+        except sqlite3.Error:
+            logger.error("Error while trying to open log database: "
+                         "{}".format(self.log_filename))
+
+    def write(self, record_type, record, signal):
+        """Writes a message to the log database.
+
+        :param record_type: type of the record to write, 'B' or 'F'
+        :type record_type: string
+        :param record: bookmark ('B') or new bookmark dict ('F')
+        :type record: tuple or dict
+        :param signal: signal level
+        :type signal: int
+        :raises: TypeError if the record type isn't supported
+        :raises: AttributeError if the log file isn't open
+        """
+
+        entry = activity_entry(record_type, record, signal)
+        try:
+            with self.lock:
+                with self.log_file:
+                    self.log_file.execute("INSERT INTO activity (time, type, "
+                                          "freq, mode, description, bookmark, "
+                                          "level) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                          (entry["time"],
+                                           entry["type"],
+                                           entry["freq"],
+                                           entry["mode"],
+                                           entry.get("description"),
+                                           entry.get("bookmark"),
+                                           entry["level"]))
+        except AttributeError:
+            logger.exception("No log file provided, but log feature selected.")
+            raise
+        except sqlite3.Error:
+            logger.exception("Error while trying to write log database: "
+                             "{}".format(self.log_filename))
+
+    def activity(self, since=None, until=None, low=None, high=None):
+        """Reads the activity logged, oldest first.
+
+        :param since: first time, as "YYYY-MM-DDTHH:MM:SSZ" in UTC
+        :type since: string
+        :param until: time after the last one, same format as since
+        :type until: string
+        :param low: lowest frequency, in hertz
+        :type low: int
+        :param high: highest frequency, in hertz
+        :type high: int
+        :returns: the activity
+        :return type: list of dicts
+        """
+
+        conditions = []
+        values = []
+        for condition, value in (("time >= ?", since),
+                                 ("time < ?", until),
+                                 ("freq >= ?", low),
+                                 ("freq <= ?", high)):
+            if value is not None:
+                conditions.append(condition)
+                values.append(value)
+        query = ("SELECT time, type, freq, mode, description, bookmark, "
+                 "level FROM activity")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY time, id"
+        keys = ("time", "type", "freq", "mode", "description", "bookmark",
+                "level")
+        with self.lock:
+            rows = self.log_file.execute(query, values).fetchall()
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self):
+        """Closes the log database."""
+
+        if self.log_file is not None:
+            try:
+                self.log_file.close()
+            except sqlite3.Error:
+                logger.error("Error while trying to close log database: "
+                             "{}".format(self.log_filename))
+
+
+class BookmarkDatabase(object):
+    """Bookmarks kept in the bookmarks table of a database, whose
+    primary key, frequency and mode, indexes the frequency.
+
+    """
+
+    def __init__(self, filename):
+        """
+        :param filename: database file
+        :type filename: string
+        :raises: sqlite3.Error if the database can't be opened
+        """
+
+        self.filename = filename
+        self.connection = sqlite_connect(filename)
+
+    def load(self):
+        """Reads the bookmarks.
+
+        :returns: the bookmarks sorted by frequency, frequency in hertz
+        :return type: list of tuples
+        """
+
+        return self.connection.execute("SELECT freq, mode, description, "
+                                       "lockout FROM bookmarks "
+                                       "ORDER BY freq").fetchall()
+
+    def in_range(self, low, high):
+        """Reads the bookmarks between two frequencies, ends included.
+
+        :returns: the bookmarks sorted by frequency
+        :return type: list of tuples
+        """
+
+        return self.connection.execute("SELECT freq, mode, description, "
+                                       "lockout FROM bookmarks "
+                                       "WHERE freq BETWEEN ? AND ? "
+                                       "ORDER BY freq", (low, high)).fetchall()
+
+    def save(self, rows):
+        """Replaces the bookmarks, in one transaction.
+
+        :param rows: the bookmarks, frequency in hertz
+        :type rows: iterable of rows
+        """
+
+        with self.connection:
+            self.connection.execute("DELETE FROM bookmarks")
+            self._insert(rows)
+
+    def update(self, rows):
+        """Adds the bookmarks, or updates the ones already present,
+        in one transaction.
+
+        :param rows: the bookmarks, frequency in hertz
+        :type rows: iterable of rows
+        """
+
+        with self.connection:
+            self._insert(rows)
+
+    def _insert(self, rows):
+        self.connection.executemany("INSERT OR REPLACE INTO bookmarks "
+                                    "VALUES (?, ?, ?, ?)",
+                                    ((int(row[BM.freq]),
+                                      row[BM.mode],
+                                      row[BM.desc],
+                                      row[BM.lockout]) for row in rows))
+
+    def close(self):
+        self.connection.close()
@@ -37,6 +37,16 @@ class UnsupportedScanningConfigError(NonRetriableError):
 class UnsupportedSyncConfigError(NonRetriableError):
     pass
 
+class SpectrumUnavailableError(NonRetriableError):
+    """numpy, needed by the spectrum scan, is not installed."""
+
+class RigCtlError(NonRetriableError):
+    """The rig replied with a RPRT error code."""
+
+    def __init__(self, code):
+        NonRetriableError.__init__(self, "RPRT {}".format(code))
+        self.code = code
+
 # retriable custom exceptions
 
 class RetriableError (Exception):
@@ -24,6 +24,8 @@ TAS - Tim Sweeney - mainetim@gmail.com
 # import modules
 from Queue import Queue, Empty, Full
 import logging
+import threading
+import time
 from rig_remote.constants import QUEUE_MAX_SIZE
 
 # logging configuration
@@ -40,6 +42,8 @@ class QueueComms (object):
 
         self.parent_queue = Queue(maxsize=QUEUE_MAX_SIZE)
         self.child_queue = Queue(maxsize=QUEUE_MAX_SIZE)
+        self.child_ready = threading.Condition()
+        self.child_woken = False
 
     def queued_for_child(self):
         """wrapper on self._queue_for()
@@ -119,9 +123,41 @@ class QueueComms (object):
 
 
     def send_to_child(self, item):
-        """Wrapper for _send_to_queue"""
+        """Wrapper for _send_to_queue, wakes up the child if it is
+        waiting in wait_for_child."""
+
+        with self.child_ready:
+            self._send_to_queue(self.child_queue, item)
+            self.child_ready.notify_all()
+
+
+    def wake_child(self):
+        """Wakes up the child waiting in wait_for_child, even if
+        nothing was queued."""
+
+        with self.child_ready:
+            self.child_woken = True
+            self.child_ready.notify_all()
+
+
+    def wait_for_child(self, timeout):
+        """Blocks until an item is queued for the child, wake_child
+        is called or timeout expires.
+
+        :param timeout: max seconds to wait
+        :type timeout: int or float
+        :returns: True if an item is waiting for the child
+        """
 
-        self._send_to_queue(self.child_queue, item)
+        deadline = time.time() + timeout
+        with self.child_ready:
+            while not self.child_woken and self.child_queue.empty():
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.child_ready.wait(remaining)
+            self.child_woken = False
+            return not self.child_queue.empty()
 
 
     def _signal(self, queue, signal_number):
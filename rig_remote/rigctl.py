@@ -18,8 +18,10 @@ Copyright (c) 2015 Simone Marzona
 """
 
 import logging
-import telnetlib
 import socket
+import time
+from rig_remote.connection_pool import rig_pool
+from rig_remote.exceptions import RigCtlError
 from rig_remote.constants import (
 #                                 DEFAULT_CONFIG,
                                  ALLOWED_VFO_COMMANDS,
@@ -28,7 +30,9 @@ from rig_remote.constants import (
                                  ALLOWED_FUNC_COMMANDS,
                                  RESET_CMD_DICT,
                                  ALLOWED_RIGCTL_MODES,
-                                 RIG_TIMEOUT,
+                                 RESPONSE_LINES,
+                                 RIG_COMMAND_TIMEOUT,
+                                 COMMAND_TIMEOUTS,
                                  )
 
 # logging configuration
@@ -39,12 +43,14 @@ logger = logging.getLogger(__name__)
 class RigCtl(object):
     """Basic rigctl client implementation."""
 
-    def __init__(self, target):
+    def __init__(self, target, pool=rig_pool):
         """implements the rig.
 
 
         :param target: rig uri data
         :type target: dict created from build_rig_uri
+        :param pool: connection pool, defaults to the one shared by all rigs
+        :type pool: ConnectionPool object
         :raises TypeError: if the target is not a dict of 3 keys
         """
 
@@ -53,6 +59,12 @@ class RigCtl(object):
                          "but {}".format(type(target)))
             raise TypeError
         self.target = target
+        self.pool = pool
+        # reply lengths learned from the rigs, see _read_reply
+        self.reply_lines = {}
+        # called with the command and the seconds taken by every
+        # exchange with the rig, e.g. ScanStats.add_command
+        self.latency_observer = None
 
     def _request(self, request, target=None):
         """Main method implementing the rigctl protocol. It's  wrapped by the
@@ -60,33 +72,226 @@ class RigCtl(object):
 
         :param request: string to send through the telnet connection
         :type request: string
-        :raises: none
+        :raises: socket.error, socket.timeout if the rig can't be reached
         :returns response: response data
         :response type: string
         """
 
-        if not target:
-            target = self.target
-
-        try:
-            con = telnetlib.Telnet(target["hostname"],
-                                   target["port"],
-                                   RIG_TIMEOUT)
-        except socket.timeout:
+        return self._timed(request.split()[0],
+                           ('%s\n' % request).encode('ascii'),
+                           lambda con: self._read_reply(con, request),
+                           target or self.target)
+
+    def batch(self, requests, target=None):
+        """Sends several rigctl commands in a single write and reads
+        the replies in order, so that the whole batch costs one round
+        trip instead of one per command.
+
+        :param requests: commands to send, e.g. ["F 145500000", "l", "m"]
+        :type requests: list of strings
+        :raises: socket.error, socket.timeout if the rig can't be reached,
+        RigCtlError once every reply has been read, if the rig reports an
+        error to an extended command
+        :returns: one reply for every command, multi line replies are
+        joined by a newline as in _request
+        :return type: list of strings
+        """
 
-            logger.error("Time out while connecting to {}:{}".format(target["hostname"],
-                                                                     ["port"]))
-            raise
-        except socket.error:
-            logger.exception("Connection refused on {}:{}".format(["hostname"],
-                                                                  ["port"]))
-            raise
+        def read(con):
+            replies = []
+            error = None
+            for request in requests:
+                try:
+                    replies.append(self._read_reply(con, request))
+                except RigCtlError as e:
+                    # the replies that follow are still on the connection
+                    error = error or e
+            if error is not None:
+                raise error
+            return replies
+
+        payload = "".join('%s\n' % request for request in requests)
+        return self._timed(",".join(request.split()[0] for request in requests),
+                           payload.encode('ascii'),
+                           read,
+                           target or self.target)
+
+    def _timed(self, command, payload, read, target):
+        """Wrapper around _exchange that reports its latency to
+        latency_observer, if any, under the name command.
+        """
 
-        con.write(('%s\n' % request).encode('ascii'))
-        response = con.read_some().decode('ascii').strip()
-        con.write('c\n'.encode('ascii'))
+        if self.latency_observer is None:
+            return self._exchange(payload, read, target)
+        start = time.time()
+        response = self._exchange(payload, read, target)
+        self.latency_observer(command, time.time() - start)
         return response
 
+    def _read_reply(self, con, request):
+        """Reads the reply to a single command line by line, until
+        _reply_complete tells it's whole. COMMAND_TIMEOUTS tells for how
+        long we wait for every line.
+        Older gqrx versions reply to 'm' with the mode only: if the
+        second line doesn't arrive we remember the rig does so.
+
+        :param con: connection the command was sent on
+        :type con: PooledConnection object
+        :param request: the command sent
+        :type request: string
+        :raises: socket.timeout if the reply doesn't arrive in time,
+        EOFError if the connection is closed, RigCtlError if the rig
+        reports an error to an extended command
+        :returns: the reply, see _parse_reply
+        """
+
+        command = request.split()[0]
+        timeout = COMMAND_TIMEOUTS.get(command, RIG_COMMAND_TIMEOUT)
+        lines = [self._read_line(con, request, timeout)]
+        while not self._reply_complete(con.key, request, lines):
+            if command.startswith("+"):
+                line = self._read_line(con, request, timeout)
+            else:
+                line = con.readline(timeout)
+                if line is None:
+                    self._learn_reply_lines(con.key, command, len(lines))
+                    break
+            lines.append(line)
+        return self._parse_reply(con.key, request, lines)
+
+    def _expected_lines(self, key, command):
+        """RESPONSE_LINES tells how many lines the reply to command has,
+        unless the rig at key replied with less lines before.
+        """
+
+        return self.reply_lines.get((key, command),
+                                    RESPONSE_LINES.get(command, 1))
+
+    def _learn_reply_lines(self, key, command, count):
+        logger.warning("Rig {}:{} replies to {} with {} line(s)"
+                       "".format(key[0], key[1], command, count))
+        self.reply_lines[(key, command)] = count
+
+    def _reply_complete(self, key, request, lines):
+        """Tells if lines are the whole reply to request. A RPRT line
+        ends the reply early, it's how the rig reports an error. The
+        reply to a command sent with the extended response protocol
+        ('+' prefix) is the command echo, one "name: value" line for
+        every value and the RPRT line with the result code.
+
+        :param key: rig the command was sent to
+        :type key: tuple of hostname and port
+        :param lines: the lines received so far, at least one
+        :type lines: list of strings
+        """
+
+        command = request.split()[0]
+        if command.startswith("+"):
+            return len(lines) > 1 and lines[-1].startswith("RPRT")
+        return (lines[0].startswith("RPRT") or
+                len(lines) >= self._expected_lines(key, command))
+
+    def _parse_reply(self, key, request, lines):
+        """Builds the reply to request from its lines.
+
+        :raises RigCtlError: if the rig reports an error to an
+        extended command
+        :returns: the lines joined by a newline, for an extended
+        command the values
+        """
+
+        command = request.split()[0]
+        if command.startswith("+"):
+            code = int(lines[-1].split()[1])
+            if code != 0:
+                logger.error("Rig replied {} to {}".format(lines[-1], request))
+                raise RigCtlError(code)
+            return "\n".join(line.split(":", 1)[-1].strip()
+                             for line in lines[1:-1])
+        if lines[0].startswith("RPRT") and self._expected_lines(key, command) > 1:
+            logger.warning("Rig replied {} to {}".format(lines[0], request))
+        return "\n".join(lines)
+
+    def _read_line(self, con, request, timeout):
+        line = con.readline(timeout)
+        if line is None:
+            logger.error("Time out waiting for the reply to {}".format(request))
+            raise socket.timeout
+        return line
+
+    def _exchange(self, payload, read, target):
+        """Writes payload on a pooled connection to target and reads
+        the reply with read. The connection is given back to the pool
+        once the reply has been read, a stale pooled connection
+        is replaced once.
+
+        :param payload: data to send
+        :type payload: bytes
+        :param read: callable that reads the reply from the connection
+        :type read: function
+        :param target: rig uri data
+        :type target: dict created from build_rig_uri
+        :raises: socket.error, socket.timeout if the rig can't be reached
+        :returns: whatever read returns
+        """
+
+        while True:
+            con = self.pool.acquire(target)
+            try:
+                con.write(payload)
+                response = read(con)
+            except (socket.error, EOFError):
+                self.pool.discard(con)
+                if con.reused:
+                    # the rig dropped an idle connection, retry on a new one
+                    continue
+                logger.exception("Connection lost while sending {!r} to "
+                                 "{}:{}".format(payload,
+                                                target["hostname"],
+                                                target["port"]))
+                raise
+            except RigCtlError:
+                # read raises it only once every reply has been read, the
+                # connection is fine
+                self.pool.release(con)
+                raise
+            self.pool.release(con)
+            return response
+
+    def _get(self, request, expected_type, description, target=None,
+             convert=None):
+        """Wrapper around _request used by the getters: every getter
+        sends exactly one command and checks the type of the reply.
+
+        :param request: rigctl command
+        :type request: string
+        :param expected_type: type the reply must have
+        :type expected_type: type
+        :param description: what we are getting, used for logging
+        :type description: string
+        :param convert: applied to the reply, e.g. int
+        :type convert: function
+        :raises: ValueError if the reply is not of expected_type or
+        can't be converted
+        :returns: the reply
+        """
+
+        output = self._request(request, target)
+        if not isinstance(output, expected_type):
+            logger.error("Expected {} while getting {}, "
+                         "got {}".format(expected_type.__name__,
+                                         description,
+                                         output))
+            raise ValueError
+        if convert is not None:
+            try:
+                output = convert(output)
+            except ValueError:
+                logger.error("Invalid {} from the rig: "
+                             "{}".format(description, output))
+                raise
+        return output
+
     def set_frequency(self, frequency, target=None):
         """Wrapper around _request. It configures the command for setting
         a frequency.
@@ -102,17 +307,12 @@ class RigCtl(object):
         return self._request('F %s' % frequency, target)
 
     def get_frequency(self, target=None):
-        """Wrapper around _request. It configures the command for getting
+        """Wrapper around _get. It configures the command for getting
         a frequency.
 
         """
-        output = self._request('f')
-        if not isinstance(output, basestring):
-            logger.error("Expected unicode string while getting radio "
-                         "frequency, got {}".format(output))
-            raise ValueError
 
-        return self._request('f', target)
+        return self._get('f', basestring, "radio frequency", target)
 
     def set_mode(self, mode, target=None):
         """Wrapper around _request. It configures the command for setting
@@ -127,21 +327,13 @@ class RigCtl(object):
         return self._request('M %s' % mode, target)
 
     def get_mode(self, target=None):
-        """Wrapper around _request. It configures the command for getting
+        """Wrapper around _get. It configures the command for getting
         the mode.
 
         """
         # older versions of gqrx replies with only the mode (u'WFM_ST' as an example)
         # newer versions replie with something like u'WFM_ST\n160000'
-        if "\n" in self._request('m'):
-            output = self._request('m').split("\n")[0]
-        else:
-            output = self._request('m')
-        if not isinstance(output, basestring):
-            logger.error("Expected unicode string while getting radio mode, "
-                         "got {}".format(output))
-            raise ValueError
-        return output
+        return self._get('m', basestring, "radio mode", target).split("\n")[0]
 
     def start_recording(self):
         """Wrapper around _request. It configures the command for starting
@@ -160,18 +352,12 @@ class RigCtl(object):
         return self._request('LOS')
 
     def get_level(self):
-        """Wrapper around _request. It configures the command for getting
+        """Wrapper around _get. It configures the command for getting
         the signal level.
 
         """
 
-        output = self._request('l')
-        if not isinstance(output, basestring):
-            logger.error("Expected unicode string while getting radio "
-                         "signal level, got {}".format(output))
-            raise ValueError
-
-        return output
+        return self._get('l', basestring, "radio signal level")
 
     def set_vfo(self, vfo):
         """Wrapper around _request. It configures the command for setting
@@ -187,18 +373,12 @@ class RigCtl(object):
         return self._request('V %s' % vfo)
 
     def get_vfo(self):
-        """Wrapper around _request. It configures the command for getting
+        """Wrapper around _get. It configures the command for getting
         VFO.
 
         """
 
-        output = self._request('v')
-        if not isinstance(output, basestring):
-            logger.error("Expected unicode string while getting VFO, "
-                         "got {}".format(output))
-            raise ValueError
-
-        return output
+        return self._get('v', basestring, "VFO")
 
     def set_rit(self, rit):
         """Wrapper around _request. It configures the command for getting
@@ -214,18 +394,12 @@ class RigCtl(object):
         return self._request('J %s' % rit)
 
     def get_rit(self):
-        """Wrapper around _request. It configures the command for getting
+        """Wrapper around _get. It configures the command for getting
         RIT.
 
         """
 
-        output = self._request('j')
-        if not isinstance(output, basestring):
-            logger.error("Expected unicode string while getting RIT, "
-                         "got {}".format(type(output)))
-            raise ValueError
-
-        return output
+        return self._get('j', basestring, "RIT")
 
     def set_xit(self, xit):
         """Wrapper around _request. It configures the command for getting
@@ -241,18 +415,12 @@ class RigCtl(object):
         return self._request('J %s' % xit)
 
     def get_xit(self):
-        """Wrapper around _request. It configures the command for getting
+        """Wrapper around _get. It configures the command for getting
         XIT.
 
         """
 
-        output = self._request('j')
-        if not isinstance(output, basestring):
-            logger.error("Expected unicode string while getting XIT, "
-                         "got {}".format(type(output)))
-            raise ValueError
-
-        return output
+        return self._get('z', basestring, "XIT")
 
     def set_split_freq(self, split_freq):
         """Wrapper around _request. It configures the command for setting
@@ -268,18 +436,12 @@ class RigCtl(object):
         return self._request('I %s' % split_freq)
 
     def get_split_freq(self):
-        """Wrapper around _request. It configures the command for getting
-        XIT.
+        """Wrapper around _get. It configures the command for getting
+        the split frequency.
 
         """
 
-        output = self._request('i')
-        if not isinstance(output, int):
-            logger.error("Expected int while getting split_frequency, "
-                         "got {}".format(type(output)))
-            raise ValueError
-
-        return output
+        return self._get('i', basestring, "split_frequency", convert=int)
 
     def set_split_mode(self, split_mode):
         """Wrapper around _request. It configures the command for setting
@@ -296,18 +458,12 @@ class RigCtl(object):
         return self._request('X %s' % split_mode)
 
     def get_split_mode(self):
-        """Wrapper around _request. It configures the command for getting
+        """Wrapper around _get. It configures the command for getting
         the split mode.
 
         """
 
-        output = self._request('x')
-        if not isinstance(output, str):
-            logger.error("Expected string while getting split_frequency_mode, "
-                         "got {}".format(type(output)))
-            raise ValueError
-
-        return output
+        return self._get('x', basestring, "split_frequency_mode")
 
     def set_func(self, func):
         """Wrapper around _request. It configures the command for getting
@@ -323,17 +479,12 @@ class RigCtl(object):
         return self._request('U %s' % func)
 
     def get_func(self):
-        """Wrapper around _request. It configures the command for getting
+        """Wrapper around _get. It configures the command for getting
         func.
 
         """
 
-        output = self._request('u')
-        if not isinstance(output, basestring):
-            logger.error("Expected unicode string while getting func, "
-                         "got {}".format(output))
-            raise ValueError
-        return output
+        return self._get('u', basestring, "func")
 
     def set_parm(self, parm):
         """Wrapper around _request. It configures the command for getting
@@ -348,18 +499,12 @@ class RigCtl(object):
         return self._request('P %s' % parm)
 
     def get_parm(self):
-        """Wrapper around _request. It configures the command for getting
+        """Wrapper around _get. It configures the command for getting
         parm.
 
         """
 
-        output = self._request('p')
-        if not isinstance(output, basestring):
-            logger.error("Expected unicode string while getting parm, "
-                         "got {}".format(output))
-            raise ValueError
-
-        return output
+        return self._get('p', basestring, "parm")
 
     def set_antenna(self, antenna):
         """Wrapper around _request. It configures the command for setting
@@ -375,18 +520,12 @@ class RigCtl(object):
         return self._request('Y %s' % antenna)
 
     def get_antenna(self):
-        """Wrapper around _request. It configures the command for getting
+        """Wrapper around _get. It configures the command for getting
         the antenna in use.
 
         """
 
-        output = self._request('f')
-        if not isinstance(output, int):
-            logger.error("Expected integer while getting radio antenna, "
-                         "got {}".format(output))
-            raise ValueError
-
-        return self._request('y')
+        return self._get('y', basestring, "radio antenna", convert=int)
 
     def rig_reset(self, reset_signal):
         """Wrapper around _request. It configures the command for resetting
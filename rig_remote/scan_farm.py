@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+
+"""
+Remote application that interacts with rigs using rigctl protocol.
+
+Please refer to:
+http://gqrx.dk/
+http://gqrx.dk/doc/remote-control
+http://sourceforge.net/apps/mediawiki/hamlib/index.php?title=Documentation
+
+Author: Rafael Marmelo
+Author: Simone Marzona
+
+License: MIT License
+
+Copyright (c) 2014 Rafael Marmelo
+Copyright (c) 2015 Simone Marzona
+"""
+
+# import modules
+import logging
+import multiprocessing
+import signal
+import threading
+from Queue import Empty
+from rig_remote.bookmark_set import BookmarkSet
+from rig_remote.connection_pool import ConnectionPool
+from rig_remote.constants import MULTI_RIG_POLL_INTERVAL
+from rig_remote.exceptions import InvalidScanModeError
+from rig_remote.rigctl import RigCtl
+from rig_remote.scanning import Scanning, ScanningTask
+from rig_remote.stmessenger import STMessenger
+from rig_remote.utility import khertz_to_hertz
+
+# logging configuration
+logger = logging.getLogger(__name__)
+
+
+# class definition
+class QueueLog(object):
+    """Activity log of a worker: the records are sent to the supervisor,
+    that writes them in the real log.
+
+    """
+
+    def __init__(self, results, index):
+        self.results = results
+        self.index = index
+
+    def write(self, record_type, record, signal):
+        self.results.put(("log", self.index, (record_type, record, signal)))
+
+    def close(self):
+        pass
+
+
+def partition(range_min, range_max, interval, count, interleaved=False):
+    """Splits the range in count sub-bands.
+
+    :param range_min: first frequency of the range, in hertz
+    :type range_min: int
+    :param range_max: end of the range, in hertz
+    :type range_max: int
+    :param interval: scan step, in khertz
+    :type interval: int
+    :param count: number of sub-bands
+    :type count: int
+    :param interleaved: if True every sub-band covers the whole range
+    taking one channel every count, otherwise the sub-bands are
+    contiguous
+    :type interleaved: boolean
+    :returns: the non empty sub-bands as tuples of range_min,
+    range_max and interval, same units as the input
+    :return type: list of tuples
+    """
+
+    step = khertz_to_hertz(interval)
+    channels = max(0, -(-(range_max - range_min) // step))
+    count = min(count, channels)
+    if interleaved:
+        return [(range_min + i * step, range_max, interval * count)
+                for i in range(count)]
+    bands = []
+    start = 0
+    for i in range(count):
+        end = start + channels // count + (1 if i < channels % count else 0)
+        bands.append((range_min + start * step,
+                      min(range_min + end * step, range_max),
+                      interval))
+        start = end
+    return bands
+
+
+def scan_worker(index, mode, params, target, bookmarks, results, stop):
+    """Runs in a worker process: scans with the rig at target and sends
+    the activity found to the supervisor over results.
+
+    :param index: number of the worker
+    :type index: int
+    :param mode: scanning mode, bookmarks or frequency
+    :type mode: string
+    :param params: plain scan parameters, see HEADLESS_SCAN_PARAMS
+    :type params: dictionary
+    :param target: rig uri data
+    :type target: dict created from build_rig_uri
+    :param bookmarks: bookmarks scanned by this worker, in frequency mode
+    the known channels, see Scanning._known_bookmark
+    :type bookmarks: list of bookmarks
+    :param results: queue read by the supervisor
+    :type results: multiprocessing.Queue object
+    :param stop: set by the supervisor to stop the scan
+    :type stop: multiprocessing.Event object
+    """
+
+    # the supervisor handles ctrl-c and stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        # connections inherited from the parent can't be shared
+        rig = RigCtl(target, ConnectionPool())
+        if mode == "frequency":
+            bookmarks = BookmarkSet(bookmarks)
+        task = ScanningTask(STMessenger(), mode, bookmarks, [], params,
+                            rig, None)
+        scanning = Scanning()
+
+        def wait_for_stop():
+            stop.wait()
+            scanning.terminate()
+
+        watcher = threading.Thread(target=wait_for_stop)
+        watcher.daemon = True
+        watcher.start()
+        scanning.scan(task, QueueLog(results, index))
+        for nbm in task.new_bookmark_list:
+            results.put(("bookmark", index, nbm))
+        rig.pool.close_all()
+    except Exception as e:
+        logger.exception("Worker {} failed.".format(index))
+        results.put(("error", index, str(e)))
+    results.put(("done", index, None))
+
+
+class ScanFarm(object):
+    """Scan done with many rigs, one worker process for every rig, so
+    that the rigs are not limited by one interpreter. A frequency range
+    is split in sub-bands, see partition, the bookmarks are dealt
+    to the rigs. The workers send the activity found back to the
+    supervisor, that writes the log and collects the new bookmarks.
+
+    """
+
+    def __init__(self):
+        self.stop = multiprocessing.Event()
+        self.results = multiprocessing.Queue()
+        self.processes = []
+        # workers that failed in the last scan, with the error
+        self.errors = []
+
+    def terminate(self):
+        self.stop.set()
+
+    def _jobs(self, mode, params, targets, bookmarks, interleaved):
+        """Splits the scan in one job for every rig.
+
+        :returns: the parameters and the bookmarks of every job
+        :return type: list of tuples
+        """
+
+        if mode == "bookmarks":
+            count = min(len(targets), len(bookmarks))
+            return [(params, bookmarks[i::count]) for i in range(count)]
+        jobs = []
+        for band in partition(params["range_min"],
+                              params["range_max"],
+                              params["interval"],
+                              len(targets),
+                              interleaved):
+            job_params = dict(params)
+            job_params["range_min"], job_params["range_max"], \
+                job_params["interval"] = band
+            # an interleaved band steps over several channels
+            job_params["spacing"] = params["interval"]
+            jobs.append((job_params, bookmarks))
+        return jobs
+
+    def scan(self, mode, params, targets, log, bookmarks=(), interleaved=False):
+        """Scans with all the rigs in targets, until every worker is done
+        or terminate() is called.
+
+        :param mode: scanning mode, bookmarks or frequency
+        :type mode: string
+        :param params: plain scan parameters, see HEADLESS_SCAN_PARAMS
+        :type params: dictionary
+        :param targets: the rigs
+        :type targets: list of dicts created from build_rig_uri
+        :param log: where the activity found is written
+        :type log: LogFile object
+        :param bookmarks: bookmarks to scan in bookmarks mode, the known
+        channels in frequency mode
+        :type bookmarks: list of bookmarks
+        :param interleaved: how a frequency range is split, see
+        partition
+        :type interleaved: boolean
+        :raises InvalidScanModeError: if mode is not bookmarks or frequency
+        :returns: the new bookmarks found by all the rigs, the workers
+        that failed are left in errors
+        :return type: list of dicts
+        """
+
+        if mode not in ("bookmarks", "frequency"):
+            logger.error("Scan farm supports only bookmarks and "
+                         "frequency mode.")
+            raise InvalidScanModeError
+
+        self.errors = []
+        jobs = self._jobs(mode, params, targets, list(bookmarks), interleaved)
+        for index, (target, job) in enumerate(zip(targets, jobs)):
+            logger.info("Worker {} scans with {}:{}".format(index,
+                                                           target["hostname"],
+                                                           target["port"]))
+            process = multiprocessing.Process(target=scan_worker,
+                                              args=(index,
+                                                    mode,
+                                                    job[0],
+                                                    target,
+                                                    job[1],
+                                                    self.results,
+                                                    self.stop))
+            process.daemon = True
+            process.start()
+            self.processes.append(process)
+
+        new_bookmarks = []
+        running = len(self.processes)
+        while running:
+            try:
+                kind, index, data = self.results.get(True,
+                                                     MULTI_RIG_POLL_INTERVAL)
+            except Empty:
+                if not any(p.is_alive() for p in self.processes):
+                    logger.error("Workers ended without reporting.")
+                    self.errors.append((None, "ended without reporting"))
+                    break
+                continue
+            if kind == "log":
+                log.write(*data)
+            elif kind == "bookmark":
+                new_bookmarks.append(data)
+            elif kind == "error":
+                logger.error("Worker {} failed: {}".format(index, data))
+                self.errors.append((index, data))
+            elif kind == "done":
+                running -= 1
+        for process in self.processes:
+            process.join()
+        self.processes = []
+        return new_bookmarks
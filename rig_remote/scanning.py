@@ -59,23 +59,43 @@ TAS - Tim Sweeney - mainetim@gmail.com
 
 import datetime
 #from rig_remote.rigctl import RigCtl
-from rig_remote.disk_io import LogFile
+from rig_remote.disk_io import open_log_file, atomic_open
 from rig_remote.constants import SUPPORTED_SCANNING_MODES
 from rig_remote.constants import TIME_WAIT_FOR_TUNE
+from rig_remote.constants import TUNE_SETTLE_POLL
+from rig_remote.constants import TUNE_SETTLE_TOLERANCE
+from rig_remote.constants import TUNE_SETTLE_LEARNING_RATE
+from rig_remote.constants import TUNE_SETTLE_HEADSTART
 from rig_remote.constants import SIGNAL_CHECKS
+from rig_remote.constants import SIGNAL_CHECK_CONFIDENCE
+from rig_remote.constants import SIGNAL_MARGIN
+from rig_remote.constants import SIGNAL_NOISE_SIGMA
 from rig_remote.constants import NO_SIGNAL_DELAY
 from rig_remote.constants import MIN_INTERVAL
 #from rig_remote.constants import MONITOR_MODE_DELAY
 from rig_remote.constants import BM
+from rig_remote.constants import HEADLESS_SCAN_PARAMS
+from rig_remote.constants import HEADLESS_SCAN_FLAGS
+from rig_remote.constants import UNKNOWN_MODE
+from rig_remote.constants import SCAN_PHASES
+from rig_remote.constants import SCAN_LATENCY_BUCKETS
 from rig_remote.exceptions import UnsupportedScanningConfigError, InvalidScanModeError
 from rig_remote.stmessenger import STMessenger
+from rig_remote.bookmark_set import BookmarkSet, SortedBookmarks
+from rig_remote.spectrum import SpectrumFile, find_peaks, check_numpy
+from rig_remote.stats import LatencyHistogram
 from rig_remote.utility import(
                              khertz_to_hertz,
                              dbfs_to_sgn,
                              build_rig_uri,
                             )
+from contextlib import contextmanager
+import json
+import math
+import numbers
 import socket
 import logging
+import threading
 import time
 import re
 
@@ -99,15 +119,20 @@ class ScanningTask(object):
                  rig_controller,
                  log_filename):
         """We do some checks to see if we are good to go with the scan.
+        The parameters are either the UI widgets, or plain values
+        (see HEADLESS_SCAN_PARAMS and HEADLESS_SCAN_FLAGS) when the scan
+        runs without the UI.
 
         :param scanq: queue used send/receive events from the UI.
-        :type scanq: Queue object
+        :type scanq: STMessenger object
         :param pass_params: configuration parameters
         :type pass_params: standard python dictionary
         :param mode: scanning mode, either bookmark or frequency
         :type mode: string
-        :param bookmark: the actual list of bookmarks, may be empty
-        :type bookmark: list of tuples, every tuple is a bookmark
+        :param bookmarks: the bookmarks, may be empty. It is iterated
+        again on every pass, so that lockouts set during the scan are seen
+        :type bookmarks: iterable of bookmarks, every bookmark is a
+        tuple or list indexed with BM
         :raises: UnsupportedScanningConfigError if action or mode are not
         allowed
         :raises: ValueError if the pass_params dictionary contains invalid data
@@ -131,6 +156,26 @@ class ScanningTask(object):
         self.params = pass_params
         self.rig = rig_controller
 
+        if "txt_range_min" in self.params:
+            self._read_widgets()
+        else:
+            self._check_params()
+
+        if mode == "spectrum":
+            check_numpy()
+            if "spectrum_file" not in self.params:
+                logger.error("Spectrum scan without spectrum_file.")
+                raise UnsupportedScanningConfigError
+
+        if mode in ("frequency", "spectrum"):
+            self._check_interval()
+
+    def _read_widgets(self):
+        """Reads the parameters from the UI widgets.
+
+        :raises: ValueError if a widget contains invalid data
+        """
+
         try:
             self.params["range_min"] = khertz_to_hertz(int(filter(str.isdigit,
                                                        self.params["txt_range_min"].get())))
@@ -160,9 +205,33 @@ class ScanningTask(object):
             logger.exception("passes:{}".format(self.params["txt_passes"]))
             logger.exception("sgn_level:{}".format(self.params["txt_sgn_level"]))
             raise
+        if "cbb_scan_mode" in self.params:
+            self.params["rig_mode"] = self.params["cbb_scan_mode"].get()
 
-        if mode == "frequency":
-            self._check_interval()
+    def _check_params(self):
+        """Checks the plain parameters of a scan done without the UI.
+
+        :raises: UnsupportedScanningConfigError if a parameter is missing
+        :raises: ValueError if a parameter contains invalid data
+        """
+
+        missing = [key for key in HEADLESS_SCAN_PARAMS if key not in self.params]
+        if missing:
+            logger.error("Missing scan parameters: {}".format(missing))
+            raise UnsupportedScanningConfigError
+        try:
+            for key in HEADLESS_SCAN_PARAMS:
+                if key == "delay":
+                    self.params[key] = float(self.params[key])
+                else:
+                    self.params[key] = int(self.params[key])
+        except (TypeError, ValueError):
+            logger.exception("{} is not a number: {}".format(key,
+                                                             self.params[key]))
+            raise ValueError
+        for key in HEADLESS_SCAN_FLAGS:
+            self.params[key] = bool(self.params.get(key, False))
+        self.params.setdefault("rig_mode", None)
 
     def _check_interval(self):
         """Checks for a sane interval. We don't want to search for signals
@@ -176,49 +245,181 @@ class ScanningTask(object):
             self.params["interval"] = MIN_INTERVAL
 
 
+class ScanStats(object):
+    """Throughput of a scan: for every pass the channels visited, the
+    channels per second and the time spent in every phase, see
+    SCAN_PHASES, and for every rigctl command a latency histogram.
+    The stats are read by the UI while the scan runs, every access
+    holds a lock.
+
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.passes = []
+            self.current = self._new_pass()
+            self.commands = {}
+
+    @staticmethod
+    def _new_pass():
+        return {"start": time.time(),
+                "channels": 0,
+                "phases": dict((phase, 0.0) for phase in SCAN_PHASES)}
+
+    @staticmethod
+    def _pass_dict(scan_pass, end):
+        duration = end - scan_pass["start"]
+        return {"channels": scan_pass["channels"],
+                "duration": duration,
+                "channels_per_sec": (scan_pass["channels"] / duration
+                                     if duration > 0 else 0.0),
+                "phases": dict(scan_pass["phases"])}
+
+    def add_phase(self, phase, seconds):
+        with self.lock:
+            self.current["phases"][phase] += seconds
+
+    @contextmanager
+    def phase(self, phase):
+        """Times the block as part of phase."""
+
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_phase(phase, time.time() - start)
+
+    def add_channel(self, count=1):
+        with self.lock:
+            self.current["channels"] += count
+
+    def add_command(self, command, seconds):
+        """Records the latency of a rigctl command, see
+        RigCtl.latency_observer.
+        """
+
+        with self.lock:
+            if command not in self.commands:
+                self.commands[command] = LatencyHistogram(SCAN_LATENCY_BUCKETS)
+            self.commands[command].add(seconds)
+
+    def end_pass(self):
+        with self.lock:
+            self.passes.append(self._pass_dict(self.current, time.time()))
+            self.current = self._new_pass()
+
+    def as_dict(self):
+        """Snapshot of the stats.
+
+        :returns: passes, the completed passes, current, the pass in
+        progress, and commands, the latency histogram of every command
+        :return type: dictionary
+        """
+
+        with self.lock:
+            return {"passes": list(self.passes),
+                    "current": self._pass_dict(self.current, time.time()),
+                    "commands": dict((command, histogram.as_dict())
+                                     for command, histogram
+                                     in self.commands.items())}
+
+    def summary(self):
+        """One line description of the pass in progress, for the UI."""
+
+        with self.lock:
+            scan_pass = self._pass_dict(self.current, time.time())
+            busy = sum(scan_pass["phases"].values()) or 1.0
+            phases = " ".join("{} {:.0%}".format(phase,
+                                                 scan_pass["phases"][phase] / busy)
+                              for phase in SCAN_PHASES
+                              if scan_pass["phases"][phase])
+            return "Pass {}: {} channels, {:.1f} ch/s {}".format(
+                len(self.passes) + 1,
+                scan_pass["channels"],
+                scan_pass["channels_per_sec"],
+                phases).strip()
+
+    def dump(self, filename):
+        """Writes the stats in filename as JSON.
+
+        :raises: IOError if the file can't be written
+        """
+
+        with atomic_open(filename, "w") as stats_file:
+            json.dump(self.as_dict(), stats_file, indent=2, sort_keys=True)
+
+
 class Scanning(object):
     """Provides methods for doing the bookmark/frequency scan,
     updating the bookmarks with the active frequencies found.
 
     """
 
-    def __init__(self):
+    # average settle time of every rig, shared by all the scans
+    settle_times = {}
+
+    def __init__(self, confidence=SIGNAL_CHECK_CONFIDENCE):
+        """
+        :param confidence: confidence of the signal check decisions,
+        see _signal_check
+        :type confidence: float between 0.5 and 1
+        """
+
         self.scan_active = True
         self.prev_level = None
         self.prev_freq = None
         self.hold_bookmark = False
+        self.confidence = confidence
+        self.samples_used = 0
+        self.settle_time = None
+        self.scanq = None
+        self.found = BookmarkSet()
+        self.stats = ScanStats()
 
     def terminate(self):
         self.scan_active = False
+        if self.scanq is not None:
+            self.scanq.interrupt()
 
     def _queue_sleep(self, task):
-        """check the queue regularly during 'sleep'
+        """Sleeps for the delay of the task, waking up as soon as an
+        update is queued, to process it, or the scan is terminated.
 
         :param task: current scanning task
         :type Scanningtask object
+        :raises: ValueError if the delay is not a number
         :returns: None
         """
 
         length = task.params["delay"]
-        if not isinstance(length, int):
-            logger.error("delay is not an int: {}".format(type(task.params["delay"])))
+        if (not isinstance(length, numbers.Real) or
+            isinstance(length, bool)):
+            logger.error("delay is not a number: {}".format(type(task.params["delay"])))
             raise ValueError
 
-        while True:
+        deadline = time.time() + length
+        while self.scan_active:
             if task.scanq.update_queued():
                 self._process_queue(task)
-            if length > 0:
-                time.sleep(1)
-                length -= 1
-            else:
+            remaining = deadline - time.time()
+            if remaining <= 0:
                 break
+            with self.stats.phase("dwell"):
+                task.scanq.wait_for_update(remaining)
 
-    def scan(self, task):
+    def scan(self, task, log=None):
         """Wrapper method around _frequency and _bookmarks. It calls one
         of the wrapped functions matching the task.mode value
 
         :param task: object that represent a scanning task
         :type task: object from ScanningTask
+        :param log: activity log shared with other scans, if None the
+        scan opens task.log_filename
+        :type log: LogFile object
         :raises: none
         :returns: updates the scanning task object with the new activity found
         """
@@ -230,18 +431,32 @@ class Scanning(object):
                                  "{}".format(task.mode))
                 raise InvalidScanModeError
 
-        log = LogFile()
-        try:
-            log.open(task.log_filename)
-        except IOError:
-            logger.exception("Error while opening the log file.")
-            raise
+        self.scanq = task.scanq
+        self.found.clear()
+        self.stats.reset()
+        # the spectrum scan may have no rig
+        observed = hasattr(task.rig, "latency_observer")
+        if observed:
+            observer = task.rig.latency_observer
+            task.rig.latency_observer = self.stats.add_command
+        shared_log = log is not None
+        if not shared_log:
+            try:
+                log = open_log_file(task.log_filename)
+            except IOError:
+                logger.exception("Error while opening the log file.")
+                raise
 
         if task.mode.lower() == "bookmarks":
             task = self._bookmarks(task, log)
         elif task.mode.lower() == "frequency":
             task = self._frequency(task, log)
-        log.close()
+        elif task.mode.lower() == "spectrum":
+            task = self._spectrum(task, log)
+        if observed:
+            task.rig.latency_observer = observer
+        if not shared_log:
+            log.close()
 
     def _frequency_tune(self, task, freq):
         """helper function called inside _frequency().
@@ -250,7 +465,11 @@ class Scanning(object):
 
         logger.info("Tuning to {}".format(freq))
         try:
-            task.rig.set_frequency(freq)
+            with self.stats.phase("tune"):
+                task.rig.set_frequency(freq)
+            with self.stats.phase("settle"):
+                self._wait_for_tune(task.rig, int(freq))
+            self.stats.add_channel()
         except ValueError:
             logger.warning("Bad frequency parameter passed.")
             raise
@@ -258,21 +477,132 @@ class Scanning(object):
             logger.warning("Communications Error!")
             self.scan_active = False
             raise
-        time.sleep(TIME_WAIT_FOR_TUNE)
 
-    def _create_new_bookmark(self, task, freq):
+    @staticmethod
+    def _rig_key(rig):
+        return (rig.target.get("hostname"), str(rig.target.get("port")))
+
+    def _wait_for_tune(self, rig, freq):
+        """Waits for the rig to settle on freq, polling the frequency
+        and the level until the rig reports freq and the level is
+        stable. The wait is bounded by TIME_WAIT_FOR_TUNE. The settle
+        times are averaged for every rig, and the first poll is delayed
+        by part of the average so that slow rigs aren't polled uselessly.
+        The time waited is left in self.settle_time.
+
+        :param rig: rig controller, just tuned to freq
+        :type rig: RigCtl object
+        :param freq: frequency we tuned, in hertz
+        :type freq: int
+        :raises: socket.error, socket.timeout
+        :returns: True if the rig settled, False if we gave up waiting
+        """
+
+        key = self._rig_key(rig)
+        start = time.time()
+        deadline = start + TIME_WAIT_FOR_TUNE
+        average = self.settle_times.get(key)
+        if average:
+            time.sleep(min(average * TUNE_SETTLE_HEADSTART, TIME_WAIT_FOR_TUNE))
+        prev_level = None
+        while True:
+            reply_freq, reply_level = rig.batch(["f", "l"])
+            try:
+                tuned = int(float(reply_freq)) == freq
+                level = float(reply_level)
+            except ValueError:
+                tuned = False
+            if tuned:
+                if (prev_level is not None and
+                    abs(level - prev_level) <= TUNE_SETTLE_TOLERANCE):
+                    break
+                prev_level = level
+            else:
+                prev_level = None
+            if time.time() + TUNE_SETTLE_POLL > deadline:
+                self.settle_time = time.time() - start
+                logger.info("Rig not settled on {} after "
+                            "{:.3f}s".format(freq, self.settle_time))
+                return False
+            time.sleep(TUNE_SETTLE_POLL)
+
+        self.settle_time = time.time() - start
+        if average is None:
+            average = self.settle_time
+        self.settle_times[key] = (average +
+                                  TUNE_SETTLE_LEARNING_RATE *
+                                  (self.settle_time - average))
+        logger.info("Rig settled on {} in {:.3f}s".format(freq, self.settle_time))
+        return True
+
+    @staticmethod
+    def _tolerance(task):
+        """Distance under which two frequencies are the same channel:
+        half the channel spacing. The spacing is the scan interval,
+        unless params has a "spacing", as when the range is interleaved
+        between rigs and every rig steps over several channels.
+        """
+
+        spacing = task.params.get("spacing") or task.params["interval"]
+        return khertz_to_hertz(spacing) // 2
+
+    @staticmethod
+    def _known_bookmark(task, freq, tolerance):
+        """Finds the bookmark of the task on the channel of freq. Only a
+        BookmarkSet or a BookmarkFile can be searched, other bookmarks
+        are never matched.
+
+        :returns: the closest bookmark, None if there is none within
+        tolerance
+        :return type: row
+        """
+
+        if not isinstance(task.bookmarks, SortedBookmarks):
+            return None
+        bookmark = task.bookmarks.nearest(freq)
+        if bookmark is None or abs(bookmark[BM.freq] - freq) > tolerance:
+            return None
+        return bookmark
+
+    def _annotate(self, task, nbm, tolerance):
+        """Adds to nbm the description of the bookmark on its channel."""
+
+        bookmark = self._known_bookmark(task, int(nbm["freq"]), tolerance)
+        if bookmark is not None:
+            nbm["bookmark"] = bookmark[BM.desc]
+        return nbm
+
+    def _add_new_bookmark(self, task, nbm, tolerance):
+        """Adds nbm to the new bookmarks of the task, unless its channel
+        is bookmarked already or was found before in this scan.
+
+        :returns: True if the bookmark was added
+        """
+
+        freq = int(nbm["freq"])
+        if (self._known_bookmark(task, freq, tolerance) is not None or
+            self.found.within(freq, tolerance)):
+            logger.info("Skipping duplicate bookmark on {}".format(freq))
+            return False
+        self.found.add(freq, nbm["mode"])
+        task.new_bookmark_list.append(nbm)
+        return True
+
+    def _create_new_bookmark(self, task, freq, mode=None):
         nbm = {}
         nbm["freq"] = freq
-        nbm["mode"] = task.rig.get_mode()
+        nbm["mode"] = mode or task.rig.get_mode()
         nbm["time"] = datetime.datetime.utcnow().strftime("%a %b %d %H:%M %Y")
         return nbm
 
     def _start_recording(self, task):
-        task.rig.start_recording()
+        with self.stats.phase("record"):
+            task.rig.start_recording()
         logger.info("Recording started.")
 
     def _stop_recording(self, task):
-        task.rig.stop_recording()
+        with self.stats.phase("record"):
+            task.rig.stop_recording()
         logger.info("Recording stopped.")
 
     def _get_task_items(self, task):
@@ -291,13 +621,14 @@ class Scanning(object):
         :returns: updates the scanning task object with the new activity found
         """
 
-        mode = task.params["cbb_scan_mode"].get()
-        task.rig.set_mode(mode)
+        if task.params.get("rig_mode"):
+            task.rig.set_mode(task.params["rig_mode"])
 
         level = []
 
         pass_count = task.params["passes"]
         interval = khertz_to_hertz(task.params["interval"])
+        tolerance = self._tolerance(task)
         while self.scan_active:
             freq = task.params["range_min"]
             # If the range is negative, silently bail...
@@ -306,6 +637,11 @@ class Scanning(object):
             while freq < task.params["range_max"]:
                 if self._process_queue(task):
                     freq, pass_count, interval = self._get_task_items(task)
+                    tolerance = self._tolerance(task)
+                if (task.params.get("skip_known") and
+                    self._known_bookmark(task, freq, tolerance) is not None):
+                    freq = freq + interval
+                    continue
                 try:
                     self._frequency_tune(task, freq)
                 except (socket.error, socket.timeout):
@@ -323,7 +659,9 @@ class Scanning(object):
 
                     if task.params["log"]:
                         nbm = self._create_new_bookmark(task, freq)
-                        log.write('F', nbm, level[0])
+                        self._annotate(task, nbm, tolerance)
+                        with self.stats.phase("log"):
+                            log.write('F', nbm, level[0])
 
                     if self.scan_active:
                         self._queue_sleep(task)
@@ -332,7 +670,7 @@ class Scanning(object):
                         self._stop_recording()
                 elif self.hold_bookmark:
                     nbm = self._create_new_bookmark(task, self.prev_freq)
-                    task.new_bookmark_list.append(nbm)
+                    self._add_new_bookmark(task, nbm, tolerance)
                     self._prev_bookmark(False, None, None)
                 freq = freq + interval
                 if not self.scan_active:
@@ -341,6 +679,50 @@ class Scanning(object):
         task.scanq.notify_end_of_scan()
         return task
 
+    def _spectrum(self, task, log):
+        """Performs a spectrum scan: every pass captures the whole range
+        from task.params["spectrum_file"] and looks for the peaks above
+        the signal level in one go, instead of tuning every channel.
+        Peaks closer than the interval are reported once.
+        This function is wrapped by Scanning.scan()
+
+        :param task: object that represent a scanning task
+        :type task: object from ScanningTask
+        :raises: InvalidPathError if the spectrum can't be read
+        :returns: updates the scanning task object with the new activity found
+        """
+
+        source = SpectrumFile(task.params["spectrum_file"])
+        pass_count = task.params["passes"]
+        tolerance = self._tolerance(task)
+        while self.scan_active:
+            self._process_queue(task)
+            with self.stats.phase("sample"):
+                freqs, levels = source.capture(task.params["range_min"],
+                                               task.params["range_max"])
+                peak_freqs, peak_levels = find_peaks(freqs,
+                                                     levels,
+                                                     task.params["sgn_level"],
+                                                     khertz_to_hertz(task.params["interval"]))
+            self.stats.add_channel(len(freqs))
+            for freq, level in zip(peak_freqs.tolist(), peak_levels.tolist()):
+                logger.info("Activity found on {}, signal level: "
+                            "{}".format(freq, level))
+                nbm = self._create_new_bookmark(task, freq, UNKNOWN_MODE)
+                self._annotate(task, nbm, tolerance)
+                if task.params.get("skip_known") and "bookmark" in nbm:
+                    continue
+                if task.params["log"]:
+                    with self.stats.phase("log"):
+                        log.write('F', nbm, int(round(level * 10)))
+                if task.params["auto_bookmark"]:
+                    self._add_new_bookmark(task, nbm, tolerance)
+            pass_count, task = self._pass_count_update(pass_count, task)
+            if self.scan_active:
+                self._queue_sleep(task)
+        task.scanq.notify_end_of_scan()
+        return task
+
     def _prev_bookmark(self, hold, level, freq):
         self.prev_level = level
         self.prev_freq = freq
@@ -352,12 +734,13 @@ class Scanning(object):
             return
         if level[0] < self.prev_level[0]:
             nbm = self._create_new_bookmark(task, self.prev_freq)
-            task.new_bookmark_list.append(nbm)
+            self._add_new_bookmark(task, nbm, self._tolerance(task))
             self._prev_bookmark(False, None, None)
         else:
             self._prev_bookmark(True, level, freq)
 
     def _pass_count_update(self, pass_count, task):
+        self.stats.end_pass()
         if pass_count > 0:
             pass_count -= 1
             if pass_count == 0 and task.params["passes"] > 0:
@@ -365,9 +748,17 @@ class Scanning(object):
         return pass_count, task
 
     def _signal_check(self, sgn_level, rig, detected_level):
-        """check for the signal SIGNAL_CHECKS times pausing
+        """check for the signal up to SIGNAL_CHECKS times pausing
         NO_SIGNAL_DELAY between checks. Puts signal level in
         list to hand back to caller for logging.
+        The check is a sequential test: every sample adds its log
+        likelihood ratio between "level is SIGNAL_MARGIN above the
+        threshold" and "level is SIGNAL_MARGIN below the threshold", and
+        we stop as soon as one of the two is accepted with
+        self.confidence. If SIGNAL_CHECKS samples can't tell, we report
+        a signal if more than one sample was above the threshold.
+        The number of samples taken is left in self.samples_used and
+        the time taken is added to the sample phase of self.stats.
 
         :param sgn_level: minimum signal level we are searching
         :type sgn_level: string from the UI setting
@@ -375,25 +766,40 @@ class Scanning(object):
         :return type: boolean
         """
 
+        start = time.time()
         del detected_level[:]
         sgn = dbfs_to_sgn(sgn_level)
         signal_found = 0
+        llr = 0.0
+        llr_limit = math.log(self.confidence / (1 - self.confidence))
+        llr_step = 2.0 * SIGNAL_MARGIN / SIGNAL_NOISE_SIGMA ** 2
+        decision = None
 
         for i in range(0, SIGNAL_CHECKS):
-
+            if i:
+                time.sleep(NO_SIGNAL_DELAY)
             logger.info("Checks left:{}".format(SIGNAL_CHECKS -i))
             level = int(rig.get_level().replace(".", ""))
             logger.info("sgn_level:{}".format(level))
             logger.info("dbfs_sgn:{}".format(sgn))
             if level > sgn:
                 signal_found += 1
-            time.sleep(NO_SIGNAL_DELAY)
-        if signal_found > 1:
+            llr += llr_step * (level - sgn)
+            if llr >= llr_limit:
+                decision = True
+            elif llr <= -llr_limit:
+                decision = False
+            if decision is not None:
+                break
+        self.samples_used = i + 1
+        self.stats.add_phase("sample", time.time() - start)
+        if decision is None:
+            decision = signal_found > 1
+        if decision:
             logger.info("Activity found, signal level: "\
                         "{}".format(level))
             detected_level.append(level)
-            return True
-        return False
+        return decision
 
     def _bookmarks(self, task, log):
         """Performs a bookmark scan, using the task obj for finding
@@ -409,14 +815,13 @@ class Scanning(object):
         level = []
         old_pass_count = pass_count = task.params['passes']
         while self.scan_active:
-            for item in task.bookmarks.get_children():
+            for bookmark in task.bookmarks:
                 self._process_queue(task)
                 if old_pass_count != task.params['passes']:
                     old_pass_count = pass_count = task.params['passes']
-                bookmark = task.bookmarks.item(item).get('values')
                 if (bookmark[BM.lockout]) == 'L':
                     continue
-                freq = bookmark[BM.freq].replace(',', '')
+                freq = str(bookmark[BM.freq]).replace(',', '')
                 try:
                     self._frequency_tune(task, freq)
                 except (socket.error, socket.timeout):
@@ -432,7 +837,8 @@ class Scanning(object):
                         self._start_recording(task)
 
                     if task.params['log']:
-                        log.write('B', bookmark, level[0])
+                        with self.stats.phase("log"):
+                            log.write('B', bookmark, level[0])
 
                     while task.params['wait']:
                         if self._signal_check(task.params['sgn_level'],
@@ -465,6 +871,10 @@ class Scanning(object):
                   False if no update was found.
         """
 
+        with self.stats.phase("queue"):
+            return self._process_updates(task)
+
+    def _process_updates(self, task):
         processed_something = False
         while task.scanq.update_queued():
             name, value = task.scanq.get_event_update()
@@ -489,3 +899,4 @@ class Scanning(object):
             logger.info("Queue passed %s %i", name, value)
             logger.info("Params[%s] = %s", key, task.params[key])
         return processed_something
+
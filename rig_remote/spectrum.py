@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+"""
+Remote application that interacts with rigs using rigctl protocol.
+
+Please refer to:
+http://gqrx.dk/
+http://gqrx.dk/doc/remote-control
+http://sourceforge.net/apps/mediawiki/hamlib/index.php?title=Documentation
+
+Author: Rafael Marmelo
+Author: Simone Marzona
+
+License: MIT License
+
+Copyright (c) 2014 Rafael Marmelo
+Copyright (c) 2015 Simone Marzona
+"""
+
+import logging
+from rig_remote.exceptions import SpectrumUnavailableError
+from rig_remote.exceptions import InvalidPathError
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# logging configuration
+logger = logging.getLogger(__name__)
+
+
+# helper functions
+def check_numpy():
+    """The spectrum scan needs numpy, that is an optional dependency.
+
+    :raises: SpectrumUnavailableError if numpy is not installed
+    """
+
+    if numpy is None:
+        logger.error("The spectrum scan needs numpy, "
+                     "install it with: pip install numpy")
+        raise SpectrumUnavailableError
+
+
+def find_peaks(freqs, levels, threshold, min_spacing=0):
+    """Finds the peaks of a spectrum in one pass over all the bins: a
+    peak is a bin above threshold that is higher than the bin on its
+    left and not lower than the bin on its right.
+    Peaks closer than min_spacing to a stronger peak are dropped, so
+    that a wide signal is reported once.
+
+    :param freqs: frequency of every bin, in hertz, sorted
+    :type freqs: numpy array
+    :param levels: level of every bin, in dB
+    :type levels: numpy array
+    :param threshold: minimum level of a peak, in dB
+    :type threshold: float
+    :param min_spacing: minimum distance between peaks, in hertz
+    :type min_spacing: int
+    :returns: frequencies and levels of the peaks
+    :return type: tuple of numpy arrays
+    """
+
+    check_numpy()
+    if len(levels) == 0:
+        return freqs[:0], levels[:0]
+    left = numpy.concatenate(([-numpy.inf], levels[:-1]))
+    right = numpy.concatenate((levels[1:], [-numpy.inf]))
+    mask = (levels > threshold) & (levels > left) & (levels >= right)
+    peak_freqs = freqs[mask]
+    peak_levels = levels[mask]
+    if min_spacing and len(peak_freqs) > 1:
+        keep = numpy.ones(len(peak_freqs), dtype=bool)
+        for i in numpy.argsort(peak_levels)[::-1]:
+            if not keep[i]:
+                continue
+            close = numpy.abs(peak_freqs - peak_freqs[i]) < min_spacing
+            close[i] = False
+            keep &= ~close
+        peak_freqs = peak_freqs[keep]
+        peak_levels = peak_levels[keep]
+    return peak_freqs, peak_levels
+
+
+# class definition
+class SpectrumFile(object):
+    """Spectrum captured from an FFT dump file in the rtl_power
+    csv format, one row for every sweep hop:
+
+    date, time, Hz low, Hz high, Hz step, samples, dB, dB, ...
+
+    Bins measured more than once, in several sweeps, keep the
+    highest level.
+    """
+
+    def __init__(self, filename):
+        """
+        :param filename: FFT dump file
+        :type filename: string
+        """
+
+        check_numpy()
+        self.filename = filename
+
+    def _read(self):
+        freqs = []
+        levels = []
+        try:
+            with open(self.filename, "r") as dump:
+                for line in dump:
+                    row = [field.strip() for field in line.split(",")]
+                    if len(row) < 7:
+                        continue
+                    try:
+                        low = float(row[2])
+                        step = float(row[4])
+                        values = numpy.array([float(v) for v in row[6:]])
+                    except ValueError:
+                        logger.warning("Skipping bad row in "
+                                       "{}: {}".format(self.filename, line))
+                        continue
+                    freqs.append(low + step * numpy.arange(len(values)))
+                    levels.append(values)
+        except IOError:
+            logger.exception("Error while reading "
+                             "{}".format(self.filename))
+            raise InvalidPathError
+        if not freqs:
+            return numpy.array([]), numpy.array([])
+        return numpy.concatenate(freqs), numpy.concatenate(levels)
+
+    def capture(self, range_min, range_max):
+        """Reads the spectrum between range_min and range_max.
+
+        :param range_min: lower end of the span, in hertz
+        :type range_min: int
+        :param range_max: upper end of the span, in hertz
+        :type range_max: int
+        :raises: InvalidPathError if the file can't be read
+        :returns: frequencies, in hertz, and levels, in dB, of the bins
+        sorted by frequency
+        :return type: tuple of numpy arrays
+        """
+
+        freqs, levels = self._read()
+        freqs = numpy.rint(freqs).astype(numpy.int64)
+        mask = (freqs >= range_min) & (freqs < range_max)
+        freqs, levels = freqs[mask], levels[mask]
+        unique, index = numpy.unique(freqs, return_inverse=True)
+        merged = numpy.full(len(unique), -numpy.inf)
+        numpy.maximum.at(merged, index, levels)
+        return unique, merged
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+"""
+Remote application that interacts with rigs using rigctl protocol.
+
+Please refer to:
+http://gqrx.dk/
+http://gqrx.dk/doc/remote-control
+http://sourceforge.net/apps/mediawiki/hamlib/index.php?title=Documentation
+
+Author: Rafael Marmelo
+Author: Simone Marzona
+
+License: MIT License
+
+Copyright (c) 2014 Rafael Marmelo
+Copyright (c) 2015 Simone Marzona
+"""
+
+# import modules
+import logging
+from bisect import bisect_left
+
+# logging configuration
+logger = logging.getLogger(__name__)
+
+
+# class definition
+class TimingStat(object):
+    """Running count, mean, minimum, maximum and last value of a
+    measure, e.g. a latency in seconds. The values are not kept.
+
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+
+    def add(self, value):
+        """Adds a measure.
+
+        :param value: the measure
+        :type value: float
+        """
+
+        self.count += 1
+        self.total += value
+        self.last = value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def as_dict(self):
+        return {"count": self.count,
+                "mean": self.mean,
+                "min": self.min,
+                "max": self.max,
+                "last": self.last}
+
+    def __str__(self):
+        if not self.count:
+            return "n/a"
+        return "{:.1f}/{:.1f}/{:.1f} ms".format(self.min * 1000,
+                                                self.mean * 1000,
+                                                self.max * 1000)
+
+
+class LatencyHistogram(object):
+    """Histogram of latencies: the count of the values up to every
+    bound, the last bucket counts the values above all the bounds.
+
+    """
+
+    def __init__(self, bounds):
+        """
+        :param bounds: upper bound of every bucket, sorted
+        :type bounds: tuple of floats
+        """
+
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.timing = TimingStat()
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.timing.add(value)
+
+    def as_dict(self):
+        """
+        :returns: the buckets, upper bound "le" and count, the last
+        bucket has no bound, and count, mean, min, max and last
+        :return type: dictionary
+        """
+
+        buckets = [{"le": bound, "count": count}
+                   for bound, count in zip(self.bounds + (None,), self.counts)]
+        data = self.timing.as_dict()
+        data["buckets"] = buckets
+        return data
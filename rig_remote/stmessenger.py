@@ -58,6 +58,25 @@ class STMessenger (object):
 
         return self.mqueue.queued_for_child()
 
+    def wait_for_update(self, timeout):
+        """Wait until an event update is queued, interrupt is called
+        or timeout expires.
+
+        :param timeout: max seconds to wait
+        :type timeout: int or float
+        :returns: True if event waiting
+        """
+
+        return self.mqueue.wait_for_child(timeout)
+
+    def interrupt(self):
+        """Wake up the scanning thread waiting in wait_for_update.
+
+        :returns: None
+        """
+
+        self.mqueue.wake_child()
+
     def get_event_update(self):
         """Get the next event waiting to be processed.
 
@@ -23,11 +23,17 @@ from rig_remote.constants import (MIN_INTERVAL,
                                   BM,
                                   REVERSE_MODE_MAP,
                                   SYNC_INTERVAL,
+                                  SYNC_BACKOFF,
+                                  SYNC_MAX_INTERVAL,
+                                  SYNC_STATS_INTERVAL,
+                                  ALLOWED_RIGCTL_MODES,
                                   )
 from rig_remote.exceptions import UnsupportedSyncConfigError
+from rig_remote.stats import TimingStat
 from rig_remote.stmessenger import STMessenger
 import socket
 import logging
+import threading
 import time
 import re
 
@@ -37,24 +43,145 @@ logger = logging.getLogger(__name__)
 # class definition
 
 class SyncTask(object):
-    """Representation of a scan task, with helper method for checking
-    for proper frequency range.
+    """Representation of a sync task: the source rig is mirrored on one
+    or more destination rigs, every destination can be tuned at an
+    offset from the source, e.g. for a transverter or an IF receiver.
 
     """
 
-    def __init__(self, syncq, src_rig_controller, dst_rig_controller):
+    def __init__(self, syncq, src_rig_controller, dst_rig_controller,
+                 offsets=None):
+        """
+        :param syncq: queue used to talk with the UI
+        :type syncq: STMessenger object
+        :param src_rig_controller: rig that is followed
+        :type src_rig_controller: RigCtl object
+        :param dst_rig_controller: rig, or rigs, that follow
+        :type dst_rig_controller: RigCtl object or list of RigCtl objects
+        :param offsets: frequency offset of every destination, in hertz,
+        defaults to no offset
+        :type offsets: list of int
+        :raises UnsupportedSyncConfigError: if a rig has no hostname or
+        port, or the offsets don't match the destinations
+        """
+
         self.error = None
         self.syncq = syncq
 
-        if not all([src_rig_controller.target["hostname"],
-                    src_rig_controller.target["hostname"],
-                    dst_rig_controller.target["hostname"],
-                    dst_rig_controller.target["hostname"]]):
+        if isinstance(dst_rig_controller, (list, tuple)):
+            dst_rigs = list(dst_rig_controller)
+        else:
+            dst_rigs = [dst_rig_controller]
+        if not dst_rigs or not all([rig.target["hostname"] and
+                                    rig.target["port"]
+                                    for rig in [src_rig_controller] + dst_rigs]):
             logger.info("Source and destination hostname/port needs "
                         "to be filled in.")
             raise UnsupportedSyncConfigError
+        if offsets is None:
+            offsets = [0] * len(dst_rigs)
+        if len(offsets) != len(dst_rigs):
+            logger.error("One offset is needed for every destination rig.")
+            raise UnsupportedSyncConfigError
         self.src_rig = src_rig_controller
-        self.dst_rig = dst_rig_controller
+        self.dst_rigs = dst_rigs
+        self.dst_rig = dst_rigs[0]
+        self.offsets = [int(offset) for offset in offsets]
+
+class SyncStats(object):
+    """Timings of a sync, to tell where the lag of a destination rig
+    comes from: the source read and destination write latencies, the
+    propagation delay of a change, from the source read that saw it to
+    the destination write that delivered it, and the ticks, i.e. polls
+    of the source, the destination lagged behind.
+    The destinations are written by several threads, every access holds
+    a lock.
+
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.ticks = 0
+            self.source_read = TimingStat()
+            self.destinations = {}
+
+    def _destination(self, index):
+        if index not in self.destinations:
+            self.destinations[index] = {"write": TimingStat(),
+                                        "propagation": TimingStat(),
+                                        "lag_ticks": TimingStat(),
+                                        "failures": 0}
+        return self.destinations[index]
+
+    def add_read(self, seconds):
+        with self.lock:
+            self.ticks += 1
+            self.source_read.add(seconds)
+
+    def add_write(self, index, seconds, delay, lag):
+        """Records a change delivered to a destination.
+
+        :param index: position of the destination in task.dst_rigs
+        :type index: int
+        :param seconds: latency of the write
+        :type seconds: float
+        :param delay: seconds since the source read that saw the change
+        :type delay: float
+        :param lag: ticks since the source read that saw the change
+        :type lag: int
+        """
+
+        with self.lock:
+            destination = self._destination(index)
+            destination["write"].add(seconds)
+            destination["propagation"].add(delay)
+            destination["lag_ticks"].add(lag)
+
+    def add_failure(self, index):
+        with self.lock:
+            self._destination(index)["failures"] += 1
+
+    def as_dict(self):
+        """Snapshot of the timings.
+
+        :returns: ticks, source_read and, by destination index, write,
+        propagation, lag_ticks and failures
+        :return type: dictionary
+        """
+
+        with self.lock:
+            destinations = {}
+            for index, destination in self.destinations.items():
+                destinations[index] = {
+                    "write": destination["write"].as_dict(),
+                    "propagation": destination["propagation"].as_dict(),
+                    "lag_ticks": destination["lag_ticks"].as_dict(),
+                    "failures": destination["failures"]}
+            return {"ticks": self.ticks,
+                    "source_read": self.source_read.as_dict(),
+                    "destinations": destinations}
+
+    def summary(self):
+        """One line description of the timings, min/mean/max."""
+
+        with self.lock:
+            parts = ["{} ticks, read {}".format(self.ticks,
+                                                self.source_read)]
+            for index in sorted(self.destinations):
+                destination = self.destinations[index]
+                parts.append("rig {} write {} propagation {} lag max {} "
+                             "ticks failures {}".format(
+                                 index,
+                                 destination["write"],
+                                 destination["propagation"],
+                                 destination["lag_ticks"].max or 0,
+                                 destination["failures"]))
+            return "Sync: " + ", ".join(parts)
+
 
 class Syncing(object):
     """Provides methods for doing the bookmark/frequency scan,
@@ -64,29 +191,150 @@ class Syncing(object):
 
     def __init__(self):
         self.sync_active = True
+        self.stop = threading.Event()
+        # frequency and mode of the source last written to every
+        # destination, by position in task.dst_rigs
+        self.written = {}
+        # time and tick of the source read that found a destination out
+        # of date, by position in task.dst_rigs
+        self.pending = {}
+        self.tick = 0
+        self.interval = SYNC_INTERVAL
+        self.stats = SyncStats()
 
     def terminate(self):
         self.sync_active = False
+        self.stop.set()
+
+    def _read_source(self, task):
+        """Reads frequency and mode of the source rig in one round trip.
+
+        :returns: frequency and mode
+        :return type: tuple of strings
+        """
+
+        freq, mode = task.src_rig.batch(["f", "m"])
+        # newer versions of gqrx reply to m with mode and passband
+        return freq.strip(), mode.split("\n")[0].strip()
+
+    def _write_destination(self, task, index, state):
+        """Writes to a destination rig what changed since the last
+        write, in one round trip. A destination that can't be reached is
+        left behind and written again at the next poll.
+
+        :param index: position of the destination in task.dst_rigs
+        :type index: int
+        :param state: frequency and mode of the source rig
+        :type state: tuple of strings
+        """
+
+        freq, mode = state
+        last_freq, last_mode = self.written.get(index, (None, None))
+        requests = []
+        if freq != last_freq:
+            try:
+                requests.append("F {}".format(int(float(freq)) +
+                                              task.offsets[index]))
+            except ValueError:
+                logger.warning("Source rig replied {} for the "
+                               "frequency.".format(freq))
+        if mode != last_mode:
+            if mode in ALLOWED_RIGCTL_MODES:
+                requests.append("M {}".format(mode))
+            else:
+                logger.warning("Mode {} can't be set on the destination "
+                               "rig.".format(mode))
+        try:
+            if requests:
+                start = time.time()
+                replies = task.dst_rigs[index].batch(requests)
+                end = time.time()
+                since, since_tick = self.pending.get(index, (start, self.tick))
+                self.stats.add_write(index, end - start, end - since,
+                                     self.tick - since_tick)
+                for request, reply in zip(requests, replies):
+                    if reply.strip() != "RPRT 0":
+                        logger.warning("Destination rig {} replied {} "
+                                       "to {}".format(index, reply, request))
+        except (socket.error, socket.timeout):
+            logger.warning("Communications error with destination "
+                           "rig {}".format(index))
+            self.stats.add_failure(index)
+            return
+        self.written[index] = state
+        self.pending.pop(index, None)
+
+    def _write_destinations(self, task, state, read_time):
+        """Writes state to the destinations that don't have it yet, all
+        at the same time, so that the latency doesn't grow with the
+        number of destinations.
+
+        :param read_time: when the source read of state started
+        :type read_time: float
+        :returns: True if some destination had to be written
+        """
+
+        pending = [index for index in range(len(task.dst_rigs))
+                   if self.written.get(index) != state]
+        for index in pending:
+            self.pending.setdefault(index, (read_time, self.tick))
+        if len(pending) == 1:
+            self._write_destination(task, pending[0], state)
+        else:
+            writers = [threading.Thread(target=self._write_destination,
+                                        args=(task, index, state))
+                       for index in pending]
+            for writer in writers:
+                writer.start()
+            for writer in writers:
+                writer.join()
+        return bool(pending)
+
+    def _next_interval(self, changed):
+        """Polls the source at SYNC_INTERVAL while it changes, backing
+        off to SYNC_MAX_INTERVAL while it is idle.
+        """
+
+        if changed:
+            self.interval = SYNC_INTERVAL
+        else:
+            self.interval = min(self.interval * SYNC_BACKOFF,
+                                SYNC_MAX_INTERVAL)
+        return self.interval
 
     def sync(self, task):
-        """Wrapper method around _frequency and _bookmarks. It calls one
-        of the wrapped functions matching the task.mode value
+        """Mirrors frequency and mode of the source rig on the destination
+        rigs. A destination is written only when the source changes.
+        The timings are kept in stats and logged every
+        SYNC_STATS_INTERVAL seconds.
 
-        :param task: object that represent a scanning task
-        :type task: object from ScanningTask
-        :raises: none
-        :returns: updates the scanning task object with the new activity found
+        :param task: object that represent a sync task
+        :type task: object from SyncTask
+        :raises: UnsupportedSyncConfigError if task is not a SyncTask
+        :returns: the task
         """
 
         if not isinstance(task, SyncTask):
             logger.error("Unsupported task in sync queue.")
             raise UnsupportedSyncConfigError
 
-        level = []
+        self.stats.reset()
+        next_report = time.time() + SYNC_STATS_INTERVAL
         while self.sync_active:
-            task.dst_rig.set_frequency(task.src_rig.get_frequency())
-            task.dst_rig.set_mode(str(task.src_rig.get_mode()))
-            time.sleep(SYNC_INTERVAL)
+            start = time.time()
+            try:
+                state = self._read_source(task)
+            except (socket.error, socket.timeout):
+                logger.warning("Communications Error!")
+                break
+            self.tick += 1
+            self.stats.add_read(time.time() - start)
+            changed = self._write_destinations(task, state, start)
+            if time.time() >= next_report:
+                logger.info(self.stats.summary())
+                next_report = time.time() + SYNC_STATS_INTERVAL
+            self.stop.wait(self._next_interval(changed))
+        logger.info(self.stats.summary())
         task.syncq.notify_end_of_scan()
         self.terminate()
         return task
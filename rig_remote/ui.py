@@ -78,6 +78,7 @@ from rig_remote.constants import (
                                   CBB_MODES,
                                   LEN_BM,
                                   BM,
+                                  BOOKMARK_DUPLICATE_TOLERANCE,
                                   DEFAULT_CONFIG,
                                   UI_EVENT_TIMER_DELAY,
                                   ABOUT,
@@ -1032,6 +1033,15 @@ class RigRemote(ttk.Frame):
                                           columnspan=3,
                                           pady=5)
 
+        # scan throughput, updated while a scan runs
+        self.scan_status = tk.StringVar()
+        ttk.Label(self,
+                  textvariable=self.scan_status).grid(row=6,
+                                                      column=0,
+                                                      columnspan=5,
+                                                      padx=2,
+                                                      sticky=tk.W)
+
     def focus_set(self, event) :
         """Give focus to screen object in click event. Used to
         force <FocusOut> callbacks.
@@ -1205,13 +1215,7 @@ class RigRemote(ttk.Frame):
             # will use this in future to support "current scan" lockout
             return
         else:
-            values = list((self.tree.item(self.selected_bookmark, "values")))
-            if values[BM.lockout] == 'L' :
-                values[BM.lockout] = "O"
-            else :
-                values[BM.lockout] = "L"
-            self.tree.item(self.selected_bookmark, values = values)
-            self.bookmarks.bookmark_bg_tag(self.selected_bookmark, values[BM.lockout])
+            self.bookmarks.toggle_lockout(self.selected_bookmark)
 
     def frequency_toggle(self, icycle=itertools.cycle(["Stop", "Start"])):
         """Toggle frequency scan Start/Stop button, changing label text as
@@ -1397,6 +1401,8 @@ class RigRemote(ttk.Frame):
         :returns: None
         """
 
+        if self.scanning is not None:
+            self.scan_status.set(self.scanning.stats.summary())
         if self.scanq.check_end_of_scan():
             if self.scan_mode == 'frequency':
                 self.frequency_toggle()
@@ -1469,7 +1475,7 @@ class RigRemote(ttk.Frame):
         if (action.lower() == "start" and self.scan_thread == None) :
             # there is no ongoing scan task and we want to start one
 
-            if len(self.tree.get_children()) == 0 and mode == "bookmarks":
+            if len(self.bookmarks) == 0 and mode == "bookmarks":
                 if not silent:
                     tkMessageBox.showerror("Error",
                                            "No bookmarks to scan.")
@@ -1477,7 +1483,7 @@ class RigRemote(ttk.Frame):
             else:
                 self.scan_mode = mode
                 scanq = self.scanq
-                bookmarks = self.tree
+                bookmarks = self.bookmarks.bookmark_set
                 pass_params = dict.copy(self.params)
                 nbl = self.new_bookmark_list
                 task = ScanningTask(scanq,
@@ -1532,6 +1538,7 @@ class RigRemote(ttk.Frame):
 
     def _add_new_bookmarks(self, nbl):
         """Fill in the data, calls uses cb_add() and calls clear_form.
+        The frequencies close to a bookmark already present are skipped.
 
         :param nbl: list of new frequencies to bookmark
         :type nbl: list
@@ -1540,6 +1547,11 @@ class RigRemote(ttk.Frame):
         """
         self._clear_form(1)
         for nb in nbl:
+            if self.bookmarks.bookmark_set.within(int(nb["freq"]),
+                                                  BOOKMARK_DUPLICATE_TOLERANCE):
+                logger.info("Skipping duplicate bookmark on "
+                            "{}".format(nb["freq"]))
+                continue
             self.params["txt_description1"].insert(0,
                                                   "activity on {}".format(nb["time"]))
             self.params["txt_frequency1"].insert(0,
@@ -1727,30 +1739,18 @@ class RigRemote(ttk.Frame):
         mode = control_source["mode"]
         description = control_source["description"]
         lockout = "O"
-        # find where to insert (insertion sort)
-        idx = tk.END
-        for item in self.tree.get_children():
-            freq = str(self.tree.item(item).get('values')[BM.freq])
-            uni_curr_freq = frequency_pp_parse(freq)
-            curr_freq = uni_curr_freq.encode("UTF-8")
-            curr_mode = self.tree.item(item).get('values')[BM.mode]
-            if frequency < curr_freq:
-                idx = self.tree.index(item)
-                break
-            elif (frequency == curr_freq and
-                  mode == curr_mode) :
-                if not (silent) :
-                    tkMessageBox.showerror("Error", "A bookmark with the "
-                                           "same frequency and mode "
-                                           "already exists.", parent=self)
-                return
-        # insert
-        item = self.tree.insert('',
-                                idx,
-                                values=[frequency_pp(frequency),
-                                        mode,
-                                        description,
-                                        lockout])
+        try:
+            frequency = int(frequency)
+        except (ValueError, TypeError):
+            logger.error("Invalid frequency: {}".format(frequency))
+            return
+        item = self.bookmarks.add(frequency, mode, description, lockout)
+        if item is None:
+            if not (silent) :
+                tkMessageBox.showerror("Error", "A bookmark with the "
+                                       "same frequency and mode "
+                                       "already exists.", parent=self)
+            return
 
         self.tree.selection_set(item)
         self.tree.focus(item)
@@ -1781,7 +1781,7 @@ class RigRemote(ttk.Frame):
 
         item = self.tree.focus()
         if item != '':
-            self.tree.delete(item)
+            self.bookmarks.delete(item)
             # save
         self.bookmarks.save(self.bookmarks_file)
         self._clear_form(source)
@@ -58,7 +58,7 @@ setup(
     ],
     keywords = "rigctl, ham, radio, bookmarks, scanner",
     license = "MIT",
-    scripts = ['rig-remote.py'],
+    scripts = ['rig-remote.py', 'rig-remote-scan.py'],
     setup_requires = ["pytest-runner",],
     tests_require = ["pytest",],
     include_package_data = True,
@@ -69,5 +69,8 @@ setup(
         "datetime",
         "logging",
     ],
+    extras_require = {
+        "spectrum": ["numpy"],
+    },
     zip_safe = False)
 
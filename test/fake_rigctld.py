@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+
+"""
+Remote application that interacts with rigs using rigctl protocol.
+
+Please refer to:
+http://gqrx.dk/
+http://gqrx.dk/doc/remote-control
+http://sourceforge.net/apps/mediawiki/hamlib/index.php?title=Documentation
+
+Author: Rafael Marmelo
+Author: Simone Marzona
+
+License: MIT License
+
+Copyright (c) 2014 Rafael Marmelo
+Copyright (c) 2015 Simone Marzona
+"""
+
+# import modules
+import logging
+import random
+import socket
+import threading
+import time
+from bisect import bisect_left
+
+# logging configuration
+logger = logging.getLogger(__name__)
+
+
+# class definition
+class FakeRigctld(object):
+    """Local rigctld/gqrx remote control server that simulates a band,
+    so that the scan and the sync can be measured without real radios.
+    The band has signals of a given level on some frequencies, every
+    other frequency reads the noise floor, and every level reading gets
+    gaussian noise. A new frequency is reported only after the tune
+    latency, and every read from the network is delayed by the round
+    trip time, so that batched commands pay it once as with a real rig.
+    Every connection talks to the same simulated rig.
+
+    """
+
+    def __init__(self,
+                 signals=None,
+                 noise_floor=-80.0,
+                 noise=0.0,
+                 bandwidth=0,
+                 tune_latency=0.0,
+                 rtt=0.0,
+                 seed=None):
+        """
+        :param signals: level of the signals, in dBFS, by frequency in hertz
+        :type signals: dict
+        :param noise_floor: level where there is no signal, in dBFS
+        :type noise_floor: float
+        :param noise: standard deviation of the level, in dB
+        :type noise: float
+        :param bandwidth: a signal is heard up to bandwidth/2 hertz away
+        :type bandwidth: int
+        :param tune_latency: seconds before the rig reports a new frequency
+        :type tune_latency: float
+        :param rtt: seconds added to every read from the network
+        :type rtt: float
+        :param seed: seed of the level noise, for reproducible runs
+        :type seed: int
+        """
+
+        self.signals = dict(signals or {})
+        self.signal_freqs = sorted(self.signals)
+        self.noise_floor = noise_floor
+        self.noise = noise
+        self.bandwidth = bandwidth
+        self.tune_latency = tune_latency
+        self.rtt = rtt
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.freq = 0
+        self.prev_freq = 0
+        self.tuned_at = 0.0
+        self.mode = "FM"
+        self.passband = 12500
+        self.recording = False
+        # number of commands served, for the commands per second
+        self.commands = 0
+        self.server = None
+        self.connections = []
+
+    @property
+    def target(self):
+        """Rig uri data of the server, see build_rig_uri."""
+
+        hostname, port = self.server.getsockname()[:2]
+        return {"hostname": hostname, "port": port, "rig_number": 1}
+
+    def start(self, hostname="127.0.0.1", port=0):
+        """Starts serving in a background thread.
+
+        :param port: port to listen on, 0 picks a free one
+        :type port: int
+        :returns: rig uri data of the server
+        :return type: dict
+        """
+
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((hostname, port))
+        self.server.listen(5)
+        accepter = threading.Thread(target=self._accept)
+        accepter.daemon = True
+        accepter.start()
+        return self.target
+
+    def stop(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        for con in list(self.connections):
+            try:
+                con.close()
+            except socket.error:
+                pass
+        self.connections = []
+
+    def _accept(self):
+        server = self.server
+        while True:
+            try:
+                con, _ = server.accept()
+            except (socket.error, AttributeError):
+                return
+            self.connections.append(con)
+            serving = threading.Thread(target=self._serve, args=(con,))
+            serving.daemon = True
+            serving.start()
+
+    def _serve(self, con):
+        data = b""
+        while True:
+            try:
+                chunk = con.recv(4096)
+            except socket.error:
+                break
+            if not chunk:
+                break
+            if self.rtt:
+                time.sleep(self.rtt)
+            data += chunk
+            replies = []
+            while b"\n" in data:
+                line, data = data.split(b"\n", 1)
+                line = line.decode("ascii").strip()
+                if line in ("q", "c"):
+                    con.close()
+                    return
+                replies.append(self._reply(line))
+            try:
+                con.sendall("".join(replies).encode("ascii"))
+            except socket.error:
+                break
+        con.close()
+
+    def _reported_freq(self):
+        if time.time() - self.tuned_at < self.tune_latency:
+            return self.prev_freq
+        return self.freq
+
+    def level(self, freq):
+        """Level of the band on freq, noise included.
+
+        :param freq: frequency in hertz
+        :type freq: int
+        :returns: the level, in dBFS
+        """
+
+        level = self.noise_floor
+        index = bisect_left(self.signal_freqs, freq - self.bandwidth // 2)
+        if (index < len(self.signal_freqs) and
+            self.signal_freqs[index] <= freq + self.bandwidth // 2):
+            level = self.signals[self.signal_freqs[index]]
+        if self.noise:
+            level += self.random.gauss(0, self.noise)
+        return level
+
+    def _reply(self, line):
+        """Executes a rigctl command on the simulated rig.
+
+        :returns: the reply, newline terminated
+        """
+
+        command = line.split()
+        with self.lock:
+            self.commands += 1
+            if not command:
+                return "RPRT 1\n"
+            if command[0] == "F" and len(command) == 2:
+                try:
+                    freq = int(float(command[1]))
+                except ValueError:
+                    return "RPRT 1\n"
+                self.prev_freq = self._reported_freq()
+                self.freq = freq
+                self.tuned_at = time.time()
+                return "RPRT 0\n"
+            if command[0] == "f":
+                return "{}\n".format(self._reported_freq())
+            if command[0] == "M" and len(command) >= 2:
+                self.mode = command[1]
+                if len(command) > 2:
+                    self.passband = int(command[2])
+                return "RPRT 0\n"
+            if command[0] == "m":
+                return "{}\n{}\n".format(self.mode, self.passband)
+            if command[0] == "l":
+                if self._reported_freq() != self.freq:
+                    level = self.noise_floor
+                else:
+                    level = self.level(self.freq)
+                return "{:.1f}\n".format(level)
+            if command[0] in ("AOS", "LOS"):
+                self.recording = command[0] == "AOS"
+                return "RPRT 0\n"
+        return "RPRT 1\n"
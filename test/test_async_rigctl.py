@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+# import modules
+import pytest
+import socket
+import threading
+import time
+from rig_remote.async_rigctl import AsyncRigCtl, RigLoop, RigFuture
+from rig_remote.exceptions import RigCtlError
+
+REPLIES = {"f": "145500000\n",
+           "m": "FM\n12500\n",
+           "l": "-32.5\n",
+           "M XX": "RPRT -11\n",
+           "+f": "get_freq:\nFrequency: 145500000\nRPRT 0\n",
+           "+F 1": "set_freq: 1\nRPRT -1\n",
+           }
+
+@pytest.fixture
+def fake_rigctld():
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(5)
+
+    def serve():
+        try:
+            con, _ = srv.accept()
+        except socket.error:
+            return
+        data = b""
+        while True:
+            chunk = con.recv(1024)
+            if not chunk:
+                break
+            data += chunk
+            while b"\n" in data:
+                line, data = data.split(b"\n", 1)
+                if line == b"hang":
+                    continue
+                con.sendall(REPLIES.get(line.decode("ascii"), "RPRT 0\n"))
+        con.close()
+
+    thread = threading.Thread(target=serve)
+    thread.daemon = True
+    thread.start()
+    fake_target = {}
+    fake_target["hostname"] = "127.0.0.1"
+    fake_target["port"] = srv.getsockname()[1]
+    fake_target["rig_number"] = 1
+    yield fake_target
+    srv.close()
+
+def test_future_transform_error():
+    future = RigFuture(int)
+    future.set_result("test")
+    assert (future.done() == True)
+    with pytest.raises(ValueError):
+        future.result()
+
+def test_future_callback():
+    future = RigFuture()
+    done = []
+    future.add_done_callback(done.append)
+    future.set_result("22")
+    assert (done == [future])
+
+def test_pipelined_requests(fake_rigctld):
+    loop = RigLoop()
+    rig = AsyncRigCtl(fake_rigctld, loop)
+    replies = loop.run_until_complete([rig.set_frequency(145500000),
+                                       rig.get_frequency(),
+                                       rig.get_mode(),
+                                       rig.get_level()])
+    assert (replies == ["RPRT 0", "145500000", "FM", "-32.5"])
+    rig.close()
+
+def test_error_reply_keeps_replies_in_step(fake_rigctld):
+    loop = RigLoop()
+    rig = AsyncRigCtl(fake_rigctld, loop)
+    replies = loop.run_until_complete([rig._request("M XX"),
+                                       rig._request("m"),
+                                       rig.get_frequency(),
+                                       rig.get_mode(),
+                                       rig.get_level()])
+    assert (replies == ["RPRT -11", "FM\n12500", "145500000", "FM", "-32.5"])
+    rig.close()
+
+def test_error_reply_to_multi_line_command(fake_rigctld):
+    loop = RigLoop()
+    rig = AsyncRigCtl(fake_rigctld, loop)
+    REPLIES["m"] = "RPRT -11\n"
+    try:
+        replies = loop.run_until_complete([rig.get_mode(),
+                                           rig.get_frequency(),
+                                           rig.get_level()])
+    finally:
+        REPLIES["m"] = "FM\n12500\n"
+    assert (replies == ["RPRT -11", "145500000", "-32.5"])
+    rig.close()
+
+def test_extended_replies(fake_rigctld):
+    loop = RigLoop()
+    rig = AsyncRigCtl(fake_rigctld, loop)
+    error = rig._request("+F 1")
+    replies = loop.run_until_complete([rig._request("+f"),
+                                       rig.get_level()])
+    assert (replies == ["145500000", "-32.5"])
+    assert (isinstance(error.exception(), RigCtlError))
+    rig.close()
+
+def test_old_gqrx_mode_reply(fake_rigctld):
+    loop = RigLoop()
+    rig = AsyncRigCtl(fake_rigctld, loop)
+    REPLIES["m"] = "FM\n"
+    try:
+        future = rig.get_mode()
+        connection = rig._connection(fake_rigctld)
+        while not connection._pending[0][3]:
+            loop.poll(0.1)
+        connection._pending[0][4] = time.time() - 1
+        assert (loop.run_until_complete(future) == "FM")
+        # the second time we know the rig replies with one line
+        assert (loop.run_until_complete([rig.get_mode(),
+                                         rig.get_level()]) == ["FM", "-32.5"])
+    finally:
+        REPLIES["m"] = "FM\n12500\n"
+    rig.close()
+
+def test_bad_mode_not_sent(fake_rigctld):
+    loop = RigLoop()
+    rig = AsyncRigCtl(fake_rigctld, loop)
+    with pytest.raises(ValueError):
+        rig.set_mode("testmode")
+    rig.close()
+
+def test_command_timeout(fake_rigctld):
+    loop = RigLoop()
+    rig = AsyncRigCtl(fake_rigctld, loop)
+    future = rig._request("hang")
+    rig._connection(fake_rigctld)._pending[0][4] = time.time() - 1
+    with pytest.raises(socket.timeout):
+        loop.run_until_complete(future)
+
+def test_connection_refused():
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.bind(("127.0.0.1", 0))
+    port = srv.getsockname()[1]
+    srv.close()
+    fake_target = {"hostname": "127.0.0.1", "port": port, "rig_number": 1}
+    loop = RigLoop()
+    rig = AsyncRigCtl(fake_target, loop)
+    with pytest.raises(socket.error):
+        loop.run_until_complete(rig.get_frequency())
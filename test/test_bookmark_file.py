@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+# import modules
+import pytest
+from rig_remote.bookmark_file import BookmarkFile
+from rig_remote.bookmark_set import BookmarkSet
+from rig_remote.exceptions import InvalidPathError, FormatError
+
+@pytest.fixture
+def bookmark_file(tmpdir):
+    filename = str(tmpdir.join("bookmarks.rrb"))
+    BookmarkFile.save(filename, [(145500000, "FM", "repeater", "O"),
+                                 (7050000, "LSB", "40m", "L"),
+                                 (145500000, "AM", "", "O"),
+                                 (28800000, "FM", "standing spike", "O")])
+    binary = BookmarkFile(filename)
+    yield binary
+    binary.close()
+
+def test_sorted(bookmark_file):
+    assert (len(bookmark_file) == 4)
+    assert ([row[0] for row in bookmark_file] ==
+            [7050000, 28800000, 145500000, 145500000])
+
+def test_row(bookmark_file):
+    assert (bookmark_file[0] == (7050000, "LSB", "40m", "L"))
+    assert (bookmark_file[-1] == (145500000, "AM", "", "O"))
+    with pytest.raises(IndexError):
+        bookmark_file[4]
+
+def test_in_range(bookmark_file):
+    assert ([row[2] for row in bookmark_file.in_range(28000000, 145500000)] ==
+            ["standing spike", "repeater", ""])
+    assert (bookmark_file.in_range(1, 2) == [])
+
+def test_nearest(bookmark_file):
+    assert (bookmark_file.nearest(30000000)[0] == 28800000)
+    assert (bookmark_file.within(145501000, 500) == [])
+
+def test_load_in_bookmark_set(bookmark_file):
+    bookmark_set = BookmarkSet(bookmark_file)
+    assert (list(bookmark_set) == list(bookmark_file))
+
+def test_empty(tmpdir):
+    filename = str(tmpdir.join("empty.rrb"))
+    BookmarkFile.save(filename, [])
+    binary = BookmarkFile(filename)
+    assert (len(binary) == 0)
+    assert (binary.nearest(145500000) is None)
+    binary.close()
+
+def test_missing_file():
+    with pytest.raises(InvalidPathError):
+        BookmarkFile("/nonexistent/bookmarks.rrb")
+
+@pytest.mark.parametrize("content", ["", "145500000,FM,repeater,O\n"])
+def test_not_a_bookmark_file(tmpdir, content):
+    data = tmpdir.join("bookmarks.rrb")
+    data.write(content)
+    with pytest.raises(FormatError):
+        BookmarkFile(str(data))
+
+def test_truncated(tmpdir):
+    filename = str(tmpdir.join("bookmarks.rrb"))
+    BookmarkFile.save(filename, [(145500000, "FM", "repeater", "O")])
+    with open(filename, "rb") as data_file:
+        data = data_file.read()
+    with open(filename, "wb") as data_file:
+        data_file.write(data[:-20])
+    with pytest.raises(FormatError):
+        BookmarkFile(filename)
+
+def test_description_too_long(tmpdir):
+    with pytest.raises(FormatError):
+        BookmarkFile.save(str(tmpdir.join("bookmarks.rrb")),
+                          [(145500000, "FM", "x" * 70000, "O")])
+
+def test_mode_name_too_long(tmpdir):
+    with pytest.raises(FormatError):
+        BookmarkFile.save(str(tmpdir.join("bookmarks.rrb")),
+                          [(145500000, "M" * 17, "repeater", "O")])
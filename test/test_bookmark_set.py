@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+# import modules
+import pytest
+from rig_remote.bookmark_set import BookmarkSet
+
+@pytest.fixture
+def bookmark_set():
+    return BookmarkSet([(145500000, "FM", "repeater", "O"),
+                        (7050000, "LSB", "40m", "L"),
+                        (145500000, "AM", "same freq", "O")])
+
+def test_sorted(bookmark_set):
+    assert ([row[0] for row in bookmark_set] == [7050000, 145500000, 145500000])
+
+def test_row(bookmark_set):
+    assert (bookmark_set[0] == (7050000, "LSB", "40m", "L"))
+
+def test_index(bookmark_set):
+    assert (bookmark_set.index(145500000, "AM") == 2)
+    assert (bookmark_set.index(145500000, "USB") is None)
+    assert (bookmark_set.index(1, "FM") is None)
+
+def test_add(bookmark_set):
+    assert (bookmark_set.add(144000000, "FM", "calling") == 1)
+    assert (bookmark_set[1] == (144000000, "FM", "calling", "O"))
+
+def test_add_duplicate(bookmark_set):
+    assert (bookmark_set.add(145500000, "FM", "again") is None)
+    assert (len(bookmark_set) == 3)
+
+def test_add_new_mode(bookmark_set):
+    bookmark_set.add(433920000, "PKTFM", "")
+    assert (bookmark_set[3][1] == "PKTFM")
+
+def test_extend_skips_duplicates(bookmark_set):
+    added = bookmark_set.extend([(145500000, "FM", "again"),
+                                 (28800000, "AM")])
+    assert (added == 1)
+    assert (bookmark_set[1] == (28800000, "AM", "", "O"))
+    assert (bookmark_set[2][2] == "repeater")
+
+def test_remove(bookmark_set):
+    bookmark_set.remove(0)
+    assert (len(bookmark_set) == 2)
+    assert (bookmark_set.index(7050000, "LSB") is None)
+
+def test_lockout_seen_while_iterating(bookmark_set):
+    rows = iter(bookmark_set)
+    next(rows)
+    bookmark_set.set_lockout(1, True)
+    assert (next(rows)[3] == "L")
+    assert (bookmark_set.is_locked(1) == True)
+
+def test_clear(bookmark_set):
+    bookmark_set.clear()
+    assert (len(bookmark_set) == 0)
+
+def test_in_range(bookmark_set):
+    assert ([row[1] for row in bookmark_set.in_range(7050000, 145500000)] ==
+            ["LSB", "FM", "AM"])
+    assert (bookmark_set.in_range(7050001, 145499999) == [])
+
+def test_within(bookmark_set):
+    assert ([row[0] for row in bookmark_set.within(145501000, 1000)] ==
+            [145500000, 145500000])
+    assert (bookmark_set.within(145502000, 1000) == [])
+
+@pytest.mark.parametrize("freq, expected", [(0, 7050000),
+                                            (76275000, 7050000),
+                                            (76275001, 145500000),
+                                            (200000000, 145500000)])
+def test_nearest(bookmark_set, freq, expected):
+    assert (bookmark_set.nearest(freq)[0] == expected)
+
+def test_nearest_empty():
+    assert (BookmarkSet().nearest(145500000) is None)
+
+def test_changes(bookmark_set):
+    assert (bookmark_set.dirty == False)
+    bookmark_set.add(144000000, "FM", "calling")
+    bookmark_set.set_lockout(bookmark_set.index(7050000, "LSB"), False)
+    added, lockouts, rewrite = bookmark_set.changes()
+    assert (added == [(144000000, "FM", "calling", "O")])
+    assert (lockouts == [(7050000, "LSB", "40m", "O")])
+    assert (rewrite == False)
+    bookmark_set.mark_saved()
+    assert (bookmark_set.dirty == False)
+
+def test_changes_remove(bookmark_set):
+    bookmark_set.add(144000000, "FM", "calling")
+    bookmark_set.remove(bookmark_set.index(144000000, "FM"))
+    assert (bookmark_set.dirty == False)
+    bookmark_set.remove(bookmark_set.index(7050000, "LSB"))
+    assert (bookmark_set.changes() == ([], [], True))
+
+def test_changes_extend(bookmark_set):
+    bookmark_set.extend([(145500000, "FM", "duplicate"),
+                         (430000000, "FM", "70cm")])
+    assert (bookmark_set.changes()[0] == [(430000000, "FM", "70cm", "O")])
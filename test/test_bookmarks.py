@@ -5,7 +5,7 @@ import pytest
 import os
 from rig_remote.bookmarks import Bookmarks
 from rig_remote.disk_io import IO
-from mock import MagicMock, Mock
+from mock import MagicMock, Mock, patch
 import tkFileDialog
 from rig_remote.exceptions import (
                                    InvalidPathError,
@@ -46,14 +46,6 @@ def test_detect_format():
     with pytest.raises(InvalidPathError):
         bk._detect_format("")
 
-def test_export_rig_remote_bad_attrib():
-    bk = Bookmarks("test", io=IO())
-    bk._export_panel = MagicMock()
-    bk._export_panel.return_value == ""
-    with pytest.raises(AttributeError):
-        bk.export_rig_remote()
-
-
 def test_save_gqrx():
     tree = ttk.Treeview(columns=("frequency",
                                  "mode",
@@ -81,8 +73,8 @@ def test_save_gqrx_len():
                                         "description"),
                         show="headings")
     value =  [u'5,955,000', u'AM', u'found on 18.34 jan 08 2015', u'O']
-    tree.insert("",0,values = value)
     bk = Bookmarks(tree, io=IO())
+    bk._insert_bookmarks([value])
     bk.bookmarks.csv_save = MagicMock()
     bk.bookmarks.return_value = None
     bk._save_gqrx("test")
@@ -98,8 +90,8 @@ def test_save_gqrx_freq():
                                         "description"),
                         show="headings")
     value =  [u'5,955,000', u'AM', u'found on 18.34 jan 08 2015', u'O']
-    tree.insert("",0,values = value)
     bk = Bookmarks(tree, io=IO())
+    bk._insert_bookmarks([value])
     bk.bookmarks.csv_save = MagicMock()
     bk.bookmarks.return_value = None
     bk._save_gqrx("test")
@@ -115,8 +107,8 @@ def test_save_gqrx_mode():
                                         "description"),
                         show="headings")
     value =  [u'5,955,000', u'AM', u'found on 18.34 jan 08 2015', u'O']
-    tree.insert("",0,values = value)
     bk = Bookmarks(tree, io=IO())
+    bk._insert_bookmarks([value])
     bk.bookmarks.csv_save = MagicMock()
     bk.bookmarks.return_value = None
     bk._save_gqrx("test")
@@ -132,8 +124,8 @@ def test_save_gqrx_tag():
                                         "description"),
                         show="headings")
     value =  [u'5,955,000', u'AM', u'found on 18.34 jan 08 2015', u'O']
-    tree.insert("",0,values = value)
     bk = Bookmarks(tree, io=IO())
+    bk._insert_bookmarks([value])
     bk.bookmarks.csv_save = MagicMock()
     bk.bookmarks.return_value = None
     bk._save_gqrx("test")
@@ -149,8 +141,8 @@ def test_save_gqrx_comment():
                                         "description"),
                         show="headings")
     value =  [u'5,955,000', u'AM', u'found on 18.34 jan 08 2015', u'O']
-    tree.insert("",0,values = value)
     bk = Bookmarks(tree, io=IO())
+    bk._insert_bookmarks([value])
     bk.bookmarks.csv_save = MagicMock()
     bk.bookmarks.return_value = None
     bk._save_gqrx("test")
@@ -195,8 +187,8 @@ def test_import_rig_remote():
                                         "description"),
                         show="headings")
     value =  [u'5,955,000', u'AM', u'found on 18.34 jan 08 2015', u'O']
-    tree.insert("",0,values = value)
     bk = Bookmarks(tree, io=IO())
+    bk._insert_bookmarks([value])
     bk.load = MagicMock()
     bk.load.return_value = "test"
     bk._import_rig_remote("test")
@@ -212,8 +204,8 @@ def test_import_gqrx():
                                         "description"),
                         show="headings")
     value =  [u'5,955,000', u'AM', u'found on 18.34 jan 08 2015', u'O']
-    tree.insert("",0,values = value)
     bk = Bookmarks(tree, io=IO())
+    bk._insert_bookmarks([value])
     bk.bookmarks.csv_load = MagicMock()
     bk.bookmarks.csv_load.return_value = "test"
     bk.bookmarks.row_list.append([""])
@@ -225,3 +217,147 @@ def test_import_gqrx():
     bk._insert_bookmarks = MagicMock()
     bk._import_gqrx("test")
     bk._insert_bookmarks.assert_called_once_with([['28800000', 'FM', 'standing spike']])
+
+@pytest.fixture
+def fake_tree_bk():
+    tree = MagicMock()
+    tree.insert.side_effect = lambda parent, index, values, tags: "I{}".format(values[0])
+    tree.item.return_value = ["145,500,000", "FM", "repeater", "O"]
+    return Bookmarks(tree, io=IO())
+
+def test_add_keeps_order(fake_tree_bk):
+    fake_tree_bk.add(145500000, "FM", "repeater")
+    fake_tree_bk.add(144000000, "FM", "calling")
+    assert ([row[0] for row in fake_tree_bk] == [144000000, 145500000])
+    assert (fake_tree_bk.tree.insert.call_args[0][1] == 0)
+
+def test_add_duplicate(fake_tree_bk):
+    fake_tree_bk.add(145500000, "FM", "repeater")
+    assert (fake_tree_bk.add(145500000, "FM", "again") is None)
+    assert (len(fake_tree_bk) == 1)
+
+def test_toggle_lockout(fake_tree_bk):
+    item = fake_tree_bk.add(145500000, "FM", "repeater")
+    assert (fake_tree_bk.toggle_lockout(item) == "L")
+    assert (list(fake_tree_bk)[0][3] == "L")
+
+def test_delete(fake_tree_bk):
+    item = fake_tree_bk.add(145500000, "FM", "repeater")
+    fake_tree_bk.delete(item)
+    assert (len(fake_tree_bk) == 0)
+    fake_tree_bk.tree.delete.assert_called_once_with(item)
+
+def test_tags_configured_once(fake_tree_bk):
+    fake_tree_bk.add(145500000, "FM", "repeater")
+    fake_tree_bk.add(145600000, "FM", "repeater")
+    assert (fake_tree_bk.tree.tag_configure.call_count == 2)
+
+def test_save_reads_the_set(fake_tree_bk):
+    fake_tree_bk.add(145500000, "FM", "repeater")
+    fake_tree_bk.bookmarks.csv_save = MagicMock()
+    fake_tree_bk.save("/tmp/test.csv")
+    fake_tree_bk.tree.get_children.assert_not_called()
+
+def test_insert_bookmarks_in_chunks(fake_tree_bk):
+    rows = [[str(145000000 + i * 1000), "FM", "channel", "O"] for i in range(700)]
+    with patch("rig_remote.bookmarks.BOOKMARK_LOAD_CHUNK", 500):
+        fake_tree_bk._insert_bookmarks(iter(rows), silent=True)
+        assert (len(fake_tree_bk) == 700)
+        assert (fake_tree_bk.tree.insert.call_count == 500)
+        delay, callback, refresh_id = fake_tree_bk.tree.after.call_args[0]
+        callback(refresh_id)
+    assert (fake_tree_bk.tree.insert.call_count == 700)
+
+def test_add_while_loading(fake_tree_bk):
+    rows = [[str(145000000 + i * 1000), "FM", "channel", "O"] for i in range(3)]
+    with patch("rig_remote.bookmarks.BOOKMARK_LOAD_CHUNK", 1):
+        fake_tree_bk._insert_bookmarks(iter(rows), silent=True)
+        fake_tree_bk.add(144000000, "FM", "calling")
+    assert (fake_tree_bk.tree.insert.call_count == 4)
+    assert (fake_tree_bk.tree.insert.call_args[0][1] == 0)
+
+def test_insert_bookmarks_skips_invalid(fake_tree_bk):
+    fake_tree_bk._insert_bookmarks([["145,500,000", "FM", "repeater"],
+                                    ["145a", "FM", "bad frequency"],
+                                    ["145,600,000", "XX", "bad mode"]],
+                                   silent=True)
+    assert ([row[0] for row in fake_tree_bk] == [145500000])
+
+def test_save_load_binary(fake_tree_bk, tmpdir):
+    filename = str(tmpdir.join("bookmarks.rrb"))
+    fake_tree_bk.add(145500000, "FM", "repeater")
+    fake_tree_bk.add(7050000, "LSB", "40m", "L")
+    fake_tree_bk.save(filename)
+    loaded = Bookmarks(MagicMock(), io=IO())
+    loaded.load(filename, ",")
+    assert (list(loaded) == list(fake_tree_bk))
+    assert (loaded._detect_format(filename) == "binary")
+
+def test_save_binary_description_too_long(fake_tree_bk, tmpdir):
+    filename = str(tmpdir.join("bookmarks.rrb"))
+    fake_tree_bk.add(145500000, "FM", "x" * 70000)
+    fake_tree_bk.save(filename)
+    assert (fake_tree_bk.bookmark_set.dirty == True)
+    assert (tmpdir.listdir() == [])
+
+def test_failed_load_is_not_saved(fake_tree_bk, tmpdir):
+    binary = tmpdir.join("bookmarks.rrb")
+    binary.write("not a bookmark file")
+    fake_tree_bk.load(str(binary), ",", silent=True)
+    assert (fake_tree_bk._saved_file == None)
+    csv_file = tmpdir.join("bookmarks.csv")
+    csv_file.write("145500000,FM,repeater,O\n145a,FM,bad frequency,O\n")
+    fake_tree_bk.load(str(csv_file), ",", silent=True)
+    assert (fake_tree_bk._saved_file == None)
+    fake_tree_bk.bookmark_set.set_lockout(0, True)
+    fake_tree_bk.save(str(csv_file))
+    assert (csv_file.read().splitlines() == ["145500000,FM,repeater,L"])
+
+def test_save_load_database(fake_tree_bk, tmpdir):
+    filename = str(tmpdir.join("bookmarks.db"))
+    fake_tree_bk.add(145500000, "FM", "repeater")
+    fake_tree_bk.add(7050000, "LSB", "40m", "L")
+    fake_tree_bk.save(filename)
+    loaded = Bookmarks(MagicMock(), io=IO())
+    loaded.load(filename, ",")
+    assert (list(loaded) == list(fake_tree_bk))
+    assert (loaded._detect_format(filename) == "sqlite")
+
+def test_save_unchanged(fake_tree_bk, tmpdir):
+    data = tmpdir.join("bookmarks.csv")
+    data.write("145500000,FM,repeater,O\n")
+    fake_tree_bk.load(str(data), ",")
+    fake_tree_bk.bookmarks.csv_save = MagicMock()
+    fake_tree_bk.save(str(data))
+    fake_tree_bk.bookmarks.csv_save.assert_not_called()
+
+def test_save_appends_added(fake_tree_bk, tmpdir):
+    data = tmpdir.join("bookmarks.csv")
+    data.write("145500000,FM,repeater,O\n")
+    fake_tree_bk.load(str(data), ",")
+    fake_tree_bk.add(7050000, "LSB", "40m")
+    fake_tree_bk.save(str(data))
+    assert (data.read().splitlines() == ["145500000,FM,repeater,O",
+                                         "7050000,LSB,40m,O"])
+
+def test_save_rewrites_after_delete(fake_tree_bk, tmpdir):
+    data = tmpdir.join("bookmarks.csv")
+    data.write("145500000,FM,repeater,O\n7050000,LSB,40m,O\n")
+    fake_tree_bk.load(str(data), ",")
+    fake_tree_bk.delete(fake_tree_bk._items[(145500000, "FM")])
+    fake_tree_bk.save(str(data))
+    assert (data.read().splitlines() == ["7050000,LSB,40m,O"])
+
+def test_save_patches_binary_lockout(fake_tree_bk, tmpdir):
+    filename = str(tmpdir.join("bookmarks.rrb"))
+    fake_tree_bk.add(145500000, "FM", "repeater")
+    fake_tree_bk.add(7050000, "LSB", "40m")
+    fake_tree_bk.save(filename)
+    inode = os.stat(filename).st_ino
+    fake_tree_bk.toggle_lockout(fake_tree_bk._items[(7050000, "LSB")])
+    fake_tree_bk.save(filename)
+    assert (os.stat(filename).st_ino == inode)
+    loaded = Bookmarks(MagicMock(), io=IO())
+    loaded.load(filename, ",")
+    assert (list(loaded) == [(7050000, "LSB", "40m", "L"),
+                             (145500000, "FM", "repeater", "O")])
@@ -50,7 +50,8 @@ def test_export_rig_remote_bad_attrib():
     bk = Bookmarks("test", io=IO())
     bk._export_panel = MagicMock()
     bk._export_panel.return_value == ""
-    with pytest.raises(AttributeError):
+    # save doesn't read the tree, the bad file name is what fails
+    with pytest.raises(TypeError):
         bk.export_rig_remote()
 
 
@@ -81,8 +82,8 @@ def test_save_gqrx_len():
                                         "description"),
                         show="headings")
     value =  [u'5,955,000', u'AM', u'found on 18.34 jan 08 2015', u'O']
-    tree.insert("",0,values = value)
     bk = Bookmarks(tree, io=IO())
+    bk._insert_bookmarks([value])
     bk.bookmarks.csv_save = MagicMock()
     bk.bookmarks.return_value = None
     bk._save_gqrx("test")
@@ -98,8 +99,8 @@ def test_save_gqrx_freq():
                                         "description"),
                         show="headings")
     value =  [u'5,955,000', u'AM', u'found on 18.34 jan 08 2015', u'O']
-    tree.insert("",0,values = value)
     bk = Bookmarks(tree, io=IO())
+    bk._insert_bookmarks([value])
     bk.bookmarks.csv_save = MagicMock()
     bk.bookmarks.return_value = None
     bk._save_gqrx("test")
@@ -115,8 +116,8 @@ def test_save_gqrx_mode():
                                         "description"),
                         show="headings")
     value =  [u'5,955,000', u'AM', u'found on 18.34 jan 08 2015', u'O']
-    tree.insert("",0,values = value)
     bk = Bookmarks(tree, io=IO())
+    bk._insert_bookmarks([value])
     bk.bookmarks.csv_save = MagicMock()
     bk.bookmarks.return_value = None
     bk._save_gqrx("test")
@@ -132,8 +133,8 @@ def test_save_gqrx_tag():
                                         "description"),
                         show="headings")
     value =  [u'5,955,000', u'AM', u'found on 18.34 jan 08 2015', u'O']
-    tree.insert("",0,values = value)
     bk = Bookmarks(tree, io=IO())
+    bk._insert_bookmarks([value])
     bk.bookmarks.csv_save = MagicMock()
     bk.bookmarks.return_value = None
     bk._save_gqrx("test")
@@ -149,8 +150,8 @@ def test_save_gqrx_comment():
                                         "description"),
                         show="headings")
     value =  [u'5,955,000', u'AM', u'found on 18.34 jan 08 2015', u'O']
-    tree.insert("",0,values = value)
     bk = Bookmarks(tree, io=IO())
+    bk._insert_bookmarks([value])
     bk.bookmarks.csv_save = MagicMock()
     bk.bookmarks.return_value = None
     bk._save_gqrx("test")
@@ -195,8 +196,8 @@ def test_import_rig_remote():
                                         "description"),
                         show="headings")
     value =  [u'5,955,000', u'AM', u'found on 18.34 jan 08 2015', u'O']
-    tree.insert("",0,values = value)
     bk = Bookmarks(tree, io=IO())
+    bk._insert_bookmarks([value])
     bk.load = MagicMock()
     bk.load.return_value = "test"
     bk._import_rig_remote("test")
@@ -212,8 +213,8 @@ def test_import_gqrx():
                                         "description"),
                         show="headings")
     value =  [u'5,955,000', u'AM', u'found on 18.34 jan 08 2015', u'O']
-    tree.insert("",0,values = value)
     bk = Bookmarks(tree, io=IO())
+    bk._insert_bookmarks([value])
     bk.bookmarks.csv_load = MagicMock()
     bk.bookmarks.csv_load.return_value = "test"
     bk.bookmarks.row_list.append([""])
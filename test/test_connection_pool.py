@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+# import modules
+import pytest
+import socket
+from mock import patch, MagicMock
+from rig_remote.connection_pool import ConnectionPool, PooledConnection
+from rig_remote.rigctl import RigCtl
+
+@pytest.fixture
+def fake_target():
+    fake_target= {}
+    fake_target["hostname"] = "127.0.0.1"
+    fake_target["port"] = 80
+    fake_target["rig_number"] = 1
+    return fake_target
+
+@pytest.fixture
+def pool():
+    pool = ConnectionPool()
+    pool._is_healthy = MagicMock(return_value=True)
+    return pool
+
+def test_acquire_new_connection(pool, fake_target):
+    with patch("rig_remote.connection_pool.telnetlib.Telnet") as telnet:
+        con = pool.acquire(fake_target)
+    assert (telnet.call_count == 1)
+    assert (con.reused == False)
+
+def test_connection_reused(pool, fake_target):
+    with patch("rig_remote.connection_pool.telnetlib.Telnet") as telnet:
+        con = pool.acquire(fake_target)
+        pool.release(con)
+        con2 = pool.acquire(fake_target)
+    assert (telnet.call_count == 1)
+    assert (con2 is con)
+    assert (con2.reused == True)
+
+def test_connection_per_target(pool, fake_target):
+    other_target = dict(fake_target)
+    other_target["port"] = 81
+    with patch("rig_remote.connection_pool.telnetlib.Telnet") as telnet:
+        pool.release(pool.acquire(fake_target))
+        pool.acquire(other_target)
+    assert (telnet.call_count == 2)
+
+def test_unhealthy_connection_replaced(pool, fake_target):
+    with patch("rig_remote.connection_pool.telnetlib.Telnet") as telnet:
+        con = pool.acquire(fake_target)
+        pool.release(con)
+        pool._is_healthy.return_value = False
+        con2 = pool.acquire(fake_target)
+    assert (telnet.call_count == 2)
+    assert (con2 is not con)
+
+def test_idle_connection_expires(fake_target):
+    pool = ConnectionPool(idle_timeout=0)
+    con = PooledConnection(pool._key(fake_target), MagicMock())
+    con.last_used -= 1
+    assert (pool._is_healthy(con) == False)
+
+def test_max_idle(fake_target):
+    pool = ConnectionPool(max_idle=1)
+    first = PooledConnection(pool._key(fake_target), MagicMock())
+    second = PooledConnection(pool._key(fake_target), MagicMock())
+    pool.release(first)
+    pool.release(second)
+    assert (len(pool._idle[pool._key(fake_target)]) == 1)
+    second.con.close.assert_called_once_with()
+
+def test_close_all(pool, fake_target):
+    con = PooledConnection(pool._key(fake_target), MagicMock())
+    pool.release(con)
+    pool.close_all()
+    con.con.close.assert_called_once_with()
+    assert (pool._idle == {})
+
+def test_connect_timeout(pool, fake_target):
+    with patch("rig_remote.connection_pool.telnetlib.Telnet",
+               side_effect=socket.timeout):
+        with pytest.raises(socket.timeout):
+            pool.acquire(fake_target)
+
+def test_request_retries_stale_connection(pool, fake_target):
+    stale = PooledConnection(pool._key(fake_target), MagicMock())
+    stale.con.write.side_effect = socket.error
+    pool.release(stale)
+    with patch("rig_remote.connection_pool.telnetlib.Telnet") as telnet:
+        telnet.return_value.read_until.return_value = "145000000\n"
+        rigctl = RigCtl(fake_target, pool)
+        assert (rigctl._request("f") == "145000000")
+    assert (telnet.call_count == 1)
+
+def test_request_fails_on_new_connection(pool, fake_target):
+    with patch("rig_remote.connection_pool.telnetlib.Telnet") as telnet:
+        telnet.return_value.write.side_effect = socket.error
+        rigctl = RigCtl(fake_target, pool)
+        with pytest.raises(socket.error):
+            rigctl._request("f")
+    assert (pool._idle == {})
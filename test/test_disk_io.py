@@ -4,7 +4,14 @@
 import pytest
 import socket
 import csv
-from rig_remote.disk_io import IO, LogFile
+import json
+import os
+import stat
+import sys
+import time
+from rig_remote.disk_io import IO, LogFile, JsonLogFile, SqliteLogFile
+from rig_remote.disk_io import BookmarkDatabase, is_sqlite, open_log_file
+from rig_remote.disk_io import BufferedLogFile, atomic_open
 from rig_remote.exceptions import InvalidPathError
 
 def test_non_existent_path():
@@ -59,3 +66,223 @@ def test_bad_data3():
     lf.open("/tmp/nofile")
     with pytest.raises(IndexError):
         lf.write("B",["122"],"2")
+
+def test_json_log_bookmark(tmpdir):
+    lf = JsonLogFile()
+    lf.open(str(tmpdir.join("log.json")))
+    lf.write("B", ["145,500,000", "FM", "repeater", ""], -100)
+    lf.write("F", {"freq": 145600000, "mode": "FM"}, -200)
+    lf.close()
+    entries = [json.loads(line) for line in tmpdir.join("log.json").readlines()]
+    assert (entries[0]["freq"] == 145500000)
+    assert (entries[0]["description"] == "repeater")
+    assert (entries[1]["type"] == "frequency")
+    assert (entries[1]["level"] == -200)
+
+def test_json_log_bad_type(tmpdir):
+    lf = JsonLogFile()
+    lf.open(str(tmpdir.join("log.json")))
+    with pytest.raises(TypeError):
+        lf.write("C", {"freq": 145600000, "mode": "FM"}, -200)
+
+def test_json_log_stdout():
+    lf = JsonLogFile()
+    lf.open("-")
+    assert (lf.log_file is sys.stdout)
+    lf.close()
+    assert (sys.stdout.closed == False)
+
+def test_csv_iter(tmpdir):
+    data = tmpdir.join("bookmarks.csv")
+    data.write("145500000,FM,repeater,O\n7050000,LSB,40m,L\n")
+    rows = IO().csv_iter(str(data), ",")
+    assert (next(rows) == ["145500000", "FM", "repeater", "O"])
+    assert (list(rows) == [["7050000", "LSB", "40m", "L"]])
+
+def test_csv_iter_bad_path():
+    with pytest.raises(InvalidPathError):
+        IO().csv_iter("/nonexistent/bookmarks.csv", ",")
+
+@pytest.mark.parametrize("filename, expected", [("/tmp/log.db", True),
+                                                ("/tmp/log.SQLite", True),
+                                                ("/tmp/log.txt", False),
+                                                (None, False)])
+def test_is_sqlite(filename, expected):
+    assert (is_sqlite(filename) == expected)
+
+def test_sqlite_log(tmpdir):
+    filename = str(tmpdir.join("log", "activity.db"))
+    log = open_log_file(filename)
+    assert (isinstance(log, SqliteLogFile))
+    log.write("F", {"freq": 145500000, "mode": "FM", "bookmark": "repeater"}, -200)
+    log.write("B", ("7,050,000", "LSB", "40m", "O"), -300)
+    activity = log.activity()
+    assert ([entry["freq"] for entry in activity] == [145500000, 7050000])
+    assert (activity[0]["bookmark"] == "repeater")
+    assert (activity[1]["description"] == "40m")
+    assert (log.activity(low=100000000)[0]["level"] == -200)
+    assert (log.activity(since="9999-01-01T00:00:00Z") == [])
+    log.close()
+
+def test_sqlite_log_wal(tmpdir):
+    filename = str(tmpdir.join("activity.db"))
+    log = open_log_file(filename)
+    mode = log.log_file.execute("PRAGMA journal_mode").fetchone()[0]
+    log.close()
+    assert (mode == "wal")
+
+def test_sqlite_log_bad_record(tmpdir):
+    log = open_log_file(str(tmpdir.join("activity.db")))
+    with pytest.raises(TypeError):
+        log.write("X", {}, 0)
+    log.close()
+
+def test_bookmark_database(tmpdir):
+    database = BookmarkDatabase(str(tmpdir.join("bookmarks.db")))
+    database.save([(145500000, "FM", "repeater", "O"),
+                   (7050000, "LSB", "40m", "L")])
+    assert (database.load() == [(7050000, "LSB", "40m", "L"),
+                                (145500000, "FM", "repeater", "O")])
+    assert (database.in_range(100000000, 200000000) ==
+            [(145500000, "FM", "repeater", "O")])
+    database.save([])
+    assert (database.load() == [])
+    database.close()
+
+def test_csv_save_keeps_order(tmpdir):
+    filename = str(tmpdir.join("bookmarks.csv"))
+    io = IO()
+    io.row_list = [["7050000", "LSB"], ["145500000", "FM"]]
+    assert (io.csv_save(filename, ",") == True)
+    assert (list(io.csv_iter(filename, ",")) == io.row_list)
+    io.row_list = [["430000000", "FM"]]
+    assert (io.csv_append(filename, ",") == True)
+    assert (len(list(io.csv_iter(filename, ","))) == 3)
+
+def test_csv_append_no_trailing_newline(tmpdir):
+    data = tmpdir.join("bookmarks.csv")
+    data.write("145500000,FM,rep,O")
+    io = IO()
+    io.row_list = [["146000000", "FM", "new", "O"]]
+    assert (io.csv_append(str(data), ",") == True)
+    assert (list(io.csv_iter(str(data), ",")) ==
+            [["145500000", "FM", "rep", "O"],
+             ["146000000", "FM", "new", "O"]])
+
+def test_csv_save_interrupted(tmpdir):
+    data = tmpdir.join("bookmarks.csv")
+    data.write("7050000,LSB\n")
+    io = IO()
+    io.row_list = [["145500000", "FM"], 2]
+    with pytest.raises(csv.Error):
+        io.csv_save(str(data), ",")
+    assert (data.read() == "7050000,LSB\n")
+    assert (tmpdir.listdir() == [data])
+
+def test_atomic_open_new_file_mode(tmpdir):
+    filename = str(tmpdir.join("new.csv"))
+    umask = os.umask(0o022)
+    try:
+        with atomic_open(filename) as data_file:
+            data_file.write("7050000,LSB\n")
+    finally:
+        os.umask(umask)
+    assert (stat.S_IMODE(os.stat(filename).st_mode) == 0o644)
+
+def test_atomic_open_keeps_mode(tmpdir):
+    data = tmpdir.join("bookmarks.csv")
+    data.write("7050000,LSB\n")
+    os.chmod(str(data), 0o600)
+    with atomic_open(str(data)) as data_file:
+        data_file.write("145500000,FM\n")
+    assert (stat.S_IMODE(os.stat(str(data)).st_mode) == 0o600)
+
+def test_atomic_open_follows_symlink(tmpdir):
+    data = tmpdir.join("bookmarks.csv")
+    data.write("7050000,LSB\n")
+    link = tmpdir.join("link.csv")
+    os.symlink(str(data), str(link))
+    with atomic_open(str(link)) as data_file:
+        data_file.write("145500000,FM\n")
+    assert (os.path.islink(str(link)) == True)
+    assert (data.read() == "145500000,FM\n")
+
+def test_buffered_log(tmpdir):
+    filename = str(tmpdir.join("log.txt"))
+    log = BufferedLogFile(flush_interval=60)
+    log.open(filename)
+    log.write("F", {"freq": 145500000, "mode": "FM"}, -200)
+    log.write("B", ("7,050,000", "LSB", "40m", "O"), -300)
+    log.close()
+    with open(filename) as log_file:
+        lines = log_file.read().splitlines()
+    assert ([line.split()[0] for line in lines] == ["F", "B"])
+    assert (lines[1].split()[-3:] == ["7050000", "LSB", "-300"])
+
+def test_buffered_log_flush_size(tmpdir):
+    filename = str(tmpdir.join("log.txt"))
+    log = BufferedLogFile(flush_size=2, flush_interval=60)
+    log.open(filename)
+    log.write("F", {"freq": 145500000, "mode": "FM"}, -200)
+    log.write("F", {"freq": 145600000, "mode": "FM"}, -200)
+    for _ in range(100):
+        if tmpdir.join("log.txt").size():
+            break
+        time.sleep(.01)
+    assert (len(tmpdir.join("log.txt").read().splitlines()) == 2)
+    log.close()
+
+def test_buffered_log_drops_oldest(tmpdir):
+    log = BufferedLogFile(buffer_size=2, flush_size=10, flush_interval=60)
+    log.running = True
+    for freq in (1, 2, 3):
+        log.write("F", {"freq": freq, "mode": "FM"}, -200)
+    assert ([line.split()[-3] for line in log.buffer] == ["2", "3"])
+    assert (log.dropped == 1)
+
+def test_buffered_log_rotates_by_size(tmpdir):
+    filename = str(tmpdir.join("log.txt"))
+    log = BufferedLogFile(flush_size=1, max_size=1, backup_count=2)
+    log.open(filename)
+    log.running = False
+    log.writer.join()
+    for freq in (1, 2, 3):
+        log._write_lines(["F {}\n".format(freq)])
+    log.close()
+    assert (tmpdir.join("log.txt").read() == "F 3\n")
+    assert (tmpdir.join("log.txt.1").read() == "F 2\n")
+    assert (tmpdir.join("log.txt.2").read() == "F 1\n")
+
+def test_buffered_log_rotates_daily(tmpdir):
+    filename = str(tmpdir.join("log.txt"))
+    log = BufferedLogFile(rotate_daily=True)
+    log.open(filename)
+    log._write_lines(["F 1\n"])
+    log._day = "2016-06-01"
+    log._write_lines(["F 2\n"])
+    log.close()
+    assert (tmpdir.join("log.txt.2016-06-01").read() == "F 1\n")
+    assert (tmpdir.join("log.txt").read() == "F 2\n")
+
+def test_buffered_log_rotates_old_file(tmpdir):
+    data = tmpdir.join("log.txt")
+    data.write("F 1\n")
+    yesterday = time.time() - 24 * 60 * 60
+    os.utime(str(data), (yesterday, yesterday))
+    log = BufferedLogFile(rotate_daily=True)
+    log.open(str(data))
+    log._write_lines(["F 2\n"])
+    log.close()
+    rotated = "log.txt.{}".format(time.strftime("%Y-%m-%d",
+                                                time.localtime(yesterday)))
+    assert (tmpdir.join(rotated).read() == "F 1\n")
+    assert (data.read() == "F 2\n")
+
+def test_buffered_log_closed():
+    log = BufferedLogFile()
+    with pytest.raises(AttributeError):
+        log.write("F", {"freq": 1, "mode": "FM"}, -200)
+
+def test_buffered_log_bad_fsync():
+    with pytest.raises(ValueError):
+        BufferedLogFile(fsync="sometimes")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+# import modules
+import pytest
+from telnetlib import Telnet
+from mock import patch, MagicMock
+from rig_remote.connection_pool import ConnectionPool
+from fake_rigctld import FakeRigctld
+from rig_remote.rigctl import RigCtl
+from rig_remote.scanning import Scanning, ScanningTask
+from rig_remote.stmessenger import STMessenger
+
+@pytest.fixture
+def fake_server():
+    servers = []
+
+    def start(*args, **kwargs):
+        server = FakeRigctld(*args, **kwargs)
+        server.start()
+        servers.append(server)
+        return server
+
+    # other tests replace telnetlib.Telnet, we need the real one
+    with patch("rig_remote.connection_pool.telnetlib.Telnet", Telnet):
+        yield start
+    for server in servers:
+        server.stop()
+
+def test_band(fake_server):
+    server = fake_server({145500000: -20.0}, bandwidth=10000)
+    pool = ConnectionPool()
+    rig = RigCtl(server.target, pool)
+    assert (rig.batch(["F 145504000", "f", "l"]) ==
+            ["RPRT 0", "145504000", "-20.0"])
+    assert (rig.batch(["F 145600000", "l", "m"]) ==
+            ["RPRT 0", "-80.0", "FM\n12500"])
+    assert (rig.batch(["M AM 10000", "m", "AOS"]) ==
+            ["RPRT 0", "AM\n10000", "RPRT 0"])
+    assert (server.recording == True)
+    assert (server.commands == 9)
+    pool.close_all()
+
+def test_tune_latency(fake_server):
+    server = fake_server({145500000: -20.0}, tune_latency=10)
+    pool = ConnectionPool()
+    rig = RigCtl(server.target, pool)
+    assert (rig.batch(["F 145500000", "f", "l"]) ==
+            ["RPRT 0", "0", "-80.0"])
+    pool.close_all()
+
+def test_noise_is_reproducible():
+    levels = [[FakeRigctld(noise=3.0, seed=7).level(100000)
+               for _ in range(3)] for _ in range(2)]
+    assert (levels[0] == levels[1])
+    assert (levels[0][0] != -80.0)
+
+def test_frequency_scan(fake_server):
+    server = fake_server({101000: -10.0})
+    pool = ConnectionPool()
+    params = {"range_min": 100000,
+              "range_max": 104000,
+              "interval": 1,
+              "delay": 0,
+              "passes": 1,
+              "sgn_level": -30,
+              "log": True}
+    task = ScanningTask(STMessenger(), "frequency", [], [], params,
+                        RigCtl(server.target, pool), None)
+    log = MagicMock()
+    scanning = Scanning()
+    scanning.scan(task, log)
+    found = [call[0][1]["freq"] for call in log.write.call_args_list]
+    assert (found == [101000])
+    stats = scanning.stats.as_dict()
+    assert (stats["passes"][0]["channels"] == 4)
+    assert ("F" in stats["commands"])
+    pool.close_all()
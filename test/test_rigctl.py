@@ -6,6 +6,7 @@ import socket
 import telnetlib
 from mock import patch, MagicMock
 from rig_remote.rigctl import RigCtl
+from rig_remote.exceptions import RigCtlError
 from rig_remote.constants import (
                                   DEFAULT_CONFIG,
                                   ALLOWED_VFO_COMMANDS,
@@ -154,18 +155,19 @@ def test_get_xit(fake_target):
     rigctl._request = MagicMock()
     rigctl._request.return_value = "22"
     assert(rigctl.get_xit() == "22")
+    rigctl._request.assert_called_once_with('z', None)
 
 def test_get_split_freq_error(fake_target):
     rigctl = RigCtl(fake_target)
     rigctl._request = MagicMock()
-    rigctl._request.return_value = "22"
+    rigctl._request.return_value = "RPRT -11"
     with pytest.raises(ValueError):
         rigctl.get_split_freq()
 
 def test_get_split_freq(fake_target):
     rigctl = RigCtl(fake_target)
     rigctl._request = MagicMock()
-    rigctl._request.return_value = 22
+    rigctl._request.return_value = "22"
     assert(rigctl.get_split_freq() == 22)
 
 def test_get_func_error(fake_target):
@@ -197,14 +199,14 @@ def test_get_parm(fake_target):
 def test_get_antenna_error(fake_target):
     rigctl = RigCtl(fake_target)
     rigctl._request = MagicMock()
-    rigctl._request.return_value = "22"
+    rigctl._request.return_value = "RPRT -11"
     with pytest.raises(ValueError):
         rigctl.get_antenna()
 
 def test_get_antenna(fake_target):
     rigctl = RigCtl(fake_target)
     rigctl._request = MagicMock()
-    rigctl._request.return_value = 22
+    rigctl._request.return_value = "22"
     assert(rigctl.get_antenna() == 22)
 
 def test_set_mode(fake_target):
@@ -292,3 +294,143 @@ def test_antenna(fake_target):
     rigctl = RigCtl(fake_target)
     with pytest.raises(ValueError):
         rigctl.set_antenna("testparm")
+
+@pytest.fixture
+def fake_pool():
+    fake_con = MagicMock()
+    fake_con.reused = False
+    fake_pool = MagicMock()
+    fake_pool.acquire.return_value = fake_con
+    return fake_pool
+
+def test_batch(fake_target, fake_pool):
+    con = fake_pool.acquire.return_value
+    con.readline.side_effect = ["RPRT 0", "-32.5", "WFM_ST", "160000"]
+    rigctl = RigCtl(fake_target, fake_pool)
+    replies = rigctl.batch(["F 145500000", "l", "m"])
+    con.write.assert_called_once_with("F 145500000\nl\nm\n")
+    assert (replies == ["RPRT 0", "-32.5", "WFM_ST\n160000"])
+    fake_pool.release.assert_called_once_with(con)
+
+def test_batch_timeout(fake_target, fake_pool):
+    con = fake_pool.acquire.return_value
+    con.readline.side_effect = ["RPRT 0", None]
+    rigctl = RigCtl(fake_target, fake_pool)
+    with pytest.raises(socket.timeout):
+        rigctl.batch(["F 145500000", "l"])
+    fake_pool.discard.assert_called_once_with(con)
+
+def test_batch_latency_observer(fake_target, fake_pool):
+    con = fake_pool.acquire.return_value
+    con.readline.side_effect = ["RPRT 0", "-32.5"]
+    rigctl = RigCtl(fake_target, fake_pool)
+    rigctl.latency_observer = MagicMock()
+    rigctl.batch(["F 145500000", "l"])
+    command, seconds = rigctl.latency_observer.call_args[0]
+    assert (command == "F,l")
+    assert (seconds >= 0)
+
+def test_get_mode_single_request(fake_target, fake_pool):
+    con = fake_pool.acquire.return_value
+    con.key = ("127.0.0.1", "80")
+    con.readline.side_effect = ["WFM_ST", "160000"]
+    rigctl = RigCtl(fake_target, fake_pool)
+    assert (rigctl.get_mode() == "WFM_ST")
+    con.write.assert_called_once_with("m\n")
+
+def test_get_mode_old_gqrx(fake_target, fake_pool):
+    con = fake_pool.acquire.return_value
+    con.key = ("127.0.0.1", "80")
+    con.readline.side_effect = ["WFM_ST", None, "FM"]
+    rigctl = RigCtl(fake_target, fake_pool)
+    assert (rigctl.get_mode() == "WFM_ST")
+    # the second time we know the rig replies with one line
+    assert (rigctl.get_mode() == "FM")
+
+def test_error_reply(fake_target, fake_pool):
+    con = fake_pool.acquire.return_value
+    con.readline.side_effect = ["RPRT -11"]
+    rigctl = RigCtl(fake_target, fake_pool)
+    assert (rigctl._request("m") == "RPRT -11")
+
+def test_extended_reply(fake_target, fake_pool):
+    con = fake_pool.acquire.return_value
+    con.readline.side_effect = ["get_freq:", "Frequency: 145500000", "RPRT 0"]
+    rigctl = RigCtl(fake_target, fake_pool)
+    assert (rigctl._request("+f") == "145500000")
+
+def test_extended_reply_error(fake_target, fake_pool):
+    con = fake_pool.acquire.return_value
+    con.readline.side_effect = ["set_freq: 1", "RPRT -1"]
+    rigctl = RigCtl(fake_target, fake_pool)
+    with pytest.raises(RigCtlError):
+        rigctl._request("+F 1")
+    fake_pool.release.assert_called_once_with(con)
+
+def test_batch_error_reply(fake_target, fake_pool):
+    con = fake_pool.acquire.return_value
+    con.readline.side_effect = ["set_freq: 1", "RPRT -1", "145500000"]
+    rigctl = RigCtl(fake_target, fake_pool)
+    with pytest.raises(RigCtlError):
+        rigctl.batch(["+F 1", "f"])
+    # the reply to f is read before the connection goes back to the pool
+    assert (con.readline.call_count == 3)
+    fake_pool.release.assert_called_once_with(con)
+    fake_pool.discard.assert_not_called()
+
+class CountingCon(object):
+    """Fake connection counting the commands that go on the wire."""
+
+    replies = {"f": ["145500000"],
+               "m": ["FM", "12500"],
+               "x": ["FM", "12500"],
+               }
+
+    def __init__(self):
+        self.key = ("127.0.0.1", "80")
+        self.reused = False
+        self.sent = []
+        self.pending = []
+
+    def write(self, data):
+        for request in data.decode("ascii").splitlines():
+            self.sent.append(request)
+            self.pending.extend(self.replies.get(request.split()[0], ["22"]))
+
+    def readline(self, timeout):
+        return self.pending.pop(0)
+
+@pytest.fixture
+def counting_rig(fake_target):
+    fake_pool = MagicMock()
+    fake_pool.acquire.return_value = CountingCon()
+    return RigCtl(fake_target, fake_pool)
+
+getters = ["get_frequency",
+           "get_mode",
+           "get_level",
+           "get_vfo",
+           "get_rit",
+           "get_xit",
+           "get_split_freq",
+           "get_split_mode",
+           "get_func",
+           "get_parm",
+           "get_antenna"]
+
+@pytest.mark.parametrize("getter", getters)
+def test_one_command_per_getter(counting_rig, getter):
+    getattr(counting_rig, getter)()
+    assert (len(counting_rig.pool.acquire.return_value.sent) == 1)
+
+def test_one_command_per_batch(counting_rig):
+    counting_rig.batch(["F 145500000", "l", "l", "m"])
+    assert (len(counting_rig.pool.acquire.return_value.sent) == 4)
+    assert (counting_rig.pool.acquire.call_count == 1)
+
+def test_get_antenna_command(fake_target):
+    rigctl = RigCtl(fake_target)
+    rigctl._request = MagicMock()
+    rigctl._request.return_value = "1"
+    rigctl.get_antenna()
+    rigctl._request.assert_called_once_with('y', None)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+# import modules
+import pytest
+from telnetlib import Telnet
+from mock import patch, MagicMock
+from fake_rigctld import FakeRigctld
+from rig_remote.scan_farm import ScanFarm, QueueLog, partition
+from rig_remote.exceptions import InvalidScanModeError
+
+ACTIVE = ("101000", "145500000")
+
+@pytest.fixture
+def fake_rigctld():
+    servers = []
+
+    def start(active=ACTIVE):
+        server = FakeRigctld(dict((int(freq), -10.0) for freq in active))
+        servers.append(server)
+        return server.start()
+
+    # other tests replace telnetlib.Telnet, the workers need the real one
+    with patch("rig_remote.connection_pool.telnetlib.Telnet", Telnet):
+        yield start
+    for server in servers:
+        server.stop()
+
+@pytest.fixture
+def params():
+    params = {}
+    params["range_min"] = 100000
+    params["range_max"] = 104000
+    params["interval"] = 1
+    params["delay"] = 0.0
+    params["passes"] = 1
+    params["sgn_level"] = -30
+    params["log"] = True
+    params["wait"] = False
+    params["record"] = False
+    params["auto_bookmark"] = False
+    params["rig_mode"] = None
+    return params
+
+def test_partition_contiguous():
+    bands = partition(100000, 110000, 1, 3)
+    assert (bands == [(100000, 104000, 1),
+                      (104000, 107000, 1),
+                      (107000, 110000, 1)])
+
+def test_partition_interleaved():
+    bands = partition(100000, 110000, 1, 3, interleaved=True)
+    assert (bands == [(100000, 110000, 3),
+                      (101000, 110000, 3),
+                      (102000, 110000, 3)])
+
+def test_partition_more_rigs_than_channels():
+    assert (len(partition(100000, 102000, 1, 4)) == 2)
+
+def test_jobs_frequency(params):
+    jobs = ScanFarm()._jobs("frequency", params, [{}, {}], [], False)
+    assert ([(job["range_min"], job["range_max"]) for job, _ in jobs] ==
+            [(100000, 102000), (102000, 104000)])
+
+def test_jobs_bookmarks(params):
+    bookmarks = [["1"], ["2"], ["3"]]
+    jobs = ScanFarm()._jobs("bookmarks", params, [{}, {}, {}, {}], bookmarks, False)
+    assert ([b for _, b in jobs] == [[["1"]], [["2"]], [["3"]]])
+
+def test_queue_log():
+    results = MagicMock()
+    QueueLog(results, 3).write("F", {"freq": 1}, -10)
+    results.put.assert_called_once_with(("log", 3, ("F", {"freq": 1}, -10)))
+
+def test_unsupported_mode(params):
+    with pytest.raises(InvalidScanModeError):
+        ScanFarm().scan("spectrum", params, [], MagicMock())
+
+def test_frequency_scan(fake_rigctld, params):
+    targets = [fake_rigctld(), fake_rigctld()]
+    log = MagicMock()
+    ScanFarm().scan("frequency", params, targets, log)
+    found = [call[0][1]["freq"] for call in log.write.call_args_list]
+    assert (found == [101000])
+
+def test_interleaved_scan_skips_known(fake_rigctld, params):
+    channels = [145000000 + i * 25000 for i in range(9)]
+    targets = [fake_rigctld(channels) for _ in range(3)]
+    params["range_min"] = channels[0]
+    params["range_max"] = channels[-1] + 1
+    params["interval"] = 25
+    params["skip_known"] = True
+    log = MagicMock()
+    ScanFarm().scan("frequency", params, targets, log,
+                    [(145100000, "FM", "known", "O")], interleaved=True)
+    found = sorted(call[0][1]["freq"] for call in log.write.call_args_list)
+    assert (found == [freq for freq in channels if freq != 145100000])
+
+def test_bookmark_scan(fake_rigctld, params):
+    targets = [fake_rigctld(), fake_rigctld()]
+    bookmarks = [["145500000", "FM", "active", ""],
+                 ["145600000", "FM", "quiet", ""],
+                 ["145700000", "FM", "locked", "L"]]
+    log = MagicMock()
+    ScanFarm().scan("bookmarks", params, targets, log, bookmarks)
+    found = [call[0][1][2] for call in log.write.call_args_list]
+    assert (found == ["active"])
+
+def test_worker_error(fake_rigctld, params):
+    target = fake_rigctld()
+    del target["rig_number"]
+    farm = ScanFarm()
+    farm.scan("bookmarks", params, [target], MagicMock(),
+              [["145500000", "FM", "active", "O"]])
+    assert ([index for index, _ in farm.errors] == [0])
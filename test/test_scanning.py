@@ -16,12 +16,19 @@ Copyright (c) 2014 Rafael Marmelo
 Copyright (c) 2015 Simone Marzona
 """
 # import modules
+import json
 import pytest
+import threading
+import time
+from mock import patch
+from rig_remote.bookmark_set import BookmarkSet
 from rig_remote.disk_io import LogFile
 from rig_remote.rigctl import RigCtl
 from rig_remote.scanning import ScanningTask
 from rig_remote.scanning import Scanning
+from rig_remote.scanning import ScanStats
 from rig_remote.constants import MIN_INTERVAL
+from rig_remote.constants import UNKNOWN_MODE
 from rig_remote.stmessenger import STMessenger
 from rig_remote.exceptions import UnsupportedScanningConfigError, InvalidScanModeError
 
@@ -70,6 +77,8 @@ def FakeSTMessenger():
             return False
         def get_event_update(self):
             return None, None
+        def wait_for_update(self, timeout):
+            return False
     return FakeSTMessenger
 
 @pytest.fixture
@@ -347,3 +356,307 @@ def test_terminate():
     s = Scanning()
     s.terminate()
     assert(s.scan_active == False)
+
+def test_queue_sleep_subsecond(scan_task):
+    s = Scanning()
+    scan_task.params['delay'] = 0.05
+    scan_task.scanq = STMessenger()
+    start = time.time()
+    s._queue_sleep(scan_task)
+    assert (0.05 <= time.time() - start < 0.5)
+
+def test_queue_sleep_wakes_on_update(scan_task):
+    s = Scanning()
+    scan_task.params['delay'] = 1
+    scan_task.scanq = STMessenger()
+    processed = []
+    process_queue = s._process_queue
+    def timed_process_queue(task):
+        processed.append(time.time())
+        return process_queue(task)
+    s._process_queue = timed_process_queue
+    timer = threading.Timer(0.05, scan_task.scanq.send_event_update,
+                            [("txt_passes", 3)])
+    start = time.time()
+    timer.start()
+    s._queue_sleep(scan_task)
+    timer.join()
+    # the update is processed right away, the sleep goes on
+    assert (processed[0] - start < 0.5)
+    assert (time.time() - start >= 1)
+    assert (scan_task.params['passes'] == 3)
+
+def test_terminate_interrupts_queue_sleep(scan_task):
+    s = Scanning()
+    scan_task.params['delay'] = 10
+    scan_task.scanq = STMessenger()
+    s.scanq = scan_task.scanq
+    timer = threading.Timer(0.05, s.terminate)
+    start = time.time()
+    timer.start()
+    s._queue_sleep(scan_task)
+    timer.join()
+    assert (time.time() - start < 1)
+
+@pytest.fixture
+def fake_tuning_rig():
+    class fake_tuning_rig(object):
+        def __init__(self):
+            self.target = {}
+            self.frequencies = []
+        def set_mode(self, mode):
+            pass
+        def set_frequency(self, freq):
+            self.frequencies.append(freq)
+        def get_mode(self):
+            return "FM"
+        def get_level(self):
+            return "-80.0"
+        def batch(self, requests):
+            return [str(self.frequencies[-1]), self.get_level()]
+    return fake_tuning_rig
+
+@pytest.fixture
+def fake_level_rig():
+    class fake_level_rig(object):
+        def __init__(self, levels):
+            self.levels = list(levels)
+        def get_level(self):
+            return self.levels.pop(0)
+    return fake_level_rig
+
+def test_signal_check_early_stop_below(fake_level_rig):
+    s = Scanning()
+    rig = fake_level_rig(["-80.0", "-80.0"])
+    detected_level = []
+    with patch("rig_remote.scanning.NO_SIGNAL_DELAY", 0):
+        assert (s._signal_check(-30, rig, detected_level) == False)
+    assert (s.samples_used == 1)
+    assert (detected_level == [])
+
+def test_signal_check_early_stop_above(fake_level_rig):
+    s = Scanning()
+    rig = fake_level_rig(["-10.0", "-10.0"])
+    detected_level = []
+    with patch("rig_remote.scanning.NO_SIGNAL_DELAY", 0):
+        assert (s._signal_check(-30, rig, detected_level) == True)
+    assert (s.samples_used == 1)
+    assert (detected_level == [-100])
+
+def test_signal_check_close_to_threshold(fake_level_rig):
+    s = Scanning()
+    rig = fake_level_rig(["-29.5", "-29.0"])
+    detected_level = []
+    with patch("rig_remote.scanning.NO_SIGNAL_DELAY", 0):
+        assert (s._signal_check(-30, rig, detected_level) == True)
+    assert (s.samples_used == 2)
+
+def test_signal_check_confidence(fake_level_rig):
+    s = Scanning(confidence=0.999999)
+    rig = fake_level_rig(["-25.0", "-40.0"])
+    with patch("rig_remote.scanning.NO_SIGNAL_DELAY", 0):
+        assert (s._signal_check(-30, rig, []) == False)
+    assert (s.samples_used == 2)
+
+@pytest.fixture
+def fake_settling_rig():
+    class fake_settling_rig(object):
+        def __init__(self, replies):
+            self.target = {"hostname": "127.0.0.1", "port": 7356}
+            self.replies = list(replies)
+            self.polls = 0
+        def set_frequency(self, freq):
+            pass
+        def batch(self, requests):
+            self.polls += 1
+            if len(self.replies) > 1:
+                return self.replies.pop(0)
+            return self.replies[0]
+    return fake_settling_rig
+
+def test_wait_for_tune_settled(fake_settling_rig):
+    s = Scanning()
+    s.settle_times = {}
+    rig = fake_settling_rig([["100000", "-80.0"],
+                             ["145000000", "-40.0"],
+                             ["145000000", "-30.0"],
+                             ["145000000", "-30.5"]])
+    with patch("rig_remote.scanning.TUNE_SETTLE_POLL", 0), \
+         patch("rig_remote.scanning.TIME_WAIT_FOR_TUNE", 10):
+        assert (s._wait_for_tune(rig, 145000000) == True)
+    assert (rig.polls == 4)
+    assert (s.settle_times[("127.0.0.1", "7356")] == s.settle_time)
+
+def test_wait_for_tune_level_noise(fake_settling_rig):
+    s = Scanning()
+    s.settle_times = {}
+    rig = fake_settling_rig([["145000000", "-30.0"],
+                             ["145000000", "-34.0"],
+                             ["145000000", "-29.0"]])
+    with patch("rig_remote.scanning.TUNE_SETTLE_POLL", 0), \
+         patch("rig_remote.scanning.TIME_WAIT_FOR_TUNE", 10):
+        assert (s._wait_for_tune(rig, 145000000) == True)
+    assert (rig.polls == 2)
+
+def test_wait_for_tune_gives_up(fake_settling_rig):
+    s = Scanning()
+    s.settle_times = {}
+    rig = fake_settling_rig([["100000", "-80.0"]])
+    with patch("rig_remote.scanning.TUNE_SETTLE_POLL", 0.01), \
+         patch("rig_remote.scanning.TIME_WAIT_FOR_TUNE", 0.05):
+        assert (s._wait_for_tune(rig, 145000000) == False)
+    assert (s.settle_time < 1)
+    assert (s.settle_times == {})
+
+def test_wait_for_tune_learns(fake_settling_rig):
+    s = Scanning()
+    s.settle_times = {("127.0.0.1", "7356"): 0.0}
+    rig = fake_settling_rig([["145000000", "-30.0"]])
+    with patch("rig_remote.scanning.TUNE_SETTLE_POLL", 0), \
+         patch("rig_remote.scanning.TUNE_SETTLE_LEARNING_RATE", 0.5):
+        s._wait_for_tune(rig, 145000000)
+    assert (s.settle_times[("127.0.0.1", "7356")] == s.settle_time * 0.5)
+
+def test_spectrum_scan(tmpdir):
+    pytest.importorskip("numpy")
+    dump = tmpdir.join("dump.csv")
+    dump.write("2016-06-01, 10:00:00, 100000, 104000, 1000, 10, "
+               "-80.0, -20.0, -80.0, -10.0\n")
+    params = {}
+    params["txt_range_min"] = TestStr("100")
+    params["txt_range_max"] = TestStr("110")
+    params["txt_delay"] = TestStr("0")
+    params["txt_passes"] = TestStr("1")
+    params["txt_sgn_level"] = TestStr("-30")
+    params["txt_interval"] = TestStr("1")
+    params["ckb_record"] = TestBool(False)
+    params["ckb_log"] = TestBool(False)
+    params["ckb_wait"] = TestBool(False)
+    params["ckb_auto_bookmark"] = TestBool(True)
+    params["spectrum_file"] = str(dump)
+    task = ScanningTask(STMessenger(), "spectrum", [], [], params,
+                        None, "/tmp/nofile")
+    Scanning().scan(task)
+    assert ([nbm["freq"] for nbm in task.new_bookmark_list] == [101000, 103000])
+    assert (task.new_bookmark_list[0]["mode"] == UNKNOWN_MODE)
+    assert (task.scanq.check_end_of_scan() == True)
+
+def test_spectrum_scan_without_file():
+    params = {}
+    params["txt_range_min"] = TestStr("100")
+    params["txt_range_max"] = TestStr("110")
+    params["txt_delay"] = TestStr("0")
+    params["txt_passes"] = TestStr("1")
+    params["txt_sgn_level"] = TestStr("-30")
+    params["txt_interval"] = TestStr("1")
+    params["ckb_record"] = TestBool(False)
+    params["ckb_log"] = TestBool(False)
+    params["ckb_wait"] = TestBool(False)
+    params["ckb_auto_bookmark"] = TestBool(True)
+    with pytest.raises(UnsupportedScanningConfigError):
+        ScanningTask(STMessenger(), "spectrum", [], [], params,
+                     None, "/tmp/nofile")
+
+@pytest.fixture
+def headless_params():
+    params = {}
+    params["range_min"] = 100000
+    params["range_max"] = 110000
+    params["interval"] = 1
+    params["delay"] = 0
+    params["passes"] = 1
+    params["sgn_level"] = -30
+    return params
+
+def test_headless_task(headless_params):
+    headless_params["delay"] = "0.5"
+    task = ScanningTask(STMessenger(), "frequency", [], [], headless_params,
+                        None, "/tmp/nofile")
+    assert (task.params["delay"] == 0.5)
+    assert (task.params["log"] == False)
+    assert (task.params["auto_bookmark"] == False)
+    assert (task.params["rig_mode"] is None)
+
+def test_headless_task_missing_param(headless_params):
+    del headless_params["sgn_level"]
+    with pytest.raises(UnsupportedScanningConfigError):
+        ScanningTask(STMessenger(), "frequency", [], [], headless_params,
+                     None, "/tmp/nofile")
+
+def test_headless_task_bad_param(headless_params):
+    headless_params["passes"] = "test"
+    with pytest.raises(ValueError):
+        ScanningTask(STMessenger(), "frequency", [], [], headless_params,
+                     None, "/tmp/nofile")
+
+def test_headless_bookmark_scan(headless_params, fake_tuning_rig):
+    bookmarks = [["145,500,000", "FM", "repeater", ""],
+                 ["145,600,000", "FM", "locked", "L"],
+                 [145700000, "FM", "plain int", ""]]
+    rig = fake_tuning_rig()
+    task = ScanningTask(STMessenger(), "bookmarks", bookmarks, [],
+                        headless_params, rig, "/tmp/nofile")
+    with patch("rig_remote.scanning.TIME_WAIT_FOR_TUNE", 0), \
+         patch("rig_remote.scanning.NO_SIGNAL_DELAY", 0):
+        Scanning().scan(task)
+    assert (rig.frequencies == ["145500000", "145700000"])
+    assert (task.scanq.check_end_of_scan() == True)
+
+def test_headless_frequency_skip_known(headless_params, fake_tuning_rig):
+    headless_params["skip_known"] = True
+    known = BookmarkSet([(103000, "FM"), (105400, "FM")])
+    rig = fake_tuning_rig()
+    task = ScanningTask(STMessenger(), "frequency", known, [],
+                        headless_params, rig, "/tmp/nofile")
+    with patch("rig_remote.scanning.TIME_WAIT_FOR_TUNE", 0), \
+         patch("rig_remote.scanning.NO_SIGNAL_DELAY", 0):
+        Scanning().scan(task)
+    assert (rig.frequencies == [100000, 101000, 102000, 104000,
+                                106000, 107000, 108000, 109000])
+
+def test_add_new_bookmark_skips_duplicates(headless_params):
+    known = BookmarkSet([(100000, "FM", "known")])
+    task = ScanningTask(STMessenger(), "frequency", known, [],
+                        headless_params, None, "/tmp/nofile")
+    s = Scanning()
+    assert (s._add_new_bookmark(task, {"freq": 100200, "mode": "FM"}, 500) == False)
+    assert (s._add_new_bookmark(task, {"freq": 102000, "mode": "FM"}, 500) == True)
+    assert (s._add_new_bookmark(task, {"freq": 102300, "mode": "FM"}, 500) == False)
+    assert ([nbm["freq"] for nbm in task.new_bookmark_list] == [102000])
+
+def test_annotate(headless_params):
+    known = BookmarkSet([(100000, "FM", "known")])
+    task = ScanningTask(STMessenger(), "frequency", known, [],
+                        headless_params, None, "/tmp/nofile")
+    s = Scanning()
+    assert (s._annotate(task, {"freq": 100400}, 500)["bookmark"] == "known")
+    assert ("bookmark" not in s._annotate(task, {"freq": 100600}, 500))
+
+def test_scan_stats_passes():
+    stats = ScanStats()
+    stats.add_channel(3)
+    stats.add_phase("tune", 0.5)
+    stats.add_command("f,l", 0.003)
+    stats.add_command("f,l", 2)
+    stats.end_pass()
+    data = stats.as_dict()
+    assert (len(data["passes"]) == 1)
+    assert (data["passes"][0]["channels"] == 3)
+    assert (data["passes"][0]["phases"]["tune"] == 0.5)
+    assert (data["passes"][0]["channels_per_sec"] > 0)
+    assert (data["current"]["channels"] == 0)
+    buckets = data["commands"]["f,l"]["buckets"]
+    assert (sum(bucket["count"] for bucket in buckets) == 2)
+    assert (buckets[-1] == {"le": None, "count": 1})
+    assert (stats.summary().startswith("Pass 2: 0 channels"))
+
+def test_scan_stats_dump(tmpdir):
+    stats = ScanStats()
+    with stats.phase("queue"):
+        stats.add_channel()
+    filename = str(tmpdir.join("stats.json"))
+    stats.dump(filename)
+    with open(filename) as stats_file:
+        data = json.load(stats_file)
+    assert (data["current"]["channels"] == 1)
+    assert (data["current"]["phases"]["queue"] >= 0)
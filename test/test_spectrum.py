@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+# import modules
+import pytest
+numpy = pytest.importorskip("numpy")
+from rig_remote.spectrum import SpectrumFile, find_peaks
+from rig_remote.exceptions import InvalidPathError
+
+DUMP = ("2016-06-01, 10:00:00, 100000, 104000, 1000, 10, -80.0, -20.0, -80.0, -80.0\n"
+        "2016-06-01, 10:00:00, 104000, 108000, 1000, 10, -80.0, -80.0, -25.0, -26.0\n"
+        "2016-06-01, 10:00:01, 100000, 104000, 1000, 10, -80.0, -80.0, -80.0, -10.0\n")
+
+@pytest.fixture
+def dump_file(tmpdir):
+    dump = tmpdir.join("dump.csv")
+    dump.write(DUMP)
+    return str(dump)
+
+def test_find_peaks():
+    freqs = numpy.arange(100000, 108000, 1000)
+    levels = numpy.array([-80.0, -20.0, -80.0, -80.0, -80.0, -80.0, -25.0, -26.0])
+    peak_freqs, peak_levels = find_peaks(freqs, levels, -30)
+    assert (peak_freqs.tolist() == [101000, 106000])
+    assert (peak_levels.tolist() == [-20.0, -25.0])
+
+def test_find_peaks_below_threshold():
+    freqs = numpy.arange(100000, 104000, 1000)
+    levels = numpy.array([-80.0, -40.0, -80.0, -80.0])
+    assert (len(find_peaks(freqs, levels, -30)[0]) == 0)
+
+def test_find_peaks_spacing():
+    freqs = numpy.arange(100000, 105000, 1000)
+    levels = numpy.array([-20.0, -40.0, -25.0, -40.0, -22.0])
+    peak_freqs, _ = find_peaks(freqs, levels, -30, 2500)
+    assert (peak_freqs.tolist() == [100000, 104000])
+
+def test_find_peaks_empty():
+    peak_freqs, _ = find_peaks(numpy.array([]), numpy.array([]), -30)
+    assert (len(peak_freqs) == 0)
+
+def test_capture(dump_file):
+    freqs, levels = SpectrumFile(dump_file).capture(100000, 108000)
+    assert (freqs.tolist() == list(range(100000, 108000, 1000)))
+    # bins swept twice keep the highest level
+    assert (levels[1] == -20.0)
+    assert (levels[3] == -10.0)
+
+def test_capture_range(dump_file):
+    freqs, _ = SpectrumFile(dump_file).capture(102000, 105000)
+    assert (freqs.tolist() == [102000, 103000, 104000])
+
+def test_capture_missing_file():
+    with pytest.raises(InvalidPathError):
+        SpectrumFile("/tmp/nofile/dump.csv").capture(0, 1)
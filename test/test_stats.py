@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+
+# import modules
+import pytest
+from rig_remote.stats import TimingStat
+
+def test_timing_stat_empty():
+    stat = TimingStat()
+    assert (stat.mean == None)
+    assert (str(stat) == "n/a")
+    assert (stat.as_dict()["count"] == 0)
+
+def test_timing_stat_add():
+    stat = TimingStat()
+    for value in (0.002, 0.001, 0.003):
+        stat.add(value)
+    assert (stat.as_dict() == {"count": 3,
+                               "mean": pytest.approx(0.002),
+                               "min": 0.001,
+                               "max": 0.003,
+                               "last": 0.003})
+    assert (str(stat) == "1.0/2.0/3.0 ms")
+    stat.reset()
+    assert (stat.count == 0)
@@ -37,3 +37,17 @@ def test_error_get_event_update():
     stm = STMessenger()
     stm.mqueue.get_from_child = MagicMock(side_effect=Exception)
     assert (stm.get_event_update() == [])
+
+def test_wait_for_update_timeout():
+    stm = STMessenger()
+    assert (stm.wait_for_update(0.01) == False)
+
+def test_wait_for_update_queued():
+    stm = STMessenger()
+    stm.send_event_update((1, 2))
+    assert (stm.wait_for_update(10) == True)
+
+def test_wait_for_update_interrupt():
+    stm = STMessenger()
+    stm.interrupt()
+    assert (stm.wait_for_update(10) == False)
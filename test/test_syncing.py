@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+# import modules
+import pytest
+import socket
+from mock import patch
+from rig_remote.constants import SYNC_INTERVAL, SYNC_MAX_INTERVAL
+from rig_remote.exceptions import UnsupportedSyncConfigError
+from rig_remote.stmessenger import STMessenger
+from rig_remote.syncing import SyncTask, Syncing
+
+@pytest.fixture
+def fake_sync_rig():
+    class fake_sync_rig(object):
+        def __init__(self, states=()):
+            self.target = {"hostname": "test", "port": 80, "rig_number": 1}
+            self.states = list(states)
+            self.requests = []
+        def batch(self, requests):
+            self.requests.append(requests)
+            if requests == ["f", "m"]:
+                if not self.states:
+                    raise socket.error
+                return self.states.pop(0)
+            return ["RPRT 0"] * len(requests)
+    return fake_sync_rig
+
+def run_sync(src, dst):
+    task = SyncTask(STMessenger(), src, dst)
+    syncing = Syncing()
+    with patch.object(syncing.stop, "wait"):
+        syncing.sync(task)
+    return syncing, task
+
+def test_sync_writes_changes_only(fake_sync_rig):
+    src = fake_sync_rig([("145500000", "FM\n15000"),
+                         ("145500000", "FM\n15000"),
+                         ("145600000", "FM\n15000"),
+                         ("145600000", "AM\n10000")])
+    dst = fake_sync_rig()
+    syncing, task = run_sync(src, dst)
+    assert (dst.requests == [["F 145500000", "M FM"],
+                             ["F 145600000"],
+                             ["M AM"]])
+    assert (task.syncq.check_end_of_scan() == True)
+    assert (syncing.sync_active == False)
+
+def test_sync_unsupported_mode(fake_sync_rig):
+    src = fake_sync_rig([("145500000", "XX")])
+    dst = fake_sync_rig()
+    run_sync(src, dst)
+    assert (dst.requests == [["F 145500000"]])
+
+def test_sync_backs_off():
+    syncing = Syncing()
+    assert (syncing._next_interval(False) > SYNC_INTERVAL)
+    for _ in range(20):
+        syncing._next_interval(False)
+    assert (syncing.interval == SYNC_MAX_INTERVAL)
+    assert (syncing._next_interval(True) == SYNC_INTERVAL)
+
+def test_terminate_wakes_sync():
+    syncing = Syncing()
+    syncing.terminate()
+    assert (syncing.stop.wait(10) == True)
+    assert (syncing.sync_active == False)
+
+def test_sync_bad_task():
+    with pytest.raises(UnsupportedSyncConfigError):
+        Syncing().sync(None)
+
+def test_sync_fan_out_offsets(fake_sync_rig):
+    src = fake_sync_rig([("145500000", "FM"),
+                         ("145600000", "FM")])
+    dst1 = fake_sync_rig()
+    dst2 = fake_sync_rig()
+    task = SyncTask(STMessenger(), src, [dst1, dst2], [0, -116000000])
+    syncing = Syncing()
+    with patch.object(syncing.stop, "wait"):
+        syncing.sync(task)
+    assert (task.dst_rig == dst1)
+    assert (dst1.requests == [["F 145500000", "M FM"], ["F 145600000"]])
+    assert (dst2.requests == [["F 29500000", "M FM"], ["F 29600000"]])
+
+def test_sync_retries_failed_destination(fake_sync_rig):
+    src = fake_sync_rig([("145500000", "FM"),
+                         ("145500000", "FM")])
+    dst1 = fake_sync_rig()
+    dst2 = fake_sync_rig()
+    failures = [socket.error]
+    def flaky_batch(requests):
+        dst2.requests.append(requests)
+        if failures:
+            raise failures.pop()
+        return ["RPRT 0"] * len(requests)
+    dst2.batch = flaky_batch
+    task = SyncTask(STMessenger(), src, [dst1, dst2])
+    syncing = Syncing()
+    with patch.object(syncing.stop, "wait"):
+        syncing.sync(task)
+    assert (dst1.requests == [["F 145500000", "M FM"]])
+    assert (dst2.requests == [["F 145500000", "M FM"],
+                              ["F 145500000", "M FM"]])
+
+def test_sync_offsets_mismatch(fake_sync_rig):
+    with pytest.raises(UnsupportedSyncConfigError):
+        SyncTask(STMessenger(), fake_sync_rig(),
+                 [fake_sync_rig(), fake_sync_rig()], [0])
+
+def test_sync_stats(fake_sync_rig):
+    src = fake_sync_rig([("145500000", "FM"),
+                         ("145500000", "FM"),
+                         ("145500000", "FM")])
+    dst1 = fake_sync_rig()
+    dst2 = fake_sync_rig()
+    failures = [socket.error]
+    def flaky_batch(requests):
+        if failures:
+            raise failures.pop()
+        return ["RPRT 0"] * len(requests)
+    dst2.batch = flaky_batch
+    task = SyncTask(STMessenger(), src, [dst1, dst2])
+    syncing = Syncing()
+    with patch.object(syncing.stop, "wait"):
+        syncing.sync(task)
+    stats = syncing.stats.as_dict()
+    assert (stats["ticks"] == 3)
+    assert (stats["source_read"]["count"] == 3)
+    assert (stats["destinations"][0]["write"]["count"] == 1)
+    assert (stats["destinations"][0]["lag_ticks"]["max"] == 0)
+    assert (stats["destinations"][1]["failures"] == 1)
+    assert (stats["destinations"][1]["lag_ticks"]["max"] == 1)
+    assert (stats["destinations"][1]["propagation"]["last"] >=
+            stats["destinations"][1]["write"]["last"])
+    assert (syncing.stats.summary().startswith("Sync: 3 ticks"))